@@ -0,0 +1,244 @@
+'''
+Combine composites, computed column-wise over every stored year at once.
+
+combine_results is loaded in one query into a CombineTable (one float64
+array per measurable). Every composite is then a handful of numpy
+passes over every position at once, never a loop over players:
+
+    speed_score          weight * 200 / forty ** 4
+    <drill>_pct          mid-rank percentile within the position, all years pooled
+    <drill>_adj_pct      same, after regressing the drill on weight within the
+                         position (a fast 250 lb forty beats a fast 190 lb one)
+    ras                  0-10, mean of the per-measurable scores (pct / 10,
+                         flipped for timed drills), NaN with fewer than
+                         config.RAS_MIN_MEASURES measurables
+
+    python -m analytics.combine fetch --year-start 2000 --year-end 2026
+    python -m analytics.combine score --pos WR --top 25
+'''
+
+import argparse
+import time
+
+from itertools import chain
+from typing import Dict
+from typing import List
+
+import numpy as np
+
+import config
+import db.sqlite as StoreSQL
+import db.snapshot as Snapshots
+
+
+MEASURES: List[str] = list(StoreSQL.COMBINE_COLUMNS)
+#timed drills, lower is better
+LOWER_IS_BETTER = {"forty", "cone", "shuttle"}
+#drills worth a weight adjustment, height / weight themselves are the size
+DRILLS: List[str] = [measure for measure in MEASURES if measure not in ("height", "weight")]
+
+_TEXT_COLUMNS = ["pos", "position", "name", "college", "identity"]
+
+
+class CombineTable:
+    '''
+    Columnar combine results: text columns as object arrays,
+    measurables as float64 (NaN = skipped the drill)
+    '''
+
+    def __init__(self, years: np.ndarray, player_ids: np.ndarray, data: Dict[str, np.ndarray]):
+        self.years = years
+        self.player_ids = player_ids
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.years)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.data[column]
+
+    def groups(self, by: str = "pos") -> np.ndarray:
+        '''
+        :param by: "pos" (combine position, TE apart from WR) or "position" (modelled position)
+        :return  : int group code per row, -1 where the position is unknown
+        '''
+        labels = self.data[by]
+        known = np.array([label is not None for label in labels], dtype=bool)
+        codes = np.full(len(self), -1, dtype=np.int64)
+        if known.any():
+            _, codes[known] = np.unique(labels[known].astype(str), return_inverse=True)
+        return codes
+
+
+def load_table(years: List[int] = None, positions: List[str] = None, *, connection=None) -> CombineTable:
+    '''
+    :param years     : OPTIONAL combine years, all otherwise
+    :param positions : OPTIONAL combine positions (pos), all otherwise
+    :param connection: OPTIONAL sqlite connection
+    :return          : every matching combine row as one CombineTable
+    '''
+    rows = StoreSQL.sql_combine_results(years, positions, connection=connection)
+
+    #transpose, one tuple per column instead of one object per player
+    columns = list(zip(*rows)) or [()] * (7 + len(MEASURES))
+    data = {column: np.array(values, dtype=object)
+            for column, values in zip(_TEXT_COLUMNS, columns[1:6])}
+    data.update({measure: np.array(values, dtype=np.float64)
+                 for measure, values in zip(MEASURES, columns[7:])})
+    player_ids = np.array([-1 if value is None else value for value in columns[6]], dtype=np.int64)
+    return CombineTable(np.array(columns[0], dtype=np.int64), player_ids, data)
+
+
+# ---- Column-wise Helpers ----
+def group_percentiles(values: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    '''
+    Mid-rank percentile (ties count half) of every value against its own group,
+    every group sorted together
+
+    :param values: float64, NaN = missing
+    :param groups: int group code per value, -1 = no group
+    :return      : percentiles in [0, 100], NaN where value or group is missing
+    '''
+    out = np.full(values.shape, np.nan)
+    known = np.flatnonzero(~np.isnan(values) & (groups >= 0))
+    if not len(known):
+        return out
+
+    #(group, value) folded into one float key, a single argsort is far cheaper than lexsort
+    known_values = values[known]
+    low, span = known_values.min(), np.ptp(known_values) + 1.0
+    order = known[np.argsort(groups[known] * span + (known_values - low))]
+    sorted_groups, sorted_values = groups[order], values[order]
+
+    #runs of equal (group, value) share one mid-rank
+    new_run = np.ones(len(order), dtype=bool)
+    new_run[1:] = (sorted_groups[1:] != sorted_groups[:-1]) | (sorted_values[1:] != sorted_values[:-1])
+    run_start = np.flatnonzero(new_run)
+    run_end = np.append(run_start[1:], len(order))
+    run_of = np.cumsum(new_run) - 1
+
+    group_start = np.searchsorted(sorted_groups, sorted_groups, side="left")
+    group_size = np.searchsorted(sorted_groups, sorted_groups, side="right") - group_start
+    below = run_start[run_of] - group_start
+    through = run_end[run_of] - group_start
+    out[order] = (below + through) / 2.0 / group_size * 100.0
+    return out
+
+
+def weight_residuals(values: np.ndarray, weight: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    '''
+    What's left of a drill after a per-group least squares fit on weight,
+    every group's fit from one set of bincount sums
+
+    :param values: drill results, NaN = missing
+    :param weight: body weight, NaN = missing
+    :param groups: int group code per row, -1 = no group
+    :return      : residuals, NaN where either input is missing or the group has < 3 rows
+    '''
+    out = np.full(values.shape, np.nan)
+    known = np.flatnonzero(~np.isnan(values) & ~np.isnan(weight) & (groups >= 0))
+    if not len(known):
+        return out
+
+    g, x, y = groups[known], weight[known], values[known]
+    size = np.bincount(g)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_mean = np.bincount(g, x) / size
+        y_mean = np.bincount(g, y) / size
+        dx, dy = x - x_mean[g], y - y_mean[g]
+        spread = np.bincount(g, dx * dx)
+        slope = np.where(spread > 0, np.bincount(g, dx * dy) / spread, 0.0)
+
+    residuals = dy - slope[g] * dx
+    out[known] = np.where(size[g] >= 3, residuals, np.nan)
+    return out
+
+
+def speed_score(weight: np.ndarray, forty: np.ndarray) -> np.ndarray:
+    ''' Barnwell's speed score, NaN without a forty '''
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(forty > 0, weight * 200.0 / forty ** 4, np.nan)
+
+
+# ---- Composites ----
+def composites(table: CombineTable, *, by: str = "pos") -> Dict[str, np.ndarray]:
+    '''
+    Every composite for every row of table in one pass, pooled over all its years
+
+    :param table: load_table() output
+    :param by   : grouping for percentiles, "pos" or "position"
+    :return     : column -> float64 array aligned with table
+    '''
+    groups = table.groups(by)
+    weight = table["weight"]
+
+    out: Dict[str, np.ndarray] = {"speed_score": speed_score(weight, table["forty"])}
+    out["speed_score_pct"] = group_percentiles(out["speed_score"], groups)
+
+    scores = []
+    for measure in MEASURES:
+        pct = group_percentiles(table[measure], groups)
+        if measure in LOWER_IS_BETTER:
+            pct = 100.0 - pct
+        out[f"{measure}_pct"] = pct
+        scores.append(pct / 10.0)
+
+        if measure in DRILLS:
+            adjusted = group_percentiles(weight_residuals(table[measure], weight, groups), groups)
+            out[f"{measure}_adj_pct"] = 100.0 - adjusted if measure in LOWER_IS_BETTER else adjusted
+
+    scores = np.vstack(scores) if scores else np.empty((0, len(table)))
+    measured = (~np.isnan(scores)).sum(axis=0)
+    with np.errstate(invalid="ignore"):
+        ras = np.nansum(scores, axis=0) / np.maximum(measured, 1)
+    out["ras"] = np.where(measured >= config.RAS_MIN_MEASURES, ras, np.nan)
+    out["ras_measures"] = measured.astype(np.float64)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Combine results + column-wise composites")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fetch = sub.add_parser("fetch")
+    fetch.add_argument("--year-start", type=int, required=True)
+    fetch.add_argument("--year-end", type=int, required=True, help="exclusive")
+    fetch.add_argument("--refresh", action="store_true", help="re-fetch cached pages")
+    score = sub.add_parser("score")
+    score.add_argument("--pos", default=None, help="combine position like WR / OT, all otherwise")
+    score.add_argument("--year", type=int, action="append", default=None, help="repeatable, all years otherwise")
+    score.add_argument("--by", choices=["pos", "position"], default="pos")
+    score.add_argument("--top", type=int, default=20)
+    score.add_argument("--snapshot", default=config.SNAPSHOT_ID,
+                       help="read from this snapshot id (or latest), the live DB otherwise")
+    args = parser.parse_args()
+
+    if args.command == "fetch":
+        from scrape.combine import load_combine
+        stored = load_combine(args.year_start, args.year_end, refresh=args.refresh)
+        print(f"[INFO] {sum(stored.values())} combine rows over {len(stored)} years")
+        return
+
+    table = load_table(connection=Snapshots.open_snapshot(args.snapshot) if args.snapshot else None)
+    started = time.perf_counter()
+    result = composites(table, by=args.by)
+    elapsed = time.perf_counter() - started
+    print(f"[INFO] Composites for {len(table)} rows over {len(set(table.years.tolist()))} years "
+          f"in {elapsed * 1000:.1f} ms")
+
+    #percentiles stay pooled over every year, filters only pick what to print
+    keep = ~np.isnan(result["ras"])
+    if args.pos:
+        keep &= table["pos"] == args.pos.upper()
+    if args.year:
+        keep &= np.isin(table.years, args.year)
+    ranked = np.flatnonzero(keep)[np.argsort(-result["ras"][keep], kind="stable")][:args.top]
+
+    columns = ["ras", "speed_score", "forty_adj_pct", "vertical_adj_pct", "broad_jump_adj_pct"]
+    print(" ".join(chain(["year", "pos ", f"{'name':<24}"], (f"{column:>18}" for column in columns))))
+    for index in ranked:
+        print(" ".join(chain([str(table.years[index]), f"{table['pos'][index]:<4}", f"{table['name'][index]:<24}"],
+                             (f"{result[column][index]:>18.2f}" for column in columns))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+'''
+Turns player DataFrames (loader output) into dense per-position
+feature matrices. Physicals + every numeric POSITION_SCHEMA field.
+'''
+
+import hashlib
+
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from parse.pfr_parser import POSITION_SCHEMA
+
+
+PHYSICALS: List[str] = ["height", "weight", "age"]
+
+
+def feature_columns(position: str) -> List[str]:
+    '''
+    :param position: key of POSITION_SCHEMA
+    :return        : physicals followed by the position's stat fields, schema order
+    '''
+    position = position.upper()
+    if position not in POSITION_SCHEMA:
+        raise ValueError(f"[ERROR] Invalid position {position} <feature_columns>")
+
+    columns = list(PHYSICALS)
+    for fields in POSITION_SCHEMA[position]["standards"].values():
+        for field in fields:
+            if field not in columns:
+                columns.append(field)
+    return columns
+
+
+def feature_matrix(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    '''
+    :param df     : players (or a loader ProspectBatch), missing columns are treated as all NaN
+    :param columns: output column order
+    :return       : float64 (n_players, n_columns), NaN where unknown
+    '''
+    #columnar batches already hold float arrays, no per-column coercion
+    if hasattr(df, "matrix"):
+        return df.matrix(columns)
+    out = np.full((len(df), len(columns)), np.nan, dtype=np.float64)
+    for index, column in enumerate(columns):
+        if column in df.columns:
+            out[:, index] = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64)
+    return out
+
+
+def fit_scaler(X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    NaN aware column mean / std, constant columns get std 1
+
+    :param X: raw feature matrix
+    :return : (mean, scale)
+    '''
+    mean = np.nanmean(X, axis=0) if len(X) else np.zeros(X.shape[1])
+    scale = np.nanstd(X, axis=0) if len(X) else np.ones(X.shape[1])
+    mean = np.where(np.isnan(mean), 0.0, mean)
+    scale = np.where(np.isnan(scale) | (scale == 0), 1.0, scale)
+    return mean, scale
+
+
+def standardize(X: np.ndarray, mean: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    '''
+    z-scores, unknown values land on the mean (0)
+    '''
+    Z = (X - mean) / scale
+    Z[np.isnan(Z)] = 0.0
+    return Z
+
+
+def data_version(df: pd.DataFrame, columns: List[str], *extra: str) -> str:
+    '''
+    Content hash of the columns a model is fit on, changes whenever
+    the underlying rows do
+
+    :param df     : training frame
+    :param columns: columns that matter
+    :param extra  : anything else that should bust the cache (k, code version)
+    :return       : short hex digest
+    '''
+    present = [column for column in columns if column in df.columns]
+    digest = hashlib.sha1()
+    digest.update(",".join(present).encode("utf-8"))
+    if len(df) and present:
+        hashed = pd.util.hash_pandas_object(df[present], index=False)
+        digest.update(hashed.to_numpy().tobytes())
+    for item in extra:
+        digest.update(str(item).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def matrices_by_position(frames: Dict[str, pd.DataFrame]) -> Dict[str, Tuple[np.ndarray, List[str]]]:
+    '''
+    :param frames: position -> player frame
+    :return      : position -> (raw feature matrix, columns)
+    '''
+    out = {}
+    for position, df in frames.items():
+        columns = feature_columns(position)
+        out[position] = (feature_matrix(df, columns), columns)
+    return out
@@ -0,0 +1,250 @@
+'''
+Precomputed per-position percentile tables.
+
+For every numeric field (physicals, POSITION_SCHEMA stats and their
+per-game rates) we keep the sorted values of every drafted player at the
+position, overall and per era (decade). A percentile is then two binary
+searches, and a whole batch of prospects is one np.searchsorted call.
+
+Tables live in DATA_DIR/percentiles/<POS>.npz and grow one draft class
+at a time through add_class(), no full rebuild needed.
+
+    python -m analytics.percentiles build
+    python -m analytics.percentiles query WR rec_yds_per_game 85.5 --era 2010s
+'''
+
+import argparse
+import json
+import os
+
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+import config
+import db.loader as Loader
+from analytics import features
+from parse.pfr_parser import POSITION_SCHEMA
+
+
+_ALL = "all"
+
+
+def era_of(year: int) -> str:
+    ''' 2013 -> "2010s" '''
+    return f"{int(year) // 10 * 10}s"
+
+
+def percentile_columns(position: str) -> List[str]:
+    '''
+    :param position: key of POSITION_SCHEMA
+    :return        : feature columns + <stat>_per_game for every counting stat
+    '''
+    columns = features.feature_columns(position)
+    rates = [f"{field}_per_game" for field in sorted(POSITION_SCHEMA[position]["type_int"])
+             if field != "games" and field in columns]
+    return columns + rates
+
+
+def _column_values(df: pd.DataFrame, columns: List[str]) -> Dict[str, np.ndarray]:
+    ''' column -> float array, per-game rates derived on the fly '''
+    base = [column for column in columns if not column.endswith("_per_game")]
+    X = features.feature_matrix(df, base)
+    values = {column: X[:, index] for index, column in enumerate(base)}
+
+    games = values.get("games")
+    for column in columns:
+        if column.endswith("_per_game"):
+            stat = values.get(column[:-len("_per_game")])
+            if stat is None or games is None:
+                continue
+            with np.errstate(divide="ignore", invalid="ignore"):
+                values[column] = np.where(games > 0, stat / games, np.nan)
+    return values
+
+
+class PercentileTable:
+    '''
+    Sorted value arrays for one position, keyed by (era, column)
+    '''
+
+    def __init__(self, position: str):
+        self.position = position.upper()
+        self.columns = percentile_columns(self.position)
+        self.arrays: Dict[Tuple[str, str], np.ndarray] = {}
+        self.years: set = set()
+
+    # ---- Building ----
+    def add_class(self, df: pd.DataFrame, year: int = None) -> "PercentileTable":
+        '''
+        Merge one draft class into the sorted arrays. A class already in
+        the table is skipped, so re-running an update is harmless
+
+        :param df  : draftees of this position from one draft year
+        :param year: draft year, falls back to df["year"]
+        :return    : self
+        '''
+        if year is None:
+            years = df["year"].dropna().unique() if "year" in df.columns else []
+            if len(years) != 1:
+                raise ValueError("[ERROR] add_class needs a single draft year <PercentileTable>")
+            year = int(years[0])
+        if year in self.years:
+            return self
+
+        values = _column_values(df, self.columns)
+        for column, column_values in values.items():
+            new = np.sort(column_values[~np.isnan(column_values)])
+            if not len(new):
+                continue
+            for era in (_ALL, era_of(year)):
+                current = self.arrays.get((era, column))
+                if current is None:
+                    self.arrays[(era, column)] = new
+                else:
+                    #linear merge of two sorted arrays
+                    self.arrays[(era, column)] = np.insert(current, np.searchsorted(current, new), new)
+
+        self.years.add(year)
+        return self
+
+    @classmethod
+    def build(cls, position: str, draftees: pd.DataFrame) -> "PercentileTable":
+        '''
+        :param position: key of POSITION_SCHEMA
+        :param draftees: every drafted player at the position, needs a year column
+        :return        : table holding every class in draftees
+        '''
+        table = cls(position)
+        for year, class_df in draftees.groupby("year"):
+            table.add_class(class_df, year=int(year))
+        return table
+
+    # ---- Queries ----
+    def percentile(self, column: str, values, *, era: str = None) -> np.ndarray:
+        '''
+        Mid-rank percentile (ties count half) of values against the table
+
+        :param column: one of self.columns
+        :param values: scalar or array of raw values
+        :param era   : OPTIONAL era like "2010s", all eras otherwise
+        :return      : percentiles in [0, 100], NaN where value or table is missing
+        '''
+        array = self.arrays.get((era or _ALL, column))
+        values = np.asarray(values, dtype=np.float64)
+        if array is None or not len(array):
+            return np.full(values.shape, np.nan)
+
+        left = np.searchsorted(array, values, side="left")
+        right = np.searchsorted(array, values, side="right")
+        out = (left + right) / (2 * len(array)) * 100
+        return np.where(np.isnan(values), np.nan, out)
+
+    def rank(self, prospects: pd.DataFrame, *, era: str = None) -> pd.DataFrame:
+        '''
+        :param prospects: frame of players at this position
+        :param era      : OPTIONAL era
+        :return         : frame of percentiles, one column per table column
+        '''
+        values = _column_values(prospects, self.columns)
+        return pd.DataFrame(
+            {column: self.percentile(column, values[column], era=era)
+             for column in self.columns if column in values},
+            index=prospects.index,
+        )
+
+    # ---- Persistence ----
+    def save(self, path: str = None) -> str:
+        path = path or table_path(self.position)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        arrays = {f"{era}::{column}": array for (era, column), array in self.arrays.items()}
+        arrays["__years__"] = np.array(sorted(self.years), dtype=np.int64)
+
+        #np.savez appends .npz unless it's already there
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, position: str, path: str = None) -> "PercentileTable":
+        table = cls(position)
+        with np.load(path or table_path(position)) as data:
+            for key in data.files:
+                if key == "__years__":
+                    table.years = set(int(year) for year in data[key])
+                    continue
+                era, _, column = key.partition("::")
+                table.arrays[(era, column)] = data[key]
+        return table
+
+
+# ---- Module Helpers ----
+def table_path(position: str) -> str:
+    return os.path.join(config.DATA_DIR, "percentiles", f"{position.upper()}.npz")
+
+
+_TABLES: Dict[str, PercentileTable] = {}
+
+
+def get_table(position: str) -> PercentileTable:
+    ''' Loaded once per process '''
+    position = position.upper()
+    if position not in _TABLES:
+        _TABLES[position] = PercentileTable.load(position)
+    return _TABLES[position]
+
+
+def build_all() -> Dict[str, str]:
+    '''
+    Builds + saves a table per position from the JSON draftee profiles,
+    only adding draft classes the saved table doesn't have yet
+
+    :return: position -> saved path
+    '''
+    out = {}
+    for position in POSITION_SCHEMA:
+        draftees = Loader.get_draftees_by_position(position=position)
+        if draftees.empty or "year" not in draftees.columns:
+            print(f"[WARNING] No draftees for {position}")
+            continue
+
+        path = table_path(position)
+        table = PercentileTable.load(position) if os.path.exists(path) else PercentileTable(position)
+        before = len(table.years)
+        for year, class_df in draftees.groupby("year"):
+            table.add_class(class_df, year=int(year))
+
+        out[position] = table.save(path)
+        _TABLES[position] = table
+        print(f"[INFO] {position}: added {len(table.years) - before} classes, "
+              f"{len(table.years)} total")
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-position percentile tables")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build")
+    query = sub.add_parser("query")
+    query.add_argument("position")
+    query.add_argument("column")
+    query.add_argument("values", type=float, nargs="+")
+    query.add_argument("--era", default=None)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_all()
+        return
+
+    table = get_table(args.position)
+    result = table.percentile(args.column, args.values, era=args.era)
+    print(json.dumps(dict(zip(map(str, args.values), np.round(result, 2).tolist()))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+'''
+Progression signals computed in bulk over the season store:
+year-over-year growth, best season, breakout age and final-year share.
+Everything is groupby / shift over the whole long frame, no per-player loop.
+
+    python -m analytics.progression WR
+'''
+
+import argparse
+import os
+
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+import config
+import db.seasons as StoreSeasons
+
+
+#stat that defines "production" for each position
+PRIMARY_STAT: Dict[str, str] = {
+    "QB": "pass_yds",
+    "RB": "rush_yds",
+    "WR": "rec_yds",
+    "OL": "games",
+    "DT": "tackles_loss",
+    "CB": "pass_defended",
+    "OLB": "tackles_loss",
+}
+
+#a breakout season reaches this quantile of every per-game season at the position
+BREAKOUT_QUANTILE = 0.75
+
+
+def player_progression(seasons: pd.DataFrame, position: str) -> pd.DataFrame:
+    '''
+    :param seasons : long frame from db.seasons
+    :param position: key of POSITION_SCHEMA
+    :return        : one row per player with seasons, best_season, best_value,
+                     breakout_season, breakout_age, final_year_share, final_yoy
+    '''
+    position = position.upper()
+    primary = PRIMARY_STAT[position]
+    if seasons.empty:
+        return pd.DataFrame(columns=["player_key", "seasons", "best_season", "best_value",
+                                     "breakout_season", "breakout_age", "final_year_share", "final_yoy"])
+
+    df = seasons.sort_values(["player_key", "season"]).reset_index(drop=True)
+    keys = df["player_key"]
+    value = df[primary].astype("float64")
+    games = df["games"].astype("float64") if "games" in df.columns else pd.Series(np.nan, index=df.index)
+    per_game = value / games.where(games > 0)
+
+    grouped = value.groupby(keys)
+
+    #best season, -inf keeps all-NaN players from breaking idxmax
+    best_index = value.fillna(-np.inf).groupby(keys).idxmax()
+    best = pd.DataFrame({
+        "best_season": df.loc[best_index.to_numpy(), "season"].to_numpy(),
+        "best_value": value.loc[best_index.to_numpy()].to_numpy(),
+    }, index=best_index.index)
+    best.loc[best["best_value"].isna(), "best_season"] = pd.NA
+
+    #breakout = first season at or above the position wide per-game threshold
+    threshold = per_game.quantile(BREAKOUT_QUANTILE)
+    broke_out = df.loc[per_game >= threshold, ["player_key", "season", "age"]]
+    #df is sorted by season, keep season + age from the same (first) breakout row
+    first_breakout = broke_out.drop_duplicates("player_key").set_index("player_key")
+    first_breakout.columns = ["breakout_season", "breakout_age"]
+
+    #final season share of career production + growth into it
+    last_index = df.groupby("player_key").tail(1).index
+    career = grouped.sum(min_count=1)
+    previous = grouped.shift(1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        final_yoy = (value - previous) / previous.where(previous != 0)
+    final = pd.DataFrame({
+        "final_value": value.loc[last_index].to_numpy(),
+        "final_yoy": final_yoy.loc[last_index].to_numpy(),
+    }, index=keys.loc[last_index].to_numpy())
+
+    out = pd.DataFrame({"seasons": keys.value_counts()})
+    out = out.join(best).join(first_breakout).join(final)
+    out["final_year_share"] = out["final_value"] / career.where(career != 0)
+    out = out.drop(columns=["final_value"])
+    out.index.name = "player_key"
+
+    return out.reset_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk progression metrics over the season store")
+    parser.add_argument("position")
+    parser.add_argument("--out", default=None, help="OPTIONAL parquet path")
+    args = parser.parse_args()
+
+    position = args.position.upper()
+    progression = player_progression(StoreSeasons.read_seasons(position), position)
+    out = args.out or os.path.join(config.DATA_DIR, "seasons", f"{position}_progression.parquet")
+    progression.to_parquet(out, index=False)
+    print(progression.head(20).to_string())
+    print(f"[INFO] {len(progression)} players written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+'''
+Sleeper scoring: how much career_av a player type returns over what
+their draft slot predicts.
+
+Per position we fit
+    expected career_av = a + b * log(pick)
+over every historical draftee, cluster the draftees on standardized
+features, and average the residual ("value over slot") per cluster.
+A prospect's score is the value over slot of the clusters it looks like,
+soft assigned so weight changes move the ranking smoothly.
+
+Fitted models are cached on disk + in memory, keyed by the content hash
+of the training rows, so re-ranking with new weights never refits.
+
+    python -m analytics.scoring --top 25 --weight rec_yds=2 --weight weight=0.5
+'''
+
+import argparse
+import os
+import pickle
+import time
+
+from dataclasses import dataclass
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+
+import config
+import db.loader as Loader
+import db.snapshot as Snapshots
+from analytics import features
+from pos_models import POSITION_CLASS_MAP
+
+
+#bump when the fitting math changes so old pickles are ignored
+SCORING_VERSION = "1"
+
+#pseudo-count that pulls small clusters' value over slot toward 0
+_SHRINKAGE = 10.0
+
+
+@dataclass
+class ScoringModel:
+    ''' Everything needed to score a position without the training data '''
+
+    position       : str
+    version        : str
+    columns        : List[str]
+    mean           : np.ndarray
+    scale          : np.ndarray
+    centroids      : np.ndarray       #(k, d), standardized space
+    curve          : np.ndarray       #np.polyfit coefficients on log(pick)
+    value_over_slot: np.ndarray       #(k,)
+    counts         : np.ndarray       #(k,) draftees per cluster
+
+    def expected_av(self, picks: np.ndarray) -> np.ndarray:
+        return np.polyval(self.curve, np.log(np.asarray(picks, dtype=np.float64)))
+
+
+# ---- Fitting ----
+def fit_position(draftees: pd.DataFrame, position: str,
+                 *, k: int = config.SCORING_CLUSTERS, version: str = None) -> ScoringModel:
+    '''
+    :param draftees: historical draftees of one position, needs pick + career_av
+    :param position: key of POSITION_SCHEMA
+    :param k       : number of feature clusters
+    :param version : OPTIONAL data version to stamp on the model
+    :return        : fitted ScoringModel
+    '''
+    columns = features.feature_columns(position)
+    picks = pd.to_numeric(draftees.get("pick"), errors="coerce").to_numpy(dtype=np.float64)
+    career_av = pd.to_numeric(draftees.get("career_av"), errors="coerce").to_numpy(dtype=np.float64)
+
+    usable = ~(np.isnan(picks) | np.isnan(career_av)) & (picks > 0)
+    if usable.sum() < k:
+        raise ValueError(f"[ERROR] Only {usable.sum()} usable {position} draftees for k={k}")
+
+    picks, career_av = picks[usable], career_av[usable]
+    X = features.feature_matrix(draftees.iloc[np.flatnonzero(usable)], columns)
+    mean, scale = features.fit_scaler(X)
+    Z = features.standardize(X, mean, scale)
+
+    #slot baseline
+    curve = np.polyfit(np.log(picks), career_av, deg=1)
+    residual = career_av - np.polyval(curve, np.log(picks))
+
+    #cluster residuals, shrunk toward zero for thin clusters
+    kmeans = KMeans(n_clusters=k, n_init=10, random_state=0).fit(Z)
+    labels = kmeans.labels_
+    counts = np.bincount(labels, minlength=k).astype(np.float64)
+    sums = np.bincount(labels, weights=residual, minlength=k)
+    value_over_slot = sums / (counts + _SHRINKAGE)
+
+    return ScoringModel(
+        position=position,
+        version=version or features.data_version(draftees, columns, k, SCORING_VERSION),
+        columns=columns,
+        mean=mean,
+        scale=scale,
+        centroids=kmeans.cluster_centers_,
+        curve=curve,
+        value_over_slot=value_over_slot,
+        counts=counts,
+    )
+
+
+# ---- Model Cache ----
+_MODELS: Dict[Tuple[str, str], ScoringModel] = {}
+
+
+def _model_path(position: str, version: str) -> str:
+    return os.path.join(config.MODEL_DIR, f"scoring_{position}_{version}.pkl")
+
+
+def load_or_fit(position: str, *, k: int = config.SCORING_CLUSTERS,
+                draftees: pd.DataFrame = None) -> ScoringModel:
+    '''
+    Memory -> disk -> fit, keyed by the data version of the draftees
+
+    :param position: key of POSITION_SCHEMA
+    :param k       : number of feature clusters
+    :param draftees: OPTIONAL training frame, loads the JSON profiles otherwise
+    :return        : ScoringModel
+    '''
+    position = position.upper()
+    if draftees is None:
+        draftees = Loader.get_draftees_by_position(position=position)
+
+    version = features.data_version(draftees, [*features.feature_columns(position), "pick", "career_av"],
+                                    k, SCORING_VERSION)
+    key = (position, version)
+    if key in _MODELS:
+        return _MODELS[key]
+
+    path = _model_path(position, version)
+    if os.path.exists(path):
+        with open(path, "rb") as file_ref:
+            model = pickle.load(file_ref)
+    else:
+        model = fit_position(draftees, position, k=k, version=version)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file_ref:
+            pickle.dump(model, file_ref)
+
+    _MODELS[key] = model
+    return model
+
+
+def load_models(*, k: int = config.SCORING_CLUSTERS) -> Dict[str, ScoringModel]:
+    '''
+    :param k: number of feature clusters
+    :return : position -> ScoringModel for every position with draftees
+    '''
+    models = {}
+    for position in POSITION_CLASS_MAP.keys():
+        try:
+            models[position] = load_or_fit(position, k=k)
+        except ValueError as e:
+            print(f"[WARNING] Skipping {position}: {e}")
+    return models
+
+
+# ---- Scoring ----
+def _weight_vector(columns: List[str], weights: Dict[str, float]) -> np.ndarray:
+    out = np.ones(len(columns), dtype=np.float64)
+    for index, column in enumerate(columns):
+        if weights and column in weights:
+            out[index] = float(weights[column])
+    return out
+
+
+def score_matrix(model: ScoringModel, X: np.ndarray,
+                 *, weights: Dict[str, float] = None,
+                 temperature: float = 1.0) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    One pass over a whole class: weighted distance to every centroid,
+    softmax into cluster probabilities, dot with value over slot
+
+    :param model      : fitted ScoringModel
+    :param X          : raw feature matrix in model.columns order
+    :param weights    : OPTIONAL column -> weight, 0 ignores a feature
+    :param temperature: softmax temperature, lower = closer to hard assignment
+    :return           : (scores (n,), hard cluster labels (n,))
+    '''
+    Z = features.standardize(X, model.mean, model.scale)
+    w = _weight_vector(model.columns, weights)
+
+    #(n, k) weighted squared distances
+    diff = Z[:, None, :] - model.centroids[None, :, :]
+    dist = np.einsum("nkd,nkd,d->nk", diff, diff, w)
+
+    logits = -dist / max(temperature, 1e-9)
+    logits -= logits.max(axis=1, keepdims=True)
+    prob = np.exp(logits)
+    prob /= prob.sum(axis=1, keepdims=True)
+
+    return prob @ model.value_over_slot, dist.argmin(axis=1)
+
+
+def score_class(prospects: Dict[str, pd.DataFrame] = None,
+                *, models: Dict[str, ScoringModel] = None,
+                weights: Dict[str, float] = None,
+                temperature: float = 1.0,
+                k: int = config.SCORING_CLUSTERS,
+                connection=None) -> pd.DataFrame:
+    '''
+    Scores the current prospect class for every position. Pass in the
+    prospects + models from a previous call to re-rank without touching disk
+
+    :param prospects  : OPTIONAL position -> prospect frame or ProspectBatch, loads from sqlite otherwise
+    :param models     : OPTIONAL position -> ScoringModel, load_models() otherwise
+    :param weights    : OPTIONAL column -> weight
+    :param temperature: softmax temperature
+    :param k          : number of feature clusters
+    :param connection : OPTIONAL sqlite connection prospects are loaded from (EXAMPLE :: a pinned snapshot)
+    :return           : one frame, best score first
+    '''
+    if models is None:
+        models = load_models(k=k)
+    if prospects is None:
+        #one query for every position, straight into columnar batches
+        prospects = Loader.load_prospect_batches(list(models), connection=connection)
+
+    frames = []
+    for position, model in models.items():
+        df = prospects.get(position)
+        if df is None or not len(df):
+            continue
+
+        X = features.feature_matrix(df, model.columns)
+        scores, clusters = score_matrix(model, X, weights=weights, temperature=temperature)
+
+        frames.append(pd.DataFrame({
+            "name": np.asarray(df["name"]),
+            "position": position,
+            "college": np.asarray(df["college"]) if "college" in df.columns else None,
+            "cluster": clusters,
+            "cluster_value_over_slot": model.value_over_slot[clusters],
+            "score": scores,
+        }))
+
+    if not frames:
+        return pd.DataFrame(columns=["name", "position", "college", "cluster",
+                                     "cluster_value_over_slot", "score"])
+
+    ranked = pd.concat(frames, ignore_index=True).sort_values("score", ascending=False)
+    return ranked.reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank the prospect class by value over slot")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--k", type=int, default=config.SCORING_CLUSTERS)
+    parser.add_argument("--temperature", type=float, default=1.0)
+    parser.add_argument("--weight", action="append", default=[], metavar="COLUMN=W")
+    parser.add_argument("--snapshot", default=config.SNAPSHOT_ID,
+                        help="read prospects from this snapshot id (or latest), the live DB otherwise")
+    args = parser.parse_args()
+
+    weights = {}
+    for item in args.weight:
+        column, _, value = item.partition("=")
+        weights[column] = float(value)
+
+    #load once, then time only the re-rank a scout would trigger
+    models = load_models(k=args.k)
+    connection = Snapshots.open_snapshot(args.snapshot) if args.snapshot else None
+    prospects = Loader.load_prospect_batches(list(models), connection=connection)
+
+    start = time.perf_counter()
+    ranked = score_class(prospects, models=models, weights=weights, temperature=args.temperature)
+    elapsed = time.perf_counter() - start
+
+    print(ranked.head(args.top).to_string())
+    print(f"[INFO] Scored {len(ranked)} prospects in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
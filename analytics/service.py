@@ -0,0 +1,470 @@
+'''
+Local HTTP/JSON query service for draft weekend.
+
+Per position it keeps warm: the scoring model, the standardized draftee
+matrix + a nearest-neighbor index over it, the current prospects with
+their scores, clusters and percentile ranks. Rendered responses sit in
+an LRU in front of that. Everything is dropped and lazily rebuilt when
+prospects.db (or its WAL) or the draftee profiles change on disk.
+
+    GET /health
+    GET /prospects/<POS>?limit=50                ranked prospects
+    GET /prospect/<POS>/<name>                   one prospect, score + cluster + percentiles
+    GET /comps/<POS>/<name>?k=10                 closest historical draftees
+    GET /clusters/<POS>/<cluster>?limit=25       cluster value + members
+    GET /percentiles/<POS>/<name>?era=2010s      percentile ranks
+    GET /search?q=<name>&position=&college=      ranked fuzzy name search (typeahead)
+    GET /__stats__                               cache + reload counters
+
+    python -m analytics.service --warm
+'''
+
+import argparse
+import json
+import math
+import os
+import threading
+import time
+
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs
+from urllib.parse import unquote
+from urllib.parse import urlsplit
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import NearestNeighbors
+
+import config
+import metrics
+import db.loader as Loader
+import db.sqlite as StoreSQL
+from analytics import features
+from analytics import percentiles
+from analytics import scoring
+from pos_models import POSITION_CLASS_MAP
+
+
+#how often (seconds) the data files are stat()ed for changes
+_CHECK_INTERVAL = 0.5
+
+_DRAFTEE_FIELDS = ["name", "year", "pick", "college", "career_av"]
+
+
+class NotFound(Exception):
+    pass
+
+
+def _clean(value: Any) -> Any:
+    ''' numpy / pandas scalars -> JSON types, NaN -> null '''
+    if isinstance(value, dict):
+        return {key: _clean(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return value
+
+
+def _column(df: pd.DataFrame, column: str) -> np.ndarray:
+    return df[column].to_numpy() if column in df.columns else np.full(len(df), None, dtype=object)
+
+
+# ---- Warm State ----
+class PositionState:
+    '''
+    Everything a query needs for one position, built once per data change
+    '''
+
+    def __init__(self, position: str, connection=None, *, db_path: str = None):
+        self.position = position
+        self.db_path = db_path
+        started = time.perf_counter()
+
+        #historical side
+        self.draftees = Loader.get_draftees_by_position(position=position).reset_index(drop=True)
+        self.model = scoring.load_or_fit(position, draftees=self.draftees)
+        X = features.feature_matrix(self.draftees, self.model.columns)
+        self.draftee_Z = features.standardize(X, self.model.mean, self.model.scale)
+        self.draftee_clusters = self._nearest_centroid(self.draftee_Z)
+        self.neighbors = NearestNeighbors().fit(self.draftee_Z) if len(self.draftee_Z) else None
+
+        path = percentiles.table_path(position)
+        self.table = percentiles.PercentileTable.load(position) if os.path.exists(path) \
+            else percentiles.PercentileTable.build(position, self.draftees)
+
+        #current class
+        self.prospects = Loader.get_prospects_by_position(position=position, connection=connection)
+        self.prospects = self.prospects.reset_index(drop=True)
+        P = features.feature_matrix(self.prospects, self.model.columns)
+        self.prospect_Z = features.standardize(P, self.model.mean, self.model.scale)
+        self.scores, self.prospect_clusters = scoring.score_matrix(self.model, P)
+        self.prospect_percentiles = self.table.rank(self.prospects)
+
+        self._names = {}
+        for index, name in enumerate(_column(self.prospects, "name")):
+            self._names.setdefault(str(name).lower(), index)
+
+        metrics.observe("service_build_seconds", time.perf_counter() - started, position=position)
+
+    def _nearest_centroid(self, Z: np.ndarray) -> np.ndarray:
+        if not len(Z):
+            return np.zeros(0, dtype=np.int64)
+        diff = Z[:, None, :] - self.model.centroids[None, :, :]
+        return np.einsum("nkd,nkd->nk", diff, diff).argmin(axis=1)
+
+    def find(self, name: str) -> int:
+        ''' Exact (case-insensitive) name, then the best trigram index match in this class '''
+        key = name.lower()
+        if key in self._names:
+            return self._names[key]
+
+        connection = StoreSQL.sql_get_connection(self.db_path)
+        try:
+            matches = StoreSQL.sql_search_names(name, position=self.position, connection=connection)
+        finally:
+            connection.close()
+        for match in matches:
+            index = self._names.get(str(match["name"]).lower())
+            if index is not None:
+                return index
+        raise NotFound(f"No {self.position} prospect named {name}")
+
+    # ---- Queries ----
+    def ranked(self, limit: int) -> List[Dict]:
+        order = np.argsort(-self.scores)[:limit]
+        return [self._summary(index) for index in order]
+
+    def _summary(self, index: int) -> Dict:
+        row = self.prospects.iloc[index]
+        return {
+            "name": row.get("name"),
+            "college": row.get("college"),
+            "score": self.scores[index],
+            "cluster": self.prospect_clusters[index],
+        }
+
+    def prospect(self, name: str) -> Dict:
+        index = self.find(name)
+        record = self.prospects.iloc[index].to_dict()
+        record.update(self._summary(index))
+        record["cluster_value_over_slot"] = self.model.value_over_slot[self.prospect_clusters[index]]
+        record["percentiles"] = self.prospect_percentiles.iloc[index].to_dict()
+        return record
+
+    def comps(self, name: str, k: int) -> Dict:
+        index = self.find(name)
+        if self.neighbors is None:
+            return {"name": self.prospects.iloc[index]["name"], "comps": []}
+
+        k = min(k, len(self.draftee_Z))
+        distance, rows = self.neighbors.kneighbors(self.prospect_Z[index:index + 1], n_neighbors=k)
+        comps = []
+        for dist, row in zip(distance[0], rows[0]):
+            comp = {field: self.draftees.at[row, field] for field in _DRAFTEE_FIELDS
+                    if field in self.draftees.columns}
+            comp["distance"] = dist
+            comp["cluster"] = self.draftee_clusters[row]
+            comps.append(comp)
+        return {"name": self.prospects.iloc[index]["name"], "comps": comps}
+
+    def cluster(self, cluster: int, limit: int) -> Dict:
+        if not 0 <= cluster < len(self.model.value_over_slot):
+            raise NotFound(f"No cluster {cluster} for {self.position}")
+
+        members = self.draftees.loc[self.draftee_clusters == cluster]
+        if "career_av" in members.columns:
+            members = members.assign(_av=pd.to_numeric(members["career_av"], errors="coerce"))
+            members = members.sort_values("_av", ascending=False)
+        prospects = np.flatnonzero(self.prospect_clusters == cluster)
+
+        return {
+            "position": self.position,
+            "cluster": cluster,
+            "value_over_slot": self.model.value_over_slot[cluster],
+            "draftees": int(len(members)),
+            "top_draftees": [{field: row.get(field) for field in _DRAFTEE_FIELDS}
+                             for row in members.head(limit).to_dict(orient="records")],
+            "prospects": [self._summary(index) for index in prospects[np.argsort(-self.scores[prospects])]],
+        }
+
+    def percentiles(self, name: str, era: str = None) -> Dict:
+        index = self.find(name)
+        ranks = self.prospect_percentiles.iloc[index] if era is None \
+            else self.table.rank(self.prospects.iloc[[index]], era=era).iloc[0]
+        return {"name": self.prospects.iloc[index]["name"], "era": era or "all",
+                "percentiles": ranks.to_dict()}
+
+
+class WarmState:
+    '''
+    Lazily built PositionStates + response LRU, both thrown away whenever
+    the sqlite file or the draftee profiles change
+    '''
+
+    def __init__(self, *, db_path: str = None, cache_size: int = config.SERVICE_CACHE_SIZE):
+        self.db_path = str(db_path or StoreSQL._DATA_PATH)
+        self.cache_size = cache_size
+        self.generation = 0
+        self.reloads = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._positions: Dict[str, PositionState] = {}
+        self._building: Dict[str, threading.Lock] = {}
+        self._responses: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._fingerprint = self._stat()
+        self._checked = time.monotonic()
+
+    def _stat(self) -> Tuple:
+        ''' mtime + size of the DB, its WAL and every profiles/<year> directory '''
+        out = []
+        for path in (self.db_path, self.db_path + "-wal"):
+            try:
+                stat = os.stat(path)
+                out.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                out.append(None)
+
+        profiles = os.path.join(config.CACHE_DIR, "profiles")
+        if os.path.isdir(profiles):
+            with os.scandir(profiles) as entries:
+                out.extend(sorted((entry.name, entry.stat().st_mtime_ns) for entry in entries))
+        return tuple(out)
+
+    def check(self) -> None:
+        ''' Invalidate if anything on disk moved, at most every _CHECK_INTERVAL '''
+        now = time.monotonic()
+        if now - self._checked < _CHECK_INTERVAL:
+            return
+        self._checked = now
+
+        fingerprint = self._stat()
+        if fingerprint != self._fingerprint:
+            self.invalidate(fingerprint)
+
+    def invalidate(self, fingerprint: Tuple = None) -> None:
+        with self._lock:
+            self._fingerprint = fingerprint or self._stat()
+            self._positions = {}
+            self._responses.clear()
+            self.generation += 1
+            self.reloads += 1
+        metrics.inc("service_invalidations_total")
+        print(f"[INFO] Data changed, dropped warm state (generation {self.generation})")
+
+    def position(self, position: str) -> PositionState:
+        position = position.upper()
+        if position not in POSITION_CLASS_MAP:
+            raise NotFound(f"Invalid position {position}")
+
+        state = self._positions.get(position)
+        if state is not None:
+            return state
+
+        #one builder per position, other requests wait for it
+        with self._lock:
+            build_lock = self._building.setdefault(position, threading.Lock())
+        with build_lock:
+            state = self._positions.get(position)
+            if state is None:
+                generation = self.generation
+                connection = StoreSQL.sql_get_connection(self.db_path)
+                try:
+                    state = PositionState(position, connection=connection, db_path=self.db_path)
+                finally:
+                    connection.close()
+                with self._lock:
+                    if generation == self.generation:
+                        self._positions[position] = state
+        return state
+
+    def search(self, query: str, *, position: str = None, college: str = None, limit: int = 10) -> List[Dict]:
+        connection = StoreSQL.sql_get_connection(self.db_path)
+        try:
+            return StoreSQL.sql_search_names(query, position=position, college=college,
+                                             limit=limit, connection=connection)
+        finally:
+            connection.close()
+
+    def warm(self) -> None:
+        for position in POSITION_CLASS_MAP:
+            try:
+                self.position(position)
+            except Exception as e:
+                print(f"[WARNING] Could not warm {position}: {e}")
+
+    # ---- Response Cache ----
+    def cached(self, key: Tuple) -> bytes:
+        with self._lock:
+            body = self._responses.get(key)
+            if body is not None:
+                self._responses.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return body
+
+    def store(self, key: Tuple, body: bytes, generation: int) -> None:
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._responses[key] = body
+            if len(self._responses) > self.cache_size:
+                self._responses.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {"generation": self.generation, "reloads": self.reloads,
+                "cache_entries": len(self._responses), "cache_hits": self.hits,
+                "cache_misses": self.misses, "warm_positions": sorted(self._positions)}
+
+
+# ---- Routing ----
+def _int(query: Dict[str, List[str]], name: str, default: int) -> int:
+    try:
+        return int(query.get(name, [default])[0])
+    except ValueError:
+        raise NotFound(f"{name} must be an integer")
+
+
+def route(state: WarmState, path: str, query: Dict[str, List[str]]) -> Tuple[str, Any]:
+    '''
+    :param state: WarmState
+    :param path : URL path
+    :param query: parse_qs output
+    :return     : (endpoint name for metrics, JSON-able payload)
+    '''
+    parts = [unquote(part) for part in path.strip("/").split("/") if part]
+    if not parts or parts == ["health"]:
+        return "health", {"status": "ok", "generation": state.generation}
+
+    endpoint, args = parts[0], parts[1:]
+    if endpoint == "search" and not args:
+        text = query.get("q", [""])[0]
+        if not text.strip():
+            raise NotFound("q is required")
+        return endpoint, state.search(text, position=query.get("position", [None])[0],
+                                      college=query.get("college", [None])[0],
+                                      limit=_int(query, "limit", 10))
+    if endpoint == "prospects" and len(args) == 1:
+        return endpoint, state.position(args[0]).ranked(_int(query, "limit", 50))
+    if endpoint == "prospect" and len(args) == 2:
+        return endpoint, state.position(args[0]).prospect(args[1])
+    if endpoint == "comps" and len(args) == 2:
+        return endpoint, state.position(args[0]).comps(args[1], _int(query, "k", 10))
+    if endpoint == "clusters" and len(args) == 2:
+        if not args[1].isdigit():
+            raise NotFound("cluster must be an integer")
+        return endpoint, state.position(args[0]).cluster(int(args[1]), _int(query, "limit", 25))
+    if endpoint == "percentiles" and len(args) == 2:
+        return endpoint, state.position(args[0]).percentiles(args[1], query.get("era", [None])[0])
+    raise NotFound(f"No route for {path}")
+
+
+class _QueryHandler(BaseHTTPRequestHandler):
+
+    server_version = "NGSQuery/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        started = time.perf_counter()
+        state: WarmState = self.server.state
+        url = urlsplit(self.path)
+
+        if url.path == "/__stats__":
+            self._send(200, json.dumps(state.stats()).encode("utf-8"))
+            return
+
+        state.check()
+        key = (url.path, url.query)
+        generation = state.generation
+        body = state.cached(key)
+        endpoint = "cached"
+        status = 200
+
+        if body is None:
+            try:
+                endpoint, payload = route(state, url.path, parse_qs(url.query))
+                body = json.dumps(_clean(payload)).encode("utf-8")
+                state.store(key, body, generation)
+            except NotFound as e:
+                status, body = 404, json.dumps({"error": str(e)}).encode("utf-8")
+            except Exception as e:
+                status, body = 500, json.dumps({"error": f"{type(e).__name__}: {e}"}).encode("utf-8")
+
+        self._send(status, body)
+        metrics.observe("service_latency_seconds", time.perf_counter() - started, endpoint=endpoint)
+
+    def _send(self, status: int, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        return
+
+
+class QueryServer(ThreadingHTTPServer):
+    ''' Threaded query server, start() runs it on a daemon thread '''
+
+    daemon_threads = True
+
+    def __init__(self, host: str = config.SERVICE_HOST, port: int = config.SERVICE_PORT,
+                 *, state: WarmState = None):
+        super().__init__((host, port), _QueryHandler)
+        self.state = state or WarmState()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "QueryServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="ngs-query", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local prospect query service")
+    parser.add_argument("--host", default=config.SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVICE_PORT)
+    parser.add_argument("--warm", action="store_true", help="build every position before serving")
+    args = parser.parse_args()
+
+    server = QueryServer(args.host, args.port)
+    if args.warm:
+        started = time.perf_counter()
+        server.state.warm()
+        print(f"[INFO] Warmed in {time.perf_counter() - started:.1f}s")
+
+    print(f"[INFO] Serving on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+'''
+Bootstrap stability of the per-position draftee clusters.
+
+N resamples (with replacement) of a position's draftees are refit in
+parallel against a shared-memory copy of the standardized matrix. Each
+resample only sends back an int8 label per draftee (-1 = not drawn),
+so the whole run is a (resamples, n) int8 array, never an n x n float.
+
+From that we derive
+    per player : how often same-cluster partners stay with the player
+    per cluster: mean / min Jaccard of the best matching bootstrap cluster
+and pairwise co-assignment frequencies on demand, one row block at a time.
+
+    python -m analytics.stability WR --resamples 200
+'''
+
+import argparse
+import os
+import time
+
+from multiprocessing import Pool
+
+from typing import Iterator
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+
+import config
+import db.loader as Loader
+from analytics import features
+from analytics import sweep
+
+
+#clusters whose mean Jaccard falls below this are "dissolved" (Hennig 2007)
+STABLE_JACCARD = 0.75
+
+_NOT_DRAWN = -1
+
+
+# ---- Resampling ----
+def _resample(task: Tuple[str, int, int]) -> np.ndarray:
+    ''' Worker: refit on one bootstrap draw, label every drawn draftee '''
+    position, k, seed = task
+    Z, _ = sweep.shared_view(position)
+    n = len(Z)
+
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, n, size=n)
+    drawn = np.unique(rows)
+
+    model = KMeans(n_clusters=k, n_init=3, random_state=seed).fit(Z[rows])
+    labels = np.full(n, _NOT_DRAWN, dtype=np.int8)
+    labels[drawn] = model.predict(Z[drawn])
+    return labels
+
+
+def bootstrap_labels(Z: np.ndarray, k: int, *, resamples: int = 200,
+                     workers: int = None, seed: int = 0, position: str = "X") -> np.ndarray:
+    '''
+    :param Z        : standardized matrix (n, d)
+    :param k        : clusters per fit, < 128
+    :param resamples: bootstrap draws
+    :param workers  : OPTIONAL process count, os.cpu_count() otherwise
+    :param seed     : base seed, draw i uses seed + i
+    :param position : label for the shared block
+    :return         : int8 (resamples, n), -1 where the draftee wasn't drawn
+    '''
+    block, descriptor = sweep.share_matrix(Z, [])
+    try:
+        tasks = [(position, k, seed + i) for i in range(resamples)]
+        out = np.empty((resamples, len(Z)), dtype=np.int8)
+        with Pool(processes=workers, initializer=sweep.attach, initargs=({position: descriptor},)) as pool:
+            for i, labels in enumerate(pool.imap(_resample, tasks, chunksize=4)):
+                out[i] = labels
+    finally:
+        block.close()
+        block.unlink()
+    return out
+
+
+# ---- Stability ----
+def _contingency(reference: np.ndarray, labels: np.ndarray, k: int) -> np.ndarray:
+    ''' (k, k) counts of drawn draftees by (reference cluster, bootstrap cluster) '''
+    drawn = labels != _NOT_DRAWN
+    table = np.zeros((k, k), dtype=np.int64)
+    np.add.at(table, (reference[drawn], labels[drawn]), 1)
+    return table
+
+
+def player_stability(reference: np.ndarray, boot: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Share of a player's reference-cluster partners that land in the same
+    bootstrap cluster, averaged over the draws the player was in. O(n) per
+    draw: partners together = contingency[c, b] - 1.
+
+    :param reference: (n,) labels of the full-data fit
+    :param boot     : (resamples, n) from bootstrap_labels
+    :param k        : clusters
+    :return         : (stability in [0, 1] / NaN, times drawn)
+    '''
+    n = boot.shape[1]
+    together = np.zeros(n, dtype=np.float64)
+    partners = np.zeros(n, dtype=np.float64)
+    drawn_count = np.zeros(n, dtype=np.int64)
+
+    for labels in boot:
+        drawn = np.flatnonzero(labels != _NOT_DRAWN)
+        table = _contingency(reference, labels, k)
+        cluster_drawn = table.sum(axis=1)
+
+        c, b = reference[drawn], labels[drawn]
+        together[drawn] += table[c, b] - 1
+        partners[drawn] += cluster_drawn[c] - 1
+        drawn_count[drawn] += 1
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stability = together / partners
+    stability[partners == 0] = np.nan
+    return stability, drawn_count
+
+
+def cluster_stability(reference: np.ndarray, boot: np.ndarray, k: int) -> np.ndarray:
+    '''
+    Best-match Jaccard of every reference cluster in every draw
+
+    :return: float (resamples, k), NaN where the cluster had no drawn members
+    '''
+    jaccard = np.full((len(boot), k), np.nan)
+    for i, labels in enumerate(boot):
+        table = _contingency(reference, labels, k).astype(np.float64)
+        union = table.sum(axis=1)[:, None] + table.sum(axis=0)[None, :] - table
+        with np.errstate(divide="ignore", invalid="ignore"):
+            best = np.nanmax(np.where(union > 0, table / union, np.nan), axis=1)
+        jaccard[i] = np.where(table.sum(axis=1) > 0, best, np.nan)
+    return jaccard
+
+
+def coassignment_blocks(boot: np.ndarray, *, block: int = 512) -> Iterator[Tuple[slice, np.ndarray]]:
+    '''
+    Pairwise co-assignment frequency, block x n at a time so memory stays
+    O(block * n) regardless of how many draftees there are
+
+    :param boot : (resamples, n) from bootstrap_labels
+    :param block: rows per block
+    :return     : iterator of (row slice, float32 (rows, n) frequency, NaN if never drawn together)
+    '''
+    n = boot.shape[1]
+    drawn = boot != _NOT_DRAWN
+    for start in range(0, n, block):
+        rows = slice(start, min(start + block, n))
+        together = np.zeros((rows.stop - start, n), dtype=np.uint16)
+        both = np.zeros((rows.stop - start, n), dtype=np.uint16)
+        for labels, mask in zip(boot, drawn):
+            pair = mask[rows, None] & mask[None, :]
+            both += pair
+            together += pair & (labels[rows, None] == labels[None, :])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            yield rows, np.where(both > 0, together / both, np.nan).astype(np.float32)
+
+
+def top_coassigned(boot: np.ndarray, index: int, *, top: int = 10) -> pd.DataFrame:
+    ''' A single player's most frequent cluster-mates, one row of the co-assignment matrix '''
+    drawn = boot != _NOT_DRAWN
+    both = (drawn[:, [index]] & drawn).sum(axis=0)
+    together = ((boot[:, [index]] == boot) & drawn[:, [index]] & drawn).sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frequency = np.where(both > 0, together / both, np.nan)
+    frequency[index] = np.nan
+
+    order = np.argsort(-np.nan_to_num(frequency, nan=-1.0))[:top]
+    return pd.DataFrame({"index": order, "frequency": frequency[order], "drawn_together": both[order]})
+
+
+# ---- Runner ----
+def analyze(draftees: pd.DataFrame, position: str,
+            *, k: int = config.SCORING_CLUSTERS, resamples: int = 200,
+               workers: int = None, seed: int = 0) -> Tuple[pd.DataFrame, pd.DataFrame, np.ndarray]:
+    '''
+    :param draftees : historical draftees of one position
+    :param position : key of POSITION_SCHEMA
+    :param k        : clusters, same default as analytics.scoring
+    :param resamples: bootstrap draws
+    :param workers  : OPTIONAL process count
+    :param seed     : base seed
+    :return         : (per player frame, per cluster frame, raw bootstrap labels)
+    '''
+    columns = features.feature_columns(position)
+    X = features.feature_matrix(draftees, columns)
+    Z = features.standardize(X, *features.fit_scaler(X))
+
+    reference = KMeans(n_clusters=k, n_init=10, random_state=seed).fit(Z).labels_
+    boot = bootstrap_labels(Z, k, resamples=resamples, workers=workers, seed=seed, position=position)
+
+    stability, drawn = player_stability(reference, boot, k)
+    players = pd.DataFrame({
+        "name": draftees.get("name", pd.Series(index=draftees.index, dtype="object")).to_numpy(),
+        "year": draftees.get("year", pd.Series(index=draftees.index, dtype="object")).to_numpy(),
+        "pick": draftees.get("pick", pd.Series(index=draftees.index, dtype="object")).to_numpy(),
+        "cluster": reference,
+        "stability": stability,
+        "times_drawn": drawn,
+    })
+
+    jaccard = cluster_stability(reference, boot, k)
+    clusters = pd.DataFrame({
+        "cluster": np.arange(k),
+        "size": np.bincount(reference, minlength=k),
+        "jaccard_mean": np.nanmean(jaccard, axis=0),
+        "jaccard_min": np.nanmin(jaccard, axis=0),
+        "player_stability": players.groupby("cluster")["stability"].mean().reindex(range(k)).to_numpy(),
+    })
+    clusters["stable"] = clusters["jaccard_mean"] >= STABLE_JACCARD
+
+    return players, clusters, boot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bootstrap cluster stability for one position")
+    parser.add_argument("position")
+    parser.add_argument("--k", type=int, default=config.SCORING_CLUSTERS)
+    parser.add_argument("--resamples", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    position = args.position.upper()
+    draftees = Loader.get_draftees_by_position(position=position).reset_index(drop=True)
+
+    start = time.perf_counter()
+    players, clusters, _ = analyze(draftees, position, k=args.k, resamples=args.resamples,
+                                   workers=args.workers, seed=args.seed)
+    print(f"[INFO] {args.resamples} resamples of {len(players)} {position} draftees "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    out_dir = os.path.join(config.DATA_DIR, "stability")
+    os.makedirs(out_dir, exist_ok=True)
+    players.to_csv(os.path.join(out_dir, f"{position}_players.csv"), index=False)
+    clusters.to_csv(os.path.join(out_dir, f"{position}_clusters.csv"), index=False)
+    print(clusters.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
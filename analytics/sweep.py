@@ -0,0 +1,265 @@
+'''
+Parallel k / feature-subset / scaler sweeps for the per-position clustering.
+
+Each position's feature matrix is copied into multiprocessing.shared_memory
+exactly once. Worker processes attach to it on start-up and fit every
+configuration against zero-copy numpy views, streaming scores back as
+they finish. The runner writes one ranked results CSV per position.
+
+    python -m analytics.sweep --k 2 12 --workers 8
+'''
+
+import argparse
+import itertools
+import os
+import time
+
+from dataclasses import dataclass
+from dataclasses import asdict
+from multiprocessing import Pool
+from multiprocessing import shared_memory
+
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.metrics import adjusted_rand_score
+from sklearn.metrics import silhouette_score
+from threadpoolctl import threadpool_limits
+
+import config
+import db.loader as Loader
+from analytics import features
+from pos_models import POSITION_CLASS_MAP
+
+
+SCALERS = ("standard", "robust", "minmax")
+SUBSETS = ("all", "physical", "production")
+
+#silhouette is O(n^2), sample it past this many rows
+_SILHOUETTE_SAMPLE = 3000
+
+
+@dataclass(frozen=True)
+class SweepConfig:
+    position: str
+    k       : int
+    subset  : str
+    scaler  : str
+    seed    : int = 0
+
+
+@dataclass(frozen=True)
+class _SharedMatrix:
+    ''' What a worker needs to attach: block name + layout '''
+
+    name   : str
+    shape  : Tuple[int, int]
+    dtype  : str
+    columns: Tuple[str, ...]
+
+
+# ---- Shared Memory ----
+def share_matrix(X: np.ndarray, columns: List[str]) -> Tuple[shared_memory.SharedMemory, _SharedMatrix]:
+    '''
+    Copy X into a new shared memory block, the only copy the sweep makes
+
+    :param X      : float64 feature matrix
+    :param columns: column names of X
+    :return       : (owning SharedMemory, descriptor for workers)
+    '''
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    block = shared_memory.SharedMemory(create=True, size=max(X.nbytes, 1))
+    np.ndarray(X.shape, dtype=X.dtype, buffer=block.buf)[:] = X
+    return block, _SharedMatrix(block.name, X.shape, X.dtype.str, tuple(columns))
+
+
+#worker side, filled once by attach
+_VIEWS: Dict[str, Tuple[np.ndarray, Tuple[str, ...]]] = {}
+_BLOCKS: List[shared_memory.SharedMemory] = []
+
+
+def attach(descriptors: Dict[str, _SharedMatrix]) -> None:
+    ''' Pool initializer: map every position's block, one BLAS thread per worker '''
+    threadpool_limits(1)
+    for position, descriptor in descriptors.items():
+        block = shared_memory.SharedMemory(name=descriptor.name)
+        _BLOCKS.append(block)
+        view = np.ndarray(descriptor.shape, dtype=descriptor.dtype, buffer=block.buf)
+        view.flags.writeable = False
+        _VIEWS[position] = (view, descriptor.columns)
+
+
+def shared_view(position: str) -> Tuple[np.ndarray, Tuple[str, ...]]:
+    ''' Worker side: (read-only matrix, columns) for a position '''
+    return _VIEWS[position]
+
+
+# ---- Fitting ----
+def subset_columns(subset: str, columns: Tuple[str, ...]) -> List[int]:
+    ''' Column indexes of a named feature subset '''
+    if subset == "all":
+        return list(range(len(columns)))
+    if subset == "physical":
+        return [i for i, column in enumerate(columns) if column in features.PHYSICALS]
+    if subset == "production":
+        return [i for i, column in enumerate(columns) if column not in features.PHYSICALS]
+    raise ValueError(f"[ERROR] Unknown subset {subset} <subset_columns>")
+
+
+def scale(X: np.ndarray, scaler: str) -> np.ndarray:
+    ''' Returns a new scaled array, the shared view is never written '''
+    if scaler == "standard":
+        center, spread = X.mean(axis=0), X.std(axis=0)
+    elif scaler == "robust":
+        q1, center, q3 = np.percentile(X, [25, 50, 75], axis=0)
+        spread = q3 - q1
+    elif scaler == "minmax":
+        center, spread = X.min(axis=0), X.max(axis=0) - X.min(axis=0)
+    else:
+        raise ValueError(f"[ERROR] Unknown scaler {scaler} <scale>")
+    spread = np.where(spread == 0, 1.0, spread)
+    return (X - center) / spread
+
+
+def _stability(Z: np.ndarray, k: int, seed: int) -> float:
+    ''' ARI between two fits on different 80% subsamples, scored on every row '''
+    rng = np.random.default_rng(seed)
+    n = len(Z)
+    labels = []
+    for _ in range(2):
+        rows = rng.choice(n, size=max(k, int(n * 0.8)), replace=False)
+        model = KMeans(n_clusters=k, n_init=3, random_state=int(rng.integers(1 << 31))).fit(Z[rows])
+        labels.append(model.predict(Z))
+    return float(adjusted_rand_score(*labels))
+
+
+def evaluate(sweep: SweepConfig) -> Dict:
+    '''
+    Worker: fit one configuration against the shared view
+
+    :param sweep: configuration to fit
+    :return     : config fields + silhouette, inertia, stability, seconds
+    '''
+    start = time.perf_counter()
+    X, columns = shared_view(sweep.position)
+    record = asdict(sweep)
+
+    try:
+        cols = subset_columns(sweep.subset, columns)
+        if not cols or len(X) <= sweep.k:
+            raise ValueError("not enough rows / columns")
+
+        Z = scale(X[:, cols], sweep.scaler)
+        model = KMeans(n_clusters=sweep.k, n_init=10, random_state=sweep.seed).fit(Z)
+        sample = min(len(Z), _SILHOUETTE_SAMPLE)
+
+        record.update({
+            "n": len(Z),
+            "features": len(cols),
+            "silhouette": float(silhouette_score(Z, model.labels_, sample_size=sample,
+                                                 random_state=sweep.seed)),
+            "inertia": float(model.inertia_),
+            "stability": _stability(Z, sweep.k, sweep.seed),
+        })
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+
+    record["seconds"] = time.perf_counter() - start
+    return record
+
+
+# ---- Runner ----
+def position_matrix(position: str) -> Tuple[np.ndarray, List[str]]:
+    ''' Draftee feature matrix, NaNs imputed with the column median '''
+    draftees = Loader.get_draftees_by_position(position=position)
+    columns = features.feature_columns(position)
+    X = features.feature_matrix(draftees, columns)
+
+    medians = np.nanmedian(X, axis=0) if len(X) else np.zeros(len(columns))
+    medians = np.where(np.isnan(medians), 0.0, medians)
+    missing = np.isnan(X)
+    X[missing] = np.take(medians, np.nonzero(missing)[1])
+    return X, columns
+
+
+def run_sweep(configs: List[SweepConfig],
+              matrices: Dict[str, Tuple[np.ndarray, List[str]]],
+              *, workers: int = None) -> pd.DataFrame:
+    '''
+    :param configs : every configuration to try
+    :param matrices: position -> (feature matrix, columns)
+    :param workers : OPTIONAL process count, os.cpu_count() otherwise
+    :return        : ranked results, best silhouette + stability first per position,
+                     errored configs last with no rank
+    '''
+    blocks = []
+    descriptors = {}
+    try:
+        for position, (X, columns) in matrices.items():
+            block, descriptor = share_matrix(X, columns)
+            blocks.append(block)
+            descriptors[position] = descriptor
+
+        records = []
+        with Pool(processes=workers, initializer=attach, initargs=(descriptors,)) as pool:
+            for done, record in enumerate(pool.imap_unordered(evaluate, configs), start=1):
+                records.append(record)
+                if "error" in record:
+                    print(f"[WARNING] {record['position']} k={record['k']} {record['error']}")
+                elif done % 25 == 0 or done == len(configs):
+                    print(f"[INFO] {done}/{len(configs)} configs scored")
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    results = pd.DataFrame.from_records(records)
+    if "silhouette" not in results.columns:
+        return results
+
+    #errored configs have no scores, min_count keeps them NaN so they rank last
+    results["rank"] = (results.groupby("position")[["silhouette", "stability"]]
+                       .rank(ascending=False).sum(axis=1, min_count=2)
+                       .groupby(results["position"]).rank(method="min", na_option="bottom"))
+    return results.sort_values(["position", "rank"]).reset_index(drop=True)
+
+
+def build_configs(positions: List[str], ks: range,
+                  *, subsets=SUBSETS, scalers=SCALERS, seeds=(0,)) -> List[SweepConfig]:
+    return [SweepConfig(position, k, subset, scaler, seed)
+            for position, k, subset, scaler, seed in itertools.product(positions, ks, subsets, scalers, seeds)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel clustering sweep over shared-memory matrices")
+    parser.add_argument("--positions", nargs="*", default=list(POSITION_CLASS_MAP.keys()))
+    parser.add_argument("--k", nargs=2, type=int, default=[2, 12], metavar=("MIN", "MAX"))
+    parser.add_argument("--subsets", nargs="*", default=list(SUBSETS))
+    parser.add_argument("--scalers", nargs="*", default=list(SCALERS))
+    parser.add_argument("--seeds", nargs="*", type=int, default=[0])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default=None, help="OPTIONAL directory for the per-position csvs")
+    args = parser.parse_args()
+
+    matrices = {position: position_matrix(position) for position in args.positions}
+    configs = build_configs(args.positions, range(args.k[0], args.k[1] + 1),
+                            subsets=args.subsets, scalers=args.scalers, seeds=args.seeds)
+
+    start = time.perf_counter()
+    results = run_sweep(configs, matrices, workers=args.workers)
+    print(f"[INFO] {len(configs)} configs in {time.perf_counter() - start:.1f}s")
+
+    out = args.out or os.path.join(config.DATA_DIR, "sweeps", f"sweep_{time.strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(out, exist_ok=True)
+    for position, ranked in results.groupby("position"):
+        ranked.to_csv(os.path.join(out, f"{position}.csv"), index=False)
+    print(results.groupby("position").head(3).to_string())
+    print(f"[INFO] Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+'''
+End-to-end scrape throughput against the local replay server.
+Seeds a throwaway replay tree with a synthetic prospects page + one
+college-stats page per prospect, then drives driver.scrape_year through
+a real HttpClient with the limiter / retries / injected faults in play.
+
+    python -m bench.bench_scrape --per-position 20 --latency-ms 50 --rate-429 0.02
+'''
+
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+
+import config
+import driver
+import metrics
+import scrape.http as http
+import db.sqlite as StoreSQL
+
+from bench import synthetic
+from parse.pfr_parser import POSITION_SCHEMA
+from scrape import replay
+
+
+_RE_CFB_LINK = re.compile(r"/cfb/players/[^'\"]+\.html")
+
+
+def seed_replay(root: str, year: int, per_position: int) -> int:
+    '''
+    :param root        : replay tree to fill
+    :param year        : prospects year the driver will ask for
+    :param per_position: prospects per POSITION_SCHEMA table
+    :return            : number of player pages written
+    '''
+    html = synthetic.prospects_page(per_position, seed=year)
+    replay.record_response(f"https://www.pro-football-reference.com/drafts/{year}_prospects.htm",
+                           html.encode("utf-8"), root=root)
+
+    positions = list(POSITION_SCHEMA)
+    links = _RE_CFB_LINK.findall(html)
+    for index, href in enumerate(links):
+        page = synthetic.player_page(positions[index // per_position % len(positions)], seed=index)
+        replay.record_response(f"https://www.sports-reference.com{href}", page.encode("utf-8"), root=root)
+
+    return len(links)
+
+
+def run(*, year: int, per_position: int, plan: replay.FaultPlan,
+        cooldown: int, max_requests: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        pages = seed_replay(os.path.join(tmp, "replay"), year, per_position)
+        server = replay.ReplayServer(root=os.path.join(tmp, "replay"), plan=plan).start()
+        replay.point_config_at(server.base_url)
+
+        #scratch db + a client without the politeness jitter
+        StoreSQL._DATA_PATH = os.path.join(tmp, "bench.db")
+        StoreSQL.db_init()
+        http._client = http.HttpClient(cooldown=cooldown, jail_time=config.REQUEST_JAIL,
+                                       max_requests=max_requests, jitter=(0.0, 0.0), record=False)
+        metrics.reset()
+
+        start = time.perf_counter()
+        driver.scrape_year(year=year)
+        elapsed = time.perf_counter() - start
+
+        server.stop()
+
+    return {
+        "year": year,
+        "player_pages": pages,
+        "elapsed_seconds": elapsed,
+        "pages_per_second": (pages + 1) / elapsed,
+        "server": plan.stats(),
+        "metrics": metrics.REGISTRY.snapshot(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay-backed scrape_year throughput")
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--per-position", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--burst-every", type=int, default=0)
+    parser.add_argument("--burst-length", type=int, default=0)
+    parser.add_argument("--cooldown", type=int, default=1)
+    parser.add_argument("--max-requests", type=int, default=1000)
+    parser.add_argument("--out", default=None, help="OPTIONAL json report path")
+    args = parser.parse_args()
+
+    plan = replay.FaultPlan(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                            rate_429=args.rate_429, burst_every=args.burst_every,
+                            burst_length=args.burst_length)
+    report = run(year=args.year, per_position=args.per_position, plan=plan,
+                 cooldown=args.cooldown, max_requests=args.max_requests)
+
+    print(f"[INFO] {report['player_pages']} player pages in {report['elapsed_seconds']:.2f}s "
+          f"({report['pages_per_second']:.1f} pages/s) server={report['server']}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as file_ref:
+            json.dump(report, file_ref, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+'''
+Load test for the query service. Either starts one in-process (default)
+or hits a running one with --url. Worker threads keep one HTTP/1.1
+connection each and replay a mix of lookup / comps / cluster /
+percentile / search requests built from the live /prospects listing.
+
+    python -m bench.load_service --threads 8 --requests 5000
+    python -m bench.load_service --url http://127.0.0.1:8780 --cold
+'''
+
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+
+from collections import defaultdict
+from urllib.parse import quote
+from urllib.parse import urlsplit
+
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+from analytics import service
+from pos_models import POSITION_CLASS_MAP
+
+
+def _get(connection: http.client.HTTPConnection, path: str) -> Tuple[int, bytes]:
+    connection.request("GET", path)
+    response = connection.getresponse()
+    return response.status, response.read()
+
+
+def build_paths(base_url: str, *, seed: int = 0) -> List[Tuple[str, str]]:
+    '''
+    :param base_url: running service
+    :param seed    : mix shuffle seed
+    :return        : (endpoint, path) for every prospect and query kind
+    '''
+    url = urlsplit(base_url)
+    connection = http.client.HTTPConnection(url.hostname, url.port)
+    paths = []
+    try:
+        for position in POSITION_CLASS_MAP:
+            status, body = _get(connection, f"/prospects/{position}?limit=1000")
+            if status != 200:
+                print(f"[WARNING] /prospects/{position} -> {status}")
+                continue
+            prospects = json.loads(body)
+            for prospect in prospects:
+                name = quote(str(prospect["name"]))
+                paths.append(("prospect", f"/prospect/{position}/{name}"))
+                paths.append(("comps", f"/comps/{position}/{name}?k=10"))
+                paths.append(("percentiles", f"/percentiles/{position}/{name}"))
+                #typeahead: first few letters of the name
+                paths.append(("search", f"/search?q={quote(str(prospect['name'])[:4])}&position={position}"))
+            for cluster in {prospect["cluster"] for prospect in prospects}:
+                paths.append(("clusters", f"/clusters/{position}/{cluster}"))
+    finally:
+        connection.close()
+
+    random.Random(seed).shuffle(paths)
+    return paths
+
+
+def run(base_url: str, paths: List[Tuple[str, str]], *, threads: int, requests: int,
+        cold: bool = False) -> Dict[str, Dict]:
+    '''
+    :param base_url: running service
+    :param paths   : (endpoint, path) mix from build_paths
+    :param threads : concurrent connections
+    :param requests: total requests
+    :param cold    : add a unique query param so nothing is served from the response LRU
+    :return        : endpoint -> {n, errors, p50_ms, p95_ms, p99_ms, max_ms} + "total"
+    '''
+    url = urlsplit(base_url)
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        connection = http.client.HTTPConnection(url.hostname, url.port)
+        local = defaultdict(list)
+        local_errors = defaultdict(int)
+        try:
+            for i in counter:
+                endpoint, path = paths[i % len(paths)]
+                if cold:
+                    path += ("&" if "?" in path else "?") + f"_n={i}"
+                started = time.perf_counter()
+                status, _ = _get(connection, path)
+                local[endpoint].append(time.perf_counter() - started)
+                if status != 200:
+                    local_errors[endpoint] += 1
+        finally:
+            connection.close()
+        with lock:
+            for endpoint, values in local.items():
+                latencies[endpoint].extend(values)
+            for endpoint, count in local_errors.items():
+                errors[endpoint] += count
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    def summarize(values: List[float], error_count: int) -> Dict:
+        values = sorted(values)
+        if not values:
+            return {"n": 0, "errors": error_count}
+        pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1000
+        return {"n": len(values), "errors": error_count, "p50_ms": pick(0.50),
+                "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": values[-1] * 1000}
+
+    out = {endpoint: summarize(values, errors[endpoint]) for endpoint, values in latencies.items()}
+    out["total"] = summarize([value for values in latencies.values() for value in values],
+                             sum(errors.values()))
+    out["total"]["rps"] = out["total"]["n"] / elapsed if elapsed else 0.0
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the query service")
+    parser.add_argument("--url", default=None, help="OPTIONAL running service, starts one in-process otherwise")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--cold", action="store_true", help="bypass the response cache")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        server = service.QueryServer(port=0).start()
+        started = time.perf_counter()
+        server.state.warm()
+        print(f"[INFO] In-process service on {server.base_url}, warmed in {time.perf_counter() - started:.1f}s")
+        base_url = server.base_url
+
+    try:
+        paths = build_paths(base_url, seed=args.seed)
+        if not paths:
+            print("[ERROR] No prospects to query, is prospects.db populated?")
+            return
+        results = run(base_url, paths, threads=args.threads, requests=args.requests, cold=args.cold)
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(f"{'endpoint':<14}{'n':>8}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for endpoint, row in sorted(results.items(), key=lambda item: item[0] == "total"):
+        if not row["n"]:
+            continue
+        print(f"{endpoint:<14}{row['n']:>8}{row['errors']:>6}{row['p50_ms']:>10.2f}"
+              f"{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}")
+    print(f"[INFO] {results['total']['rps']:.0f} req/s over {args.threads} connections")
+
+
+if __name__ == "__main__":
+    main()
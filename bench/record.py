@@ -0,0 +1,59 @@
+'''
+Re-records the benchmark fixtures from the live sites.
+One prospects page, one draft page and one college-stats page per
+POSITION_SCHEMA position. Respects the normal HttpClient rate limits,
+so expect it to take a few minutes.
+
+    python -m bench.record --year 2024
+'''
+
+import argparse
+import os
+
+import scrape.http as http
+import scrape.pfr as Scraper
+import parse.pfr_parser as Parser
+
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def _write(name: str, text: str) -> None:
+    path = os.path.join(FIXTURE_DIR, name)
+    with open(path, "w", encoding="utf-8") as file_ref:
+        file_ref.write(text)
+    print(f"[INFO] Recorded {path}")
+
+
+def record(year: int) -> None:
+    '''
+    :param year: draft year to record the index pages from
+    :return    : Nothing
+    '''
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    client = http.get_client()
+
+    prospects_html = Scraper.fetch_prospects_page(year=year, client=client)
+    _write("prospects.html", prospects_html)
+    _write("draft.html", Scraper.fetch_draft_page(year=year - 1, client=client))
+
+    #first prospect with a college stats link, per position
+    for position, players in Parser.parse_prospect_page(html=prospects_html).items():
+        player = next((player for player in players if player.stats_link), None)
+        if player is None:
+            print(f"[WARNING] No stats link for any {position} prospect")
+            continue
+        _write(f"player_{position}.html",
+               Scraper.fetch_player_page(href=player.stats_link, client=client))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record benchmark fixtures from the live sites")
+    parser.add_argument("--year", type=int, default=2024)
+    args = parser.parse_args()
+
+    record(args.year)
+
+
+if __name__ == "__main__":
+    main()
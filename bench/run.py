@@ -0,0 +1,412 @@
+'''
+Benchmark suite over the recorded fixtures + synthetic pages.
+Every case runs at several corpus sizes and the results land in
+bench/results/<label>.json so two commits can be compared:
+
+    python -m bench.run                       # label = short git sha
+    python -m bench.run --only parse_player_page --sizes 10 100
+    python -m bench.run --compare bench/results/old.json bench/results/new.json
+'''
+
+import argparse
+import atexit
+import dataclasses
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from contextlib import contextmanager
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Any
+
+import config
+import parse.pfr_parser as Parser
+import pos_models as Models
+import db.sqlite as StoreSQL
+import db.loader as Loader
+
+from bench import synthetic
+
+
+BENCH_DIR   = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BENCH_DIR, "fixtures")
+RESULT_DIR  = os.path.join(BENCH_DIR, "results")
+
+DEFAULT_SIZES = (10, 100, 1000)
+
+#name -> setup(size) returning (fn, items); fn is what gets timed
+CASES: Dict[str, Callable[[int], Any]] = {}
+
+
+def case(name: str):
+    def decorator(setup):
+        CASES[name] = setup
+        return setup
+    return decorator
+
+
+# ---- Corpus Helpers ----
+def load_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURE_DIR, name), "r", encoding="utf-8") as file_ref:
+        return file_ref.read()
+
+
+def player_pages(size: int) -> List[tuple]:
+    '''
+    (position, html) pairs, the recorded page for each position first,
+    then synthetic pages until there are <size> of them
+    '''
+    pages = []
+    positions = list(Parser.POSITION_SCHEMA)
+    for index in range(size):
+        position = positions[index % len(positions)]
+        if index < len(positions):
+            pages.append((position, load_fixture(f"player_{position}.html")))
+        else:
+            pages.append((position, synthetic.player_page(position, seed=index)))
+    return pages
+
+
+def filled_players(size: int) -> List[Models.Player]:
+    ''' <size> players already run through parse_player_page '''
+    players = []
+    for index, (position, html) in enumerate(player_pages(min(size, 50))):
+        player = Models.get_position_class(position, name=f"Bench Player {index}",
+                                           college="Bench U", stats_link=f"/cfb/players/bench-{index}.html")
+        players.append(Parser.parse_player_page(html=html, player=player))
+
+    #clone the parsed ones instead of parsing <size> pages
+    out = []
+    for index in range(size):
+        template = players[index % len(players)]
+        out.append(Models.get_position_class(**{**dataclasses.asdict(template),
+                                                "name": f"Bench Player {index}"}))
+    return out
+
+
+def _scratch_dir() -> str:
+    ''' Temp folder that lives until the bench process exits '''
+    path = tempfile.mkdtemp(prefix="ngs_bench_")
+    atexit.register(shutil.rmtree, path, True)
+    return path
+
+
+@contextmanager
+def temp_db(players: List[Models.Player] = ()):
+    ''' Throwaway sqlite file seeded with <players> '''
+    with tempfile.TemporaryDirectory() as tmp:
+        connection = seeded_db(players, directory=tmp)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+
+def seeded_db(players: List[Models.Player], *, directory: str = None):
+    ''' sqlite connection to a fresh db holding <players>, seeding is not timed '''
+    path = os.path.join(directory or _scratch_dir(), "bench.db")
+    StoreSQL.db_init(path)
+    connection = StoreSQL.sql_get_connection(path)
+    if players:
+        StoreSQL.sql_update_players(list(players), connection=connection)
+    return connection
+
+
+def profiles_dir(size: int) -> str:
+    ''' Fake CACHE_DIR with the profiles/<year>/<POS>.json layout get_draftees_by_position reads '''
+    root = _scratch_dir()
+    by_file: Dict[tuple, list] = {}
+    for index, player in enumerate(filled_players(size)):
+        year = 2000 + index % 20
+        by_file.setdefault((year, player.position), []).append(
+            {"player": dataclasses.asdict(player), "pick": index % 256 + 1, "career_av": index % 90}
+        )
+    for (year, position), rows in by_file.items():
+        os.makedirs(os.path.join(root, "profiles", str(year)), exist_ok=True)
+        with open(os.path.join(root, "profiles", str(year), f"{position}.json"), "w",
+                  encoding="utf-8") as file_ref:
+            json.dump(rows, file_ref)
+    return root
+
+
+@contextmanager
+def cache_dir(path: str):
+    ''' Point config.CACHE_DIR somewhere else for the with-block '''
+    original = config.CACHE_DIR
+    config.CACHE_DIR = path
+    try:
+        yield
+    finally:
+        config.CACHE_DIR = original
+
+
+# ---- Parser Cases ----
+@case("parse_prospect_page")
+def _parse_prospect_page(size):
+    #size = total prospects on the page
+    per_position = max(1, size // len(Parser.POSITION_SCHEMA))
+    html = load_fixture("prospects.html") if size <= 100 else synthetic.prospects_page(per_position)
+    return (lambda: Parser.parse_prospect_page(html=html)), size
+
+
+@case("parse_draft_page")
+def _parse_draft_page(size):
+    html = load_fixture("draft.html") if size <= 64 else synthetic.draft_page(size)
+    return (lambda: Parser.parse_draft_page(html=html)), size
+
+
+@case("parse_player_page")
+def _parse_player_page(size):
+    pages = player_pages(size)
+
+    def run():
+        for position, html in pages:
+            Parser.parse_player_page(html=html, player=Models.get_position_class(position, name="x"))
+    return run, size
+
+
+@case("parse_height_weight")
+def _parse_height_weight(size):
+    pages = player_pages(size)
+
+    class _Athlete:
+        def __init__(self):
+            self.player = Models.Player(name="x", position="QB")
+
+    def run():
+        for _, html in pages:
+            Parser.parse_height_weight(html=html, athlete=_Athlete())
+    return run, size
+
+
+# ---- DB Cases ----
+@case("_player_to_row")
+def _player_to_row(size):
+    players = filled_players(size)
+    return (lambda: [StoreSQL._player_to_row(player) for player in players]), size
+
+
+@case("sql_update_players")
+def _sql_update_players(size):
+    players = filled_players(size)
+
+    def run():
+        with temp_db() as connection:
+            StoreSQL.sql_update_players(players, connection=connection)
+    return run, size
+
+
+@case("sql_search_players")
+def _sql_search_players(size):
+    connection = seeded_db(filled_players(size))
+
+    def run():
+        for position in Parser.POSITION_SCHEMA:
+            StoreSQL.sql_search_players(position=position, connection=connection)
+    return run, size
+
+
+# ---- Loader Cases ----
+@case("get_draftees_by_position")
+def _get_draftees_by_position(size):
+    root = profiles_dir(size)
+
+    def run():
+        with cache_dir(root):
+            for position in Parser.POSITION_SCHEMA:
+                Loader.get_draftees_by_position(position=position)
+    return run, size
+
+
+@case("get_prospects_by_position")
+def _get_prospects_by_position(size):
+    connection = seeded_db(filled_players(size))
+
+    def run():
+        for position in Parser.POSITION_SCHEMA:
+            Loader.get_prospects_by_position(position=position, connection=connection)
+    return run, size
+
+
+@case("load_prospects")
+def _load_prospects(size):
+    connection = seeded_db(filled_players(size))
+    return (lambda: Loader.load_prospects(connection=connection)), size
+
+
+@case("load_prospect_batches")
+def _load_prospect_batches(size):
+    connection = seeded_db(filled_players(size))
+    return (lambda: Loader.load_prospect_batches(connection=connection)), size
+
+
+@case("export_players_csv")
+def _export_players_csv(size):
+    from db import export
+
+    connection = seeded_db(filled_players(size))
+    out_dir = _scratch_dir()
+    return (lambda: export.export_table("players", fmt="csv", out_dir=out_dir, partition_by="position",
+                                        connection=connection)), size
+
+
+@case("export_players_parquet")
+def _export_players_parquet(size):
+    from db import export
+
+    connection = seeded_db(filled_players(size))
+    out_dir = _scratch_dir()
+    return (lambda: export.export_table("players", fmt="parquet", out_dir=out_dir, partition_by="position",
+                                        connection=connection)), size
+
+
+def combine_rows(size: int) -> List[Dict[str, Any]]:
+    ''' parse_combine_page-shaped rows, deterministic per size, ~15% of drills skipped '''
+    rng = random.Random(size)
+    positions = sorted(config.COMBINE_POSITION_MAP)
+    rows = []
+    for index in range(size):
+        weight = rng.gauss(230, 40)
+        drills = {"forty": 4.4 + (weight - 200) / 300, "vertical": 34.0, "bench": 18.0,
+                  "broad_jump": 120.0, "cone": 7.0, "shuttle": 4.3}
+        row = {column: (rng.gauss(mean, mean * 0.04) if rng.random() > 0.15 else None)
+               for column, mean in drills.items()}
+        pos = positions[index % len(positions)]
+        row.update({"name": f"Combine {index}", "pos": pos, "position": config.COMBINE_POSITION_MAP[pos],
+                    "college": "Bench U", "stats_link": None,
+                    "height": rng.randint(68, 79), "weight": round(weight)})
+        rows.append(row)
+    return rows
+
+
+@case("combine_composites")
+def _combine_composites(size):
+    from analytics import combine
+
+    connection = seeded_db([])
+    rows = combine_rows(size)
+    #spread over 25 classes, every composite is pooled over all of them
+    for year in range(2000, 2025):
+        StoreSQL.sql_update_combine(year, rows[year - 2000::25], connection=connection)
+    table = combine.load_table(connection=connection)
+    return (lambda: combine.composites(table)), size
+
+
+# ---- Runner ----
+def _git_label() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=BENCH_DIR, text=True).strip()
+    except Exception:
+        return time.strftime("%Y%m%d_%H%M%S")
+
+
+def time_case(name: str, size: int, *, repeat: int) -> Dict[str, Any]:
+    '''
+    :param name  : key of CASES
+    :param size  : corpus size handed to the case setup
+    :param repeat: timed runs, setup is never timed
+    :return      : one result record
+    '''
+    record = {"case": name, "size": size, "repeat": repeat}
+    try:
+        fn, items = CASES[name](size)
+        fn()    #warm up imports / caches outside the timing
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        return record
+
+    record.update({
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "per_item": min(timings) / items if items else None,
+    })
+    return record
+
+
+def run(names: List[str], sizes: List[int], *, repeat: int) -> Dict[str, Any]:
+    results = []
+    for name in names:
+        for size in sizes:
+            record = time_case(name, size, repeat=repeat)
+            results.append(record)
+            if "error" in record:
+                print(f"[WARNING] {name:<28} n={size:<6} {record['error']}")
+            else:
+                print(f"[INFO] {name:<28} n={size:<6} min={record['min'] * 1000:9.2f}ms "
+                      f"per_item={record['per_item'] * 1e6:9.1f}us")
+
+    return {
+        "label": _git_label(),
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(old_path: str, new_path: str) -> None:
+    ''' Prints new/old ratio of the min timings, < 1.0 means faster '''
+    with open(old_path, "r", encoding="utf-8") as file_ref:
+        old = json.load(file_ref)
+    with open(new_path, "r", encoding="utf-8") as file_ref:
+        new = json.load(file_ref)
+
+    old_by_key = {(r["case"], r["size"]): r for r in old["results"] if "min" in r}
+    print(f"{'case':<28} {'size':>6} {old['label']:>12} {new['label']:>12}  ratio")
+    for record in new["results"]:
+        before = old_by_key.get((record["case"], record["size"]))
+        if before is None or "min" not in record:
+            continue
+        print(f"{record['case']:<28} {record['size']:>6} "
+              f"{before['min'] * 1000:10.2f}ms {record['min'] * 1000:10.2f}ms  "
+              f"{record['min'] / before['min']:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NextGenSleepers benchmark suite")
+    parser.add_argument("--only", nargs="*", default=None, choices=sorted(CASES))
+    parser.add_argument("--sizes", nargs="*", type=int, default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--label", default=None, help="result file name, defaults to git sha")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), default=None)
+    parser.add_argument("--parse-cache", action="store_true",
+                        help="leave the parse-result cache on (times cache hits, not parsing)")
+    args = parser.parse_args()
+
+    #every repeat after the warm up would be a cache hit otherwise
+    config.PARSE_CACHE = args.parse_cache
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run(args.only or list(CASES), args.sizes, repeat=args.repeat)
+    if args.label:
+        report["label"] = args.label
+
+    os.makedirs(RESULT_DIR, exist_ok=True)
+    out_path = os.path.join(RESULT_DIR, f"{report['label']}.json")
+    with open(out_path, "w", encoding="utf-8") as file_ref:
+        json.dump(report, file_ref, indent=2)
+    print(f"[INFO] Results written to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
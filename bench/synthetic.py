@@ -0,0 +1,162 @@
+'''
+Synthetic page generators shaped like the real PFR / Sports-Reference
+markup (same table ids + data-stat attributes the parsers look for),
+used to scale the benchmark corpus past what the recorded fixtures hold.
+'''
+
+import random
+
+from parse.pfr_parser import POSITION_SCHEMA
+
+
+_FIRST = ["Jalen", "Marcus", "Tyler", "Devon", "Chris", "Bryce", "Malik", "Caleb",
+          "Jordan", "Isaiah", "Trey", "Darius", "Kobe", "Xavier", "Drake", "Quinn"]
+_LAST  = ["Smith", "Johnson", "Williams", "Brown", "Jackson", "Davis", "Harris",
+          "Robinson", "Walker", "Young", "Allen", "King", "Wright", "Scott", "Green"]
+_COLLEGES = ["Alabama", "Georgia", "Ohio St.", "Michigan", "LSU", "Clemson", "Oregon",
+             "Texas", "USC", "Penn St.", "Florida", "Iowa", "Utah", "TCU", "Auburn"]
+
+#draft page positions -> mapped through config.NFL_POSITION_MAP by the parser
+_DRAFT_POSITIONS = ["QB", "RB", "WR", "TE", "T", "G", "DE", "DT", "CB", "S", "LB"]
+
+
+# ---- Helper Functions ----
+def _name(rng: random.Random) -> str:
+    return f"{rng.choice(_FIRST)} {rng.choice(_LAST)}"
+
+
+def _slug(name: str, index: int) -> str:
+    return f"{name.lower().replace(' ', '-')}-{index}"
+
+
+def _stat_value(field: str, rng: random.Random) -> str:
+    if field == "pass_cmp_pct":
+        return f"{rng.uniform(52, 72):.1f}"
+    if field == "pass_rating":
+        return f"{rng.uniform(110, 190):.1f}"
+    if field in ("sacks", "tackles_loss"):
+        return f"{rng.uniform(0, 15):.1f}"
+    if field in ("games", "games_started"):
+        return str(rng.randint(1, 14))
+    return str(rng.randint(0, 1500))
+
+
+# ---- Page Generators ----
+def prospects_page(per_position: int, *, seed: int = 0) -> str:
+    '''
+    :param per_position: rows in each prospects_<POS> table
+    :param seed        : RNG seed, same seed -> same page
+    :return            : HTML shaped like /drafts/<year>_prospects.htm
+    '''
+    rng = random.Random(seed)
+    parts = ["<html><body><div id='content'>"]
+
+    index = 0
+    for pos in POSITION_SCHEMA:
+        rows = []
+        for _ in range(per_position):
+            index += 1
+            name = _name(rng)
+            rows.append(
+                "<tr>"
+                f"<th data-stat='player'><a href='/players/x/{_slug(name, index)}.htm'>{name}</a></th>"
+                f"<td data-stat='age'>{rng.randint(20, 24)}</td>"
+                f"<td data-stat='height'>{rng.randint(5, 6)}-{rng.randint(0, 11)}</td>"
+                f"<td data-stat='weight'>{rng.randint(175, 330)}</td>"
+                f"<td data-stat='college_name'>{rng.choice(_COLLEGES)}</td>"
+                f"<td data-stat='cfb'><a href='/cfb/players/{_slug(name, index)}.html'>College Stats</a></td>"
+                "</tr>"
+            )
+        #PFR ships the position tables inside html comments
+        table = (f"<table id='prospects_{pos}'><thead><tr><th>Player</th></tr></thead>"
+                 f"<tbody>{''.join(rows)}</tbody></table>")
+        parts.append(f"<div id='all_prospects_{pos}'><!--{table}--></div>")
+
+    parts.append("</div></body></html>")
+    return "\n".join(parts)
+
+
+def draft_page(picks: int, *, seed: int = 0) -> str:
+    '''
+    :param picks: number of draft rows
+    :param seed : RNG seed
+    :return     : HTML shaped like /years/<year>/draft.htm
+    '''
+    rng = random.Random(seed)
+    rows = []
+    for pick in range(1, picks + 1):
+        name = _name(rng)
+        rows.append(
+            "<tr>"
+            f"<th data-stat='draft_round'>{(pick - 1) // 32 + 1}</th>"
+            f"<td data-stat='draft_pick'>{pick}</td>"
+            f"<td data-stat='player'><a href='/players/x/{_slug(name, pick)}.htm'>{name}</a></td>"
+            f"<td data-stat='pos'>{rng.choice(_DRAFT_POSITIONS)}</td>"
+            f"<td data-stat='age'>{rng.randint(20, 24)}</td>"
+            f"<td data-stat='career_av'>{max(0, int(rng.gauss(40 - pick / 8, 12)))}</td>"
+            f"<td data-stat='college_id'>{rng.choice(_COLLEGES)}</td>"
+            f"<td data-stat='college_link'><a href='/cfb/players/{_slug(name, pick)}.html'>College Stats</a></td>"
+            "</tr>"
+        )
+    return ("<html><body><table id='drafts'><thead><tr><th>Rnd</th></tr></thead>"
+            f"<tbody>{''.join(rows)}</tbody></table></body></html>")
+
+
+def player_page(position: str, *, seasons: int = 4, seed: int = 0) -> str:
+    '''
+    :param position: key of POSITION_SCHEMA
+    :param seasons : season rows per table
+    :param seed    : RNG seed
+    :return        : HTML shaped like /cfb/players/<slug>.html
+    '''
+    rng = random.Random(seed)
+    schema = POSITION_SCHEMA[position]
+
+    parts = [
+        "<html><body><div id='meta'>",
+        f"<h1>{_name(rng)}</h1>",
+        f"<p><strong>Position</strong>: {position}</p>",
+        f"<p><span>{rng.randint(5, 6)}-{rng.randint(0, 11)}</span>, "
+        f"<span>{rng.randint(175, 330)}lb</span></p>",
+        "</div>",
+    ]
+
+    first_year = rng.randint(2005, 2020)
+    for table_id, fields in schema["standards"].items():
+        body = []
+        for offset in range(seasons):
+            cells = "".join(f"<td data-stat='{field}'>{_stat_value(field, rng)}</td>" for field in fields)
+            body.append(
+                f"<tr id='{table_id}.{first_year + offset}'>"
+                f"<th data-stat='year_id'>{first_year + offset}</th>"
+                f"<td data-stat='school_name'>{rng.choice(_COLLEGES)}</td>"
+                f"<td data-stat='age'>{18 + offset}</td>{cells}</tr>"
+            )
+        career = "".join(f"<td data-stat='{field}'>{_stat_value(field, rng)}</td>" for field in fields)
+        parts.append(
+            f"<table id='{table_id}'><tbody>{''.join(body)}</tbody>"
+            f"<tfoot><tr id='{table_id}.Career'><th data-stat='year_id'>Career</th>{career}</tr></tfoot>"
+            "</table>"
+        )
+
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def write_fixtures(directory: str) -> None:
+    '''
+    Writes the default small fixture set, same names record.py uses.
+    Only meant to bootstrap a fresh checkout without network access
+    '''
+    import os
+
+    os.makedirs(directory, exist_ok=True)
+
+    def write(name: str, text: str) -> None:
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as file_ref:
+            file_ref.write(text)
+
+    write("prospects.html", prospects_page(12, seed=1))
+    write("draft.html", draft_page(64, seed=2))
+    for index, position in enumerate(POSITION_SCHEMA):
+        write(f"player_{position}.html", player_page(position, seed=10 + index))
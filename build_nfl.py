@@ -3,6 +3,7 @@ from bs4 import BeautifulSoup
 import scrape.http as http
 import scrape.pfr as Scraper
 import parse.pfr_parser as Parser
+from scrape.prefetch import Prefetcher
 import pos_models as Models
 import db.json as StoreJSON
 
@@ -58,16 +59,21 @@ def main():
 
     time_stamp = time.time()
 
-    for year, all_players in draftees.items():
-        for position in all_players.keys():
-            for player in tqdm(all_players[position], total=len(all_players[position])):
-                if player.player.stats_link is None:
-                    continue
-                html = Scraper.fetch_player_page(href=player.player.stats_link, client=client)
-                player.player = Parser.parse_player_page(html=html, player=player.player)
-                Parser.parse_height_weight(html=html, athlete=player)
-                print(player)
-            StoreJSON.send_to_json(all_players[position], filepath=f"{config.CACHE_DIR}/draft_{year}_{position}.json")
+    with Prefetcher(client) as prefetcher:
+        #queued in the order the loop below asks for them
+        prefetcher.feed(player.player.stats_link for all_players in draftees.values()
+                        for position_players in all_players.values() for player in position_players)
+
+        for year, all_players in draftees.items():
+            for position in all_players.keys():
+                for player in tqdm(all_players[position], total=len(all_players[position])):
+                    if player.player.stats_link is None:
+                        continue
+                    html = prefetcher.get(player.player.stats_link)
+                    player.player = Parser.parse_player_page(html=html, player=player.player)
+                    Parser.parse_height_weight(html=html, athlete=player)
+                    print(player)
+                StoreJSON.send_to_json(all_players[position], filepath=f"{config.CACHE_DIR}/draft_{year}_{position}.json")
 
     elasped = time.time() - time_stamp
     print(f"Finished in {elasped / 60:.2f} minutes")
@@ -14,6 +14,40 @@ from typing import Final, List, Dict
 BASE_DIR : Final[Path] = Path(__file__).parent.resolve()
 DATA_DIR : Final[Path] = BASE_DIR / "data"
 CACHE_DIR: Final[Path] = BASE_DIR / "cache"
+METRICS_DIR: Final[Path] = Path(os.getenv("NGS_METRICS_DIR", DATA_DIR / "metrics"))
+
+                        # ---- Parse Cache ---- #
+PARSE_CACHE     : Final[bool] = os.getenv("NGS_PARSE_CACHE", "1") == "1"
+PARSE_CACHE_PATH: Final[Path] = Path(os.getenv("NGS_PARSE_CACHE_PATH", DATA_DIR / "parse_cache.db"))
+
+                        # ---- Analytics ---- #
+MODEL_DIR       : Final[Path] = Path(os.getenv("NGS_MODEL_DIR", CACHE_DIR / "models"))
+SCORING_CLUSTERS: Final[int]  = int(os.getenv("NGS_SCORING_CLUSTERS", "6"))
+
+                        # ---- Draft-day Live Mode ---- #
+LIVE_POLL_INTERVAL: Final[float] = float(os.getenv("NGS_LIVE_INTERVAL", "5"))
+
+                        # ---- Query Service ---- #
+SERVICE_HOST      : Final[str] = os.getenv("NGS_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT      : Final[int] = int(os.getenv("NGS_SERVICE_PORT", "8780"))
+SERVICE_CACHE_SIZE: Final[int] = int(os.getenv("NGS_SERVICE_CACHE_SIZE", "4096"))
+
+                        # ---- Export ---- #
+EXPORT_DIR          : Final[Path] = Path(os.getenv("NGS_EXPORT_DIR", DATA_DIR / "export"))
+#rows pulled off the cursor per batch, memory stays ~ one batch whatever the table size
+EXPORT_BATCH        : Final[int] = int(os.getenv("NGS_EXPORT_BATCH", "5000"))
+EXPORT_ROWS_PER_FILE: Final[int] = int(os.getenv("NGS_EXPORT_ROWS_PER_FILE", "500000"))
+
+                        # ---- Snapshots ---- #
+SNAPSHOT_DIR : Final[Path] = Path(os.getenv("NGS_SNAPSHOT_DIR", DATA_DIR / "snapshots"))
+#pin every reader that takes a --snapshot default to one snapshot id ("latest" = newest)
+SNAPSHOT_ID  : Final[str | None] = os.getenv("NGS_SNAPSHOT")
+#prune keeps this many unpinned snapshots
+SNAPSHOT_KEEP: Final[int] = int(os.getenv("NGS_SNAPSHOT_KEEP", "5"))
+
+                        # ---- Profiling (off unless set) ---- #
+PROFILE_DIR   : Final[str | None] = os.getenv("NGS_PROFILE")
+PROFILE_MEMORY: Final[bool]       = os.getenv("NGS_PROFILE_MEMORY", "0") == "1"
 
 
                         # ---- Make Directories ---- #
@@ -31,12 +65,55 @@ REQUEST_COOLDOWN: Final[int] = int(os.getenv("PFR_REQUEST_COOLDOWN"), "60")
 REQUEST_JAIL    : Final[int] = int(os.getenv("PFR_REQUEST_JAIL"), "3600")
 MAX_RETIRES     : Final[int] = int(os.getenv("PFR_MAX_RETIRES"), "3")
 BACKOFF_FACTOR  : Final[float] = float(os.getenv("PFR_BACKOFF_FACTOR", "3.0"))
+REQUEST_JITTER  : Final[tuple] = (float(os.getenv("PFR_JITTER_MIN", "1.87")),
+                                  float(os.getenv("PFR_JITTER_MAX", "2.84")))
+REQUEST_MAX     : Final[int] = int(os.getenv("PFR_REQUEST_MAX", "20"))
+#wire bytes (still compressed) allowed per response before it's dropped
+MAX_BODY_BYTES  : Final[int] = int(os.getenv("NGS_MAX_BODY_BYTES", str(8 * 1024 * 1024)))
+
+PREFETCH_DEPTH  : Final[int] = int(os.getenv("NGS_PREFETCH_DEPTH", "8"))
+#seconds a prefetched page may sit unclaimed before it stops counting against the depth
+PREFETCH_TTL    : Final[float] = float(os.getenv("NGS_PREFETCH_TTL", "30"))
+#finished player pages kept in memory so a repeat link in the same run isn't refetched
+PAGE_REMEMBER   : Final[int] = int(os.getenv("NGS_PAGE_REMEMBER", "256"))
+
+                        # ---- Fetch Scheduling ---- #
+#waiting this long is worth one priority class, so low priority work never starves
+SCHEDULE_AGING_SECONDS: Final[float] = float(os.getenv("NGS_SCHEDULE_AGING", "600"))
+#comma separated target positions, first = most important (EXAMPLE :: WR,RB)
+PRIORITY_POSITIONS    : Final[List[str]] = [position for position in
+                                            os.getenv("NGS_PRIORITY_POSITIONS", "").split(",") if position]
+
+                        # ---- Shared Rate Budgets ---- #
+#requests per minute per host, shared by every process pointing at RATE_LIMIT_PATH
+RATE_LIMIT_PATH: Final[Path] = Path(os.getenv("NGS_RATE_LIMIT_PATH", DATA_DIR / "ratelimit.db"))
+RATE_BUDGETS   : Final[Dict[str, float]] = {
+    "www.pro-football-reference.com": 20.0,
+    "www.sports-reference.com": 20.0,
+    "api.collegefootballdata.com": 60.0,
+}
+RATE_DEFAULT_BUDGET: Final[float] = float(os.getenv("NGS_RATE_DEFAULT", "20"))
+
+                        # ---- Dead-Letter Queue ---- #
+DLQ_MAX_ATTEMPTS: Final[int]   = int(os.getenv("NGS_DLQ_MAX_ATTEMPTS", "5"))
+DLQ_BASE_DELAY  : Final[float] = float(os.getenv("NGS_DLQ_BASE_DELAY", "30.0"))
+
+                        # ---- Job Queue ---- #
+JOB_BATCH        : Final[int]   = int(os.getenv("NGS_JOB_BATCH", "10"))
+JOB_LEASE_SECONDS: Final[float] = float(os.getenv("NGS_JOB_LEASE", "300"))
 
                         # ---- Website Roots ---- #
 
-PFR_PROSPECTS_ROOT: Final[str] = "https://www.pro-football-reference.com/drafts/"
-PFR_DRAFT_ROOT:     Final[str] = "https://www.pro-football-reference.com/years/"
-CFBD_API_ROOT:      Final[str] = "https://api.collegefootballdata.com/"
+#every root can be pointed at scrape/replay.py for offline runs
+PFR_PROSPECTS_ROOT: Final[str] = os.getenv("PFR_PROSPECTS_ROOT", "https://www.pro-football-reference.com/drafts/")
+PFR_DRAFT_ROOT:     Final[str] = os.getenv("PFR_DRAFT_ROOT", "https://www.pro-football-reference.com/years/")
+PFR_COMBINE_ROOT:   Final[str] = os.getenv("PFR_COMBINE_ROOT", "https://www.pro-football-reference.com/draft/")
+SR_CFB_ROOT:        Final[str] = os.getenv("SR_CFB_ROOT", "https://www.sports-reference.com")
+CFBD_API_ROOT:      Final[str] = os.getenv("CFBD_API_ROOT", "https://api.collegefootballdata.com/")
+
+                        # ---- Replay / Record ---- #
+REPLAY_DIR     : Final[Path] = Path(os.getenv("NGS_REPLAY_DIR", CACHE_DIR / "replay"))
+RECORD_RESPONSES: Final[bool] = os.getenv("NGS_RECORD", "0") == "1"
 
                         # ---- Secrets ---- #
 
@@ -64,6 +141,13 @@ SELENIUM_FLAGS: Final[List[str]] = [
     "--no-sandbox",
     "--disable-dev-shm-usage",
 ]
+#fall back to a pooled headless browser when a plain fetch fails or has no tables
+BROWSER_FALLBACK  : Final[bool] = os.getenv("NGS_BROWSER_FALLBACK", "0") == "1"
+BROWSER_POOL_SIZE : Final[int] = int(os.getenv("NGS_BROWSER_POOL_SIZE", "2"))
+#recycle a browser after this many pages / once its process tree passes this many MB, 0 = never
+BROWSER_MAX_PAGES : Final[int] = int(os.getenv("NGS_BROWSER_MAX_PAGES", "50"))
+BROWSER_MAX_RSS_MB: Final[float] = float(os.getenv("NGS_BROWSER_MAX_RSS_MB", "1024"))
+BROWSER_TIMEOUT   : Final[int] = int(os.getenv("NGS_BROWSER_TIMEOUT", "30"))
 
 
                         # ---- Position Map ---- #
@@ -82,6 +166,19 @@ NFL_POSITION_MAP: Final[Dict[str, List[str]]] = {
     "LB": "OLB",
 }
 
+#combine pages list finer positions than the draft pages, None = not one we model
+COMBINE_POSITION_MAP: Final[Dict[str, str]] = {
+    "QB": "QB",
+    "RB": "RB", "FB": "RB",
+    "WR": "WR", "TE": "WR",
+    "OT": "OL", "OG": "OL", "C": "OL", "OL": "OL",
+    "DE": "DT", "DT": "DT", "DL": "DT", "EDGE": "DT",
+    "CB": "CB", "S": "CB", "DB": "CB",
+    "LB": "OLB", "OLB": "OLB", "ILB": "OLB",
+}
+#a RAS-like score needs at least this many of the 8 measurables
+RAS_MIN_MEASURES: Final[int] = int(os.getenv("NGS_RAS_MIN_MEASURES", "5"))
+
 
 NFL_COMPARISONS = {
     "QB": [
@@ -0,0 +1,287 @@
+'''
+Streaming export of the sqlite store for analysts.
+
+Rows come off one cursor EXPORT_BATCH at a time (StoreSQL.sql_export_batches,
+stats_json flattened by json_extract in the query) and every batch is
+appended to the open output file before the next one is read, so memory
+is one batch whatever the table size.
+
+Output is Hive-style partitioned when asked, one directory per value,
+files rolled every EXPORT_ROWS_PER_FILE rows:
+
+    data/export/players/position=WR/part-00000.parquet
+
+The partition column lives in the directory name, not in the files. A
+table is written under <table>.partial and swapped in when complete, so
+readers never see half an export.
+
+    python -m db.export players --format parquet --partition-by position
+    python -m db.export players --position WR --columns name,college,rec_yds,rec_td
+    python -m db.export combine_results --format csv --partition-by year --year 2023 --year 2024
+'''
+
+import argparse
+import csv
+import os
+import shutil
+import time
+import tracemalloc
+
+from itertools import groupby
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import List
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    #csv needs nothing extra
+    pa = None
+    pq = None
+
+import config
+import metrics
+import db.sqlite as StoreSQL
+from parse.pfr_parser import POSITION_SCHEMA
+
+
+FORMATS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+_NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+_INT_COLUMNS = {"id", "year", "age", "height", "weight"} | {
+    field for schema in POSITION_SCHEMA.values() for field in schema["type_int"]
+}
+_TEXT_COLUMNS = {"name", "position", "pos", "college", "stats_link", "identity"}
+
+
+def _arrow_type(table: str, column: str):
+    if column in _TEXT_COLUMNS:
+        return pa.string()
+    #combine height / weight are measured to the half inch / pound
+    if column in _INT_COLUMNS and not (table == "combine_results" and column in StoreSQL.COMBINE_COLUMNS):
+        return pa.int64()
+    return pa.float64()
+
+
+def _arrow_column(values, arrow_type):
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        #a whole float (12.0) in an int column
+        return pa.array(values, type=pa.float64()).cast(arrow_type)
+
+
+# ---- Sinks ----
+class _CsvSink:
+
+    def __init__(self, path: Path, columns: List[str], table: str):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, rows: List[tuple]) -> None:
+        self._writer.writerows(rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ArrowSink:
+    ''' Parquet (one row group per batch) or an Arrow IPC file '''
+
+    def __init__(self, path: Path, columns: List[str], table: str, *, fmt: str):
+        if pa is None:
+            raise RuntimeError(f"[ERROR] {fmt} export needs the pyarrow package")
+        self._schema = pa.schema([(column, _arrow_type(table, column)) for column in columns])
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(str(path), self._schema)
+        else:
+            self._writer = pa.ipc.new_file(str(path), self._schema)
+
+    def write(self, rows: List[tuple]) -> None:
+        arrays = [_arrow_column(values, field.type) for values, field in zip(zip(*rows), self._schema)]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def _open_sink(fmt: str, path: Path, columns: List[str], table: str):
+    if fmt == "csv":
+        return _CsvSink(path, columns, table)
+    return _ArrowSink(path, columns, table, fmt=fmt)
+
+
+class _PartitionedWriter:
+    '''
+    Rows arrive grouped by the partition column, so only one file is ever open
+    '''
+
+    def __init__(self, root: Path, table: str, columns: List[str],
+                 *, fmt: str, partition_by: str = None, rows_per_file: int = config.EXPORT_ROWS_PER_FILE):
+        self.root = root
+        self.table = table
+        self.fmt = fmt
+        self.partition_by = partition_by
+        self.rows_per_file = rows_per_file
+
+        self._key_index = columns.index(partition_by) if partition_by else None
+        self._file_columns = [column for column in columns if column != partition_by]
+        self._sink = None
+        self._key = None
+        self._part = 0
+        self._part_rows = 0
+        self.files: List[Path] = []
+
+    def _directory(self, key) -> Path:
+        if self.partition_by is None:
+            return self.root
+        value = _NULL_PARTITION if key is None else str(key).replace(os.sep, "_")
+        return self.root / f"{self.partition_by}={value}"
+
+    def _roll(self, key) -> None:
+        self._close_sink()
+        if key != self._key:
+            self._key, self._part = key, 0
+        directory = self._directory(key)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"part-{self._part:05d}{FORMATS[self.fmt]}"
+        self._sink = _open_sink(self.fmt, path, self._file_columns, self.table)
+        self.files.append(path)
+        self._part += 1
+        self._part_rows = 0
+
+    def _close_sink(self) -> None:
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def write(self, rows: List[tuple]) -> None:
+        index = self._key_index
+        groups = [(None, rows)] if index is None else groupby(rows, key=lambda row: row[index])
+        for key, group in groups:
+            group = list(group)
+            if index is not None:
+                group = [row[:index] + row[index + 1:] for row in group]
+            while group:
+                if self._sink is None or key != self._key or self._part_rows >= self.rows_per_file:
+                    self._roll(key)
+                room = self.rows_per_file - self._part_rows
+                chunk, group = group[:room], group[room:]
+                self._sink.write(chunk)
+                self._part_rows += len(chunk)
+
+    def close(self) -> None:
+        self._close_sink()
+
+
+# ---- Public Wrappers ----
+def export_table(table: str,
+                 *, fmt: str = "csv",
+                    out_dir: Path = None,
+                    columns: List[str] = None,
+                    positions: List[str] = None,
+                    years: List[int] = None,
+                    partition_by: str = None,
+                    batch: int = config.EXPORT_BATCH,
+                    rows_per_file: int = config.EXPORT_ROWS_PER_FILE,
+                    connection=None) -> Dict[str, Any]:
+    '''
+    Stream one table out of the store
+
+    :param table        : key of StoreSQL.EXPORT_TABLES
+    :param fmt          : csv / parquet / arrow
+    :param out_dir      : OPTIONAL export root, config.EXPORT_DIR otherwise, the table lands in <out_dir>/<table>
+    :param columns      : OPTIONAL columns in output order, all of StoreSQL.export_columns(table) otherwise
+    :param positions    : OPTIONAL positions to keep
+    :param years        : OPTIONAL years to keep (combine_results)
+    :param partition_by : OPTIONAL column to partition the output on (EXAMPLE :: position, year)
+    :param batch        : rows read + written per step
+    :param rows_per_file: start a new part file after this many rows
+    :param connection   : OPTIONAL sqlite connection
+    :return             : {table, path, rows, batches, files, bytes, seconds}
+    '''
+    if fmt not in FORMATS:
+        raise ValueError(f"[ERROR] Unknown export format {fmt}, expected one of {sorted(FORMATS)}")
+
+    columns = list(columns or StoreSQL.export_columns(table))
+    if partition_by and partition_by not in columns:
+        columns.append(partition_by)
+
+    final = Path(out_dir or config.EXPORT_DIR) / table
+    partial = final.with_name(f"{table}.partial")
+    shutil.rmtree(partial, ignore_errors=True)
+    partial.mkdir(parents=True)
+
+    started = time.perf_counter()
+    writer = _PartitionedWriter(partial, table, columns, fmt=fmt,
+                                partition_by=partition_by, rows_per_file=rows_per_file)
+    rows = batches = 0
+    try:
+        for chunk in StoreSQL.sql_export_batches(table, columns, positions=positions, years=years,
+                                                 order_by=partition_by, batch=batch, connection=connection):
+            writer.write(chunk)
+            rows += len(chunk)
+            batches += 1
+    except BaseException:
+        writer.close()
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    writer.close()
+
+    #swap the finished export in
+    stale = final.with_name(f"{table}.old")
+    shutil.rmtree(stale, ignore_errors=True)
+    if final.exists():
+        os.replace(final, stale)
+    os.replace(partial, final)
+    shutil.rmtree(stale, ignore_errors=True)
+
+    elapsed = time.perf_counter() - started
+    metrics.inc("export_rows_total", rows, table=table, format=fmt)
+    metrics.observe("export_seconds", elapsed, table=table, format=fmt)
+
+    return {
+        "table": table, "path": str(final), "rows": rows, "batches": batches,
+        "files": len(writer.files),
+        "bytes": sum(os.path.getsize(final / path.relative_to(partial)) for path in writer.files),
+        "seconds": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream store tables to partitioned CSV / Parquet / Arrow")
+    parser.add_argument("tables", nargs="+", choices=sorted(StoreSQL.EXPORT_TABLES))
+    parser.add_argument("--format", dest="fmt", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("--out", default=str(config.EXPORT_DIR))
+    parser.add_argument("--columns", default=None, help="comma separated, every column otherwise")
+    parser.add_argument("--position", action="append", default=None, help="repeatable")
+    parser.add_argument("--year", type=int, action="append", default=None, help="repeatable, combine_results only")
+    parser.add_argument("--partition-by", default=None)
+    parser.add_argument("--batch", type=int, default=config.EXPORT_BATCH)
+    parser.add_argument("--rows-per-file", type=int, default=config.EXPORT_ROWS_PER_FILE)
+    parser.add_argument("--trace-memory", action="store_true", help="report peak python allocations")
+    args = parser.parse_args()
+
+    columns = args.columns.split(",") if args.columns else None
+    positions = [position.upper() for position in args.position] if args.position else None
+
+    if args.trace_memory:
+        tracemalloc.start()
+    for table in args.tables:
+        result = export_table(table, fmt=args.fmt, out_dir=Path(args.out), columns=columns,
+                              positions=positions, years=args.year, partition_by=args.partition_by,
+                              batch=args.batch, rows_per_file=args.rows_per_file)
+        rate = result["rows"] / result["seconds"] if result["seconds"] else 0.0
+        print(f"[INFO] {table}: {result['rows']} rows -> {result['files']} files "
+              f"({result['bytes'] / 1024 / 1024:.1f} MiB) in {result['seconds']:.2f}s, {rate:,.0f} rows/s "
+              f"at {result['path']}")
+    if args.trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        print(f"[INFO] Peak python allocations {peak / 1024 / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,12 @@ import db.sqlite as StoreSQL
 import db.json as StoreJSON
 
 from typing import Dict
+from typing import Iterator
 from typing import List
 from collections import defaultdict
+from itertools import groupby
 
+import numpy as np
 import pandas as pd
 
 import os
@@ -65,6 +68,9 @@ def get_draftees_by_position(position: str) -> pd.DataFrame:
                 df = StoreJSON.load_json(
                     filepath=os.path.join(path, file)
                 )
+                #profiles/<year>/..., keep the draft year around
+                if df is not None and child_dir.isdigit():
+                    df["year"] = int(child_dir)
                 #concat the frames together
                 df_all = pd.concat([df_all, df], ignore_index=True)
                 break # - found the file, you can stop now bro
@@ -92,40 +98,150 @@ def load_draftees_by_year(year: int) -> List[pd.DataFrame]:
     return players
 
 
-def get_prospects_by_position(position: str) -> pd.DataFrame:
+# ---- Bulk Prospect Loading ----
+_TEXT_COLUMNS: List[str] = ["name", "college"]
+_PHYSICAL_COLUMNS: List[str] = ["age", "height", "weight"]
+
+
+class ProspectRow:
+    '''
+    View of one row of a ProspectBatch, reads straight from its columns
+    '''
+
+    __slots__ = ("batch", "index")
+
+    def __init__(self, batch: "ProspectBatch", index: int):
+        self.batch = batch
+        self.index = index
+
+    def __getattr__(self, name: str):
+        column = self.batch.data.get(name)
+        if column is None:
+            raise AttributeError(name)
+        value = column[self.index]
+        return None if isinstance(value, float) and np.isnan(value) else value
+
+    def to_player(self) -> Models.Player:
+        ''' Full dataclass, only built when asked for '''
+        return self.batch.player(self.index)
+
+    def __repr__(self) -> str:
+        return f"ProspectRow({self.batch.position}, {self.name!r})"
+
+
+class ProspectBatch:
+    '''
+    Columnar prospects of one position: name / college as object arrays,
+    physicals + stats as float64 (NaN = unknown)
+    '''
+
+    def __init__(self, position: str, ids: np.ndarray, data: Dict[str, np.ndarray]):
+        self.position = position
+        self.ids = ids
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[ProspectRow]:
+        return (ProspectRow(self, index) for index in range(len(self)))
+
+    def row(self, index: int) -> ProspectRow:
+        return ProspectRow(self, index)
+
+    @property
+    def columns(self) -> List[str]:
+        ''' Columns with at least one known value, like the old expanded frame '''
+        return [column for column, values in self.data.items()
+                if column in _TEXT_COLUMNS or not np.isnan(values).all()]
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.data[column]
+
+    def matrix(self, columns: List[str]) -> np.ndarray:
+        '''
+        :param columns: output column order, unknown columns are all NaN
+        :return       : float64 (n_players, n_columns), what features.feature_matrix builds
+        '''
+        out = np.full((len(self), len(columns)), np.nan, dtype=np.float64)
+        for index, column in enumerate(columns):
+            values = self.data.get(column)
+            if values is not None and values.dtype == np.float64:
+                out[:, index] = values
+        return out
+
+    def to_frame(self) -> pd.DataFrame:
+        ''' Same shape get_prospects_by_position always returned, built column by column '''
+        frame = {"name": self.data["name"], "position": self.position}
+        frame.update({column: self.data[column] for column in self.columns if column != "name"})
+        return pd.DataFrame(frame, index=pd.RangeIndex(len(self)))
+
+    def player(self, index: int) -> Models.Player:
+        fields = Models.POSITION_CLASS_MAP[self.position].__dataclass_fields__
+        kwargs = {}
+        for column, values in self.data.items():
+            value = values[index]
+            if column not in fields or (isinstance(value, float) and np.isnan(value)):
+                continue
+            value = value.item() if isinstance(value, np.generic) else value
+            #float64 columns hold the int fields too
+            kwargs[column] = int(value) if isinstance(value, float) and value.is_integer() else value
+        return Models.get_position_class(position=self.position, **kwargs)
+
+    def players(self) -> List[Models.Player]:
+        ''' Every row as its dataclass, the one allocation-heavy path '''
+        return [self.player(index) for index in range(len(self))]
+
+
+def load_prospect_batches(positions: List[str] = None, *, connection=None) -> Dict[str, ProspectBatch]:
+    '''
+    Every prospect in one query, grouped by position in SQL, one columnar
+    batch per position. Stats a position doesn't have stay all NaN
+
+    :param positions : OPTIONAL positions, every position in POSITION_CLASS_MAP otherwise
+    :param connection: OPTIONAL sqlite connection
+    :return          : position -> ProspectBatch, positions with no rows are left out
+    '''
+    positions = [position.upper() for position in (positions or Models.POSITION_CLASS_MAP)]
+    rows = StoreSQL.sql_players_by_position(StoreSQL.STAT_FIELDS, positions, connection=connection)
+
+    batches: Dict[str, ProspectBatch] = {}
+    for position, group in groupby(rows, key=lambda row: row[0]):
+        #transpose, one tuple per column instead of one object per player
+        columns = list(zip(*group))
+        data = {column: np.array(values, dtype=object)
+                for column, values in zip(_TEXT_COLUMNS, (columns[2], columns[6]))}
+        numeric = _PHYSICAL_COLUMNS + StoreSQL.STAT_FIELDS
+        data.update({column: np.array(values, dtype=np.float64)
+                     for column, values in zip(numeric, columns[3:6] + columns[7:])})
+        batches[position] = ProspectBatch(position, np.array(columns[1], dtype=np.int64), data)
+
+    return batches
+
+
+def get_prospects_by_position(position: str, *, connection=None) -> pd.DataFrame:
     '''
     SQL Query wrapper to grab all prospects by position
     :param position:
+    :param connection: OPTIONAL sqlite connection
 
-    :return:
+    :return: frame without id / stats_link, stats columns only where some prospect has them
     '''
-    prospects = StoreSQL.sql_search_players(position=position)
-    prospects = prospects.drop(columns=['id', 'stats_linK'], axis=1)
-
-    return prospects
+    batch = load_prospect_batches([position], connection=connection).get(position.upper())
+    if batch is None:
+        return pd.DataFrame(columns=["name", "position"] + _PHYSICAL_COLUMNS + ["college"])
+    return batch.to_frame()
 
 
-def load_prospects() -> Dict[str, List]:
+def load_prospects(*, connection=None) -> Dict[str, List]:
     '''
     Returns a dictionary of prospects, where position is the key to a list of prospects
 
+    :param connection: OPTIONAL sqlite connection
     :return:
     '''
     all_prospects: Dict = defaultdict(list)
-    for position in Models.POSITION_CLASS_MAP.keys():
-
-        pos_prospects: List = []
-        df = get_prospects_by_position(position=position)
-        df_dict = df.to_dict(orient='records')
-
-        for profile in df_dict:
-            # get proper class
-            prospect = Models.get_position_class(position=position,
-                                                 **profile,
-                                                 stats_link=stats_link
-                                                 )
-            pos_prospects.append(prospect)
-
-        all_prospects[position] = pos_prospects
+    for position, batch in load_prospect_batches(connection=connection).items():
+        all_prospects[position] = batch.players()
 
     return all_prospects
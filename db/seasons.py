@@ -0,0 +1,94 @@
+'''
+Long-format season store, one row per (player, season).
+Kept as one Parquet file per position with typed, compact columns
+(Int16 seasons, Int32 counting stats, float32 rates, categorical schools).
+'''
+
+import os
+
+from typing import Dict
+from typing import List
+from typing import Any
+
+import pandas as pd
+
+import config
+from parse.pfr_parser import POSITION_SCHEMA
+
+
+KEY_COLUMNS: List[str] = ["player_key", "season"]
+
+
+def season_path(position: str) -> str:
+    return os.path.join(config.DATA_DIR, "seasons", f"{position.upper()}.parquet")
+
+
+def season_columns(position: str) -> List[str]:
+    ''' Stat columns for a position, POSITION_SCHEMA order, no duplicates '''
+    columns = []
+    for fields in POSITION_SCHEMA[position]["standards"].values():
+        for field in fields:
+            if field not in columns:
+                columns.append(field)
+    return columns
+
+
+def to_frame(records: List[Dict[str, Any]], position: str) -> pd.DataFrame:
+    '''
+    :param records : dicts with player_key, name, season, school, age + stat fields
+    :param position: key of POSITION_SCHEMA
+    :return        : typed long-format frame
+    '''
+    stats = season_columns(position)
+    base = ["player_key", "name", "season", "school", "age"]
+
+    df = pd.DataFrame.from_records(records, columns=base + stats)
+    df["player_key"] = df["player_key"].astype("string")
+    df["name"] = df["name"].astype("string")
+    df["season"] = df["season"].astype("Int16")
+    df["school"] = df["school"].astype("category")
+    df["age"] = df["age"].astype("Int8")
+
+    type_int = POSITION_SCHEMA[position]["type_int"]
+    for column in stats:
+        df[column] = df[column].astype("Int32" if column in type_int else "float32")
+
+    return df.sort_values(KEY_COLUMNS).reset_index(drop=True)
+
+
+def write_seasons(df: pd.DataFrame, position: str, *, merge: bool = True) -> str:
+    '''
+    Upsert on (player_key, season), newer rows win
+
+    :param df      : frame from to_frame
+    :param position: key of POSITION_SCHEMA
+    :param merge   : keep rows already on disk for players not in df
+    :return        : path written
+    '''
+    path = season_path(position)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if merge and os.path.exists(path):
+        existing = pd.read_parquet(path)
+        df = pd.concat([existing, df], ignore_index=True)
+        df = df.drop_duplicates(subset=KEY_COLUMNS, keep="last")
+        df["school"] = df["school"].astype("category")
+        df = df.sort_values(KEY_COLUMNS).reset_index(drop=True)
+
+    tmp_path = path + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+    return path
+
+
+def read_seasons(position: str, *, columns: List[str] = None) -> pd.DataFrame:
+    '''
+    :param position: key of POSITION_SCHEMA
+    :param columns : OPTIONAL column subset, only those are read off disk
+    :return        : long-format frame, empty if nothing stored yet
+    '''
+    path = season_path(position)
+    if not os.path.exists(path):
+        return to_frame([], position.upper())
+    return pd.read_parquet(path, columns=columns)
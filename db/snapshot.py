@@ -0,0 +1,383 @@
+'''
+Versioned read-only snapshots of data/prospects.db.
+
+take_snapshot() copies the live file with the SQLite online backup API
+into SNAPSHOT_DIR/<id>/prospects.db and writes a manifest next to it
+(row counts, content hash of the data tables, schema version + hash).
+When the data tables hash the same as the newest snapshot, the copy is
+dropped and that snapshot is handed back instead. When the live file
+hasn't even been committed to since (size, mtime, header change counter)
+nothing is copied at all, so taking one before every training run is cheap.
+
+Readers open a snapshot with mode=ro&immutable=1: SQLite takes no locks
+and never looks at the live DB or its journal, so scrapers keep writing
+while a training run reads a fixed version.
+
+    snapshot = take_snapshot(label="scoring")
+    connection = open_snapshot(snapshot.id)          # or "latest", or NGS_SNAPSHOT=<id>
+    batches = Loader.load_prospect_batches(connection=connection)
+
+    python -m db.snapshot take --label nightly
+    python -m db.snapshot list
+    python -m db.snapshot pin <id> --owner sweep-2024
+'''
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import stat
+import threading
+import time
+
+from dataclasses import asdict
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+
+from typing import Dict
+from typing import List
+
+import config
+import metrics
+import db.sqlite as StoreSQL
+
+
+SNAPSHOT_FILE = "prospects.db"
+MANIFEST_FILE = "manifest.json"
+
+#what training reads, the content hash covers these, every table is counted
+CONTENT_TABLES = ["players", "player_identities", "combine_results"]
+#rewritten by every upsert even when nothing changed, hashing them would defeat reuse
+_VOLATILE_COLUMNS = {"updated_at"}
+
+
+@dataclass
+class SnapshotManifest:
+    '''
+    id             : <UTC timestamp>-<content hash prefix>, sorts by age
+    created_at     : unix seconds
+    source         : live DB it was copied from
+    schema_version : user_version stamped by db_init
+    schema_hash    : sha1 of every CREATE statement
+    content_hash   : sha1 over CONTENT_TABLES rows minus updated_at, rowid order
+    tables         : table -> row count
+    table_hashes   : table -> sha1, CONTENT_TABLES only
+    bytes          : snapshot file size
+    label          : OPTIONAL free text (EXAMPLE :: the job that took it)
+    pinned_by      : owners that keep prune() away from it
+    source_stamp   : live file state when copied, a matching stamp skips the copy entirely
+    '''
+
+    id            : str
+    created_at    : float
+    source        : str
+    schema_version: int
+    schema_hash   : str
+    content_hash  : str
+    tables        : Dict[str, int] = field(default_factory=dict)
+    table_hashes  : Dict[str, str] = field(default_factory=dict)
+    bytes         : int = 0
+    label         : str = None
+    pinned_by     : List[str] = field(default_factory=list)
+    source_stamp  : List[int] = None
+
+    @property
+    def directory(self) -> Path:
+        return Path(config.SNAPSHOT_DIR) / self.id
+
+    @property
+    def path(self) -> Path:
+        return self.directory / SNAPSHOT_FILE
+
+    def write(self) -> None:
+        tmp = self.directory / f".{MANIFEST_FILE}.tmp"
+        with open(tmp, "w", encoding="utf-8") as file_ref:
+            json.dump(asdict(self), file_ref, indent=2, sort_keys=True)
+        os.replace(tmp, self.directory / MANIFEST_FILE)
+
+    @classmethod
+    def read(cls, directory: Path) -> "SnapshotManifest":
+        with open(Path(directory) / MANIFEST_FILE, encoding="utf-8") as file_ref:
+            return cls(**json.load(file_ref))
+
+
+# ---- Fingerprints ----
+def _source_stamp(path: str) -> List[int]:
+    '''
+    Size, mtime and the header's file change counter (bumped by every commit),
+    plus the -wal file's size / mtime, None when the file can't be read
+    '''
+    try:
+        info = os.stat(path)
+        with open(path, "rb") as file_ref:
+            header = file_ref.read(28)
+    except OSError:
+        return None
+    stamp = [info.st_size, info.st_mtime_ns, int.from_bytes(header[24:28], "big")]
+    try:
+        wal = os.stat(f"{path}-wal")
+        stamp += [wal.st_size, wal.st_mtime_ns]
+    except OSError:
+        pass
+    return stamp
+
+
+def _schema(connection: sqlite3.Connection):
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    ddl = connection.execute(
+        "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL ORDER BY type, name"
+    ).fetchall()
+    return version, hashlib.sha1("\n".join(row[0] for row in ddl).encode("utf-8")).hexdigest()
+
+
+def _fingerprint(connection: sqlite3.Connection):
+    '''
+    :return: (table -> row count, table -> sha1, combined sha1)
+    '''
+    #real tables only, FTS shadow tables follow players anyway
+    names = [row[0] for row in connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+        "AND name NOT LIKE 'players_fts%' ORDER BY name"
+    )]
+
+    counts: Dict[str, int] = {}
+    hashes: Dict[str, str] = {}
+    combined = hashlib.sha1()
+    for name in names:
+        counts[name] = connection.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+        if name not in CONTENT_TABLES:
+            continue
+        columns = [row[1] for row in connection.execute(f"PRAGMA table_info({name})")
+                   if row[1] not in _VOLATILE_COLUMNS]
+        digest = hashlib.sha1()
+        cursor = connection.execute(f"SELECT {', '.join(columns)} FROM {name} ORDER BY rowid")
+        cursor.row_factory = None
+        while True:
+            rows = cursor.fetchmany(config.EXPORT_BATCH)
+            if not rows:
+                break
+            digest.update(repr(rows).encode("utf-8"))
+        hashes[name] = digest.hexdigest()
+        combined.update(f"{name}:{hashes[name]}\n".encode("utf-8"))
+    return counts, hashes, combined.hexdigest()
+
+
+# ---- Snapshots ----
+def list_snapshots() -> List[SnapshotManifest]:
+    ''' Every complete snapshot, oldest first '''
+    root = Path(config.SNAPSHOT_DIR)
+    if not root.exists():
+        return []
+    manifests = []
+    for directory in sorted(root.iterdir()):
+        if (directory / MANIFEST_FILE).exists():
+            manifests.append(SnapshotManifest.read(directory))
+    return manifests
+
+
+def get_snapshot(snapshot_id: str = None) -> SnapshotManifest:
+    '''
+    :param snapshot_id: id, "latest", or None for config.SNAPSHOT_ID (latest when unset)
+    :return           : manifest, raises LookupError when there is no such snapshot
+    '''
+    snapshot_id = snapshot_id or config.SNAPSHOT_ID or "latest"
+    if snapshot_id == "latest":
+        snapshots = list_snapshots()
+        if not snapshots:
+            raise LookupError("[ERROR] No snapshots taken yet")
+        return snapshots[-1]
+
+    directory = Path(config.SNAPSHOT_DIR) / snapshot_id
+    if not (directory / MANIFEST_FILE).exists():
+        raise LookupError(f"[ERROR] No snapshot {snapshot_id}")
+    return SnapshotManifest.read(directory)
+
+
+_take_lock = threading.Lock()
+
+
+def take_snapshot(*, label: str = None, source: str = None, reuse: bool = True) -> SnapshotManifest:
+    '''
+    Online backup of the live DB into a new read-only snapshot
+
+    :param label : OPTIONAL free text kept in the manifest
+    :param source: OPTIONAL live DB path, data/prospects.db otherwise
+    :param reuse : hand back the newest snapshot instead when the data tables are unchanged
+    :return      : manifest of the new (or reused) snapshot
+    '''
+    source = str(source or StoreSQL._DATA_PATH)
+    root = Path(config.SNAPSHOT_DIR)
+    root.mkdir(parents=True, exist_ok=True)
+    tmp = root / f".partial-{os.getpid()}-{threading.get_ident()}.db"
+
+    with _take_lock:
+        started = time.perf_counter()
+        snapshots = list_snapshots()
+        latest = snapshots[-1] if snapshots else None
+
+        #nothing committed since the last snapshot, not even a copy is needed
+        stamp = _source_stamp(source)
+        if reuse and latest is not None and stamp is not None \
+                and latest.source == source and latest.source_stamp == stamp:
+            metrics.inc("snapshots_total", result="reused")
+            print(f"[INFO] Live DB untouched since snapshot {latest.id}, reusing it")
+            return latest
+
+        live = sqlite3.connect(source, timeout=30)
+        copy = sqlite3.connect(tmp)
+        try:
+            #one step: a consistent copy under a single read lock, ms per MB
+            live.backup(copy)
+            copy.execute("PRAGMA journal_mode = DELETE")
+            schema_version, schema_hash = _schema(copy)
+            tables, table_hashes, content_hash = _fingerprint(copy)
+        except BaseException:
+            copy.close()
+            tmp.unlink(missing_ok=True)
+            raise
+        finally:
+            live.close()
+        copy.close()
+
+        if reuse and latest is not None and latest.content_hash == content_hash \
+                and latest.schema_hash == schema_hash:
+            tmp.unlink()
+            if latest.source == source and stamp is not None:
+                #next time the stamp alone is enough
+                latest.source_stamp = stamp
+                latest.write()
+            metrics.inc("snapshots_total", result="reused")
+            print(f"[INFO] Data unchanged since snapshot {latest.id}, reusing it")
+            return latest
+
+        now = time.time()
+        manifest = SnapshotManifest(
+            id=f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(now))}-{content_hash[:8]}",
+            created_at=now, source=source, schema_version=schema_version, schema_hash=schema_hash,
+            content_hash=content_hash, tables=tables, table_hashes=table_hashes,
+            bytes=os.path.getsize(tmp), label=label, source_stamp=stamp,
+        )
+        if manifest.directory.exists():
+            #forced twice within a second on the same data, that's the same snapshot
+            tmp.unlink()
+            return SnapshotManifest.read(manifest.directory)
+        manifest.directory.mkdir()
+        os.replace(tmp, manifest.path)
+        os.chmod(manifest.path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        #the manifest goes last, a snapshot without one doesn't exist
+        manifest.write()
+
+    metrics.inc("snapshots_total", result="taken")
+    metrics.observe("snapshot_seconds", time.perf_counter() - started)
+    return manifest
+
+
+def open_snapshot(snapshot_id: str = None) -> sqlite3.Connection:
+    '''
+    Read-only, lock-free connection to a snapshot
+
+    :param snapshot_id: id, "latest", or None for config.SNAPSHOT_ID (latest when unset)
+    :return           : sqlite connection with the same row factory as StoreSQL.sql_get_connection
+    '''
+    manifest = get_snapshot(snapshot_id)
+    if manifest.schema_version != StoreSQL.SCHEMA_VERSION:
+        print(f"[WARNING] Snapshot {manifest.id} has schema version {manifest.schema_version}, "
+              f"code expects {StoreSQL.SCHEMA_VERSION}")
+
+    #immutable: no locks, no journal / WAL lookups, the file never changes
+    connection = sqlite3.connect(f"{manifest.path.resolve().as_uri()}?mode=ro&immutable=1",
+                                 uri=True, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+
+def verify_snapshot(snapshot_id: str = None) -> bool:
+    ''' Recompute counts + hashes and compare them with the manifest '''
+    manifest = get_snapshot(snapshot_id)
+    connection = open_snapshot(manifest.id)
+    try:
+        tables, table_hashes, content_hash = _fingerprint(connection)
+    finally:
+        connection.close()
+    return (tables, table_hashes, content_hash) == (manifest.tables, manifest.table_hashes, manifest.content_hash)
+
+
+# ---- Pinning / Retention ----
+def pin_snapshot(snapshot_id: str, owner: str) -> SnapshotManifest:
+    ''' Keep a snapshot around for owner (EXAMPLE :: a sweep that must be re-runnable) '''
+    manifest = get_snapshot(snapshot_id)
+    if owner not in manifest.pinned_by:
+        manifest.pinned_by.append(owner)
+        manifest.write()
+    return manifest
+
+
+def unpin_snapshot(snapshot_id: str, owner: str) -> SnapshotManifest:
+    manifest = get_snapshot(snapshot_id)
+    if owner in manifest.pinned_by:
+        manifest.pinned_by.remove(owner)
+        manifest.write()
+    return manifest
+
+
+def prune_snapshots(keep: int = config.SNAPSHOT_KEEP) -> List[str]:
+    '''
+    Delete all but the newest keep unpinned snapshots, pinned ones are never touched
+
+    :param keep: unpinned snapshots to keep
+    :return    : ids deleted
+    '''
+    unpinned = [manifest for manifest in list_snapshots() if not manifest.pinned_by]
+    doomed = unpinned[:max(len(unpinned) - keep, 0)]
+    for manifest in doomed:
+        #manifest first, so a half-deleted snapshot is already invisible
+        (manifest.directory / MANIFEST_FILE).unlink()
+        os.chmod(manifest.path, stat.S_IRUSR | stat.S_IWUSR)
+        shutil.rmtree(manifest.directory)
+    return [manifest.id for manifest in doomed]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read-only snapshots of the player store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    take = sub.add_parser("take")
+    take.add_argument("--label", default=None)
+    take.add_argument("--force", action="store_true", help="new snapshot even when nothing changed")
+    sub.add_parser("list")
+    for name in ("pin", "unpin"):
+        command = sub.add_parser(name)
+        command.add_argument("id")
+        command.add_argument("--owner", required=True)
+    verify = sub.add_parser("verify")
+    verify.add_argument("id", nargs="?", default="latest")
+    prune = sub.add_parser("prune")
+    prune.add_argument("--keep", type=int, default=config.SNAPSHOT_KEEP)
+    args = parser.parse_args()
+
+    if args.command == "take":
+        started = time.perf_counter()
+        manifest = take_snapshot(label=args.label, reuse=not args.force)
+        print(f"[INFO] Snapshot {manifest.id} ({manifest.bytes / 1024 / 1024:.1f} MiB, "
+              f"{manifest.tables.get('players', 0)} players) in {time.perf_counter() - started:.2f}s")
+    elif args.command == "list":
+        for manifest in list_snapshots():
+            pinned = f" pinned by {', '.join(manifest.pinned_by)}" if manifest.pinned_by else ""
+            print(f"{manifest.id}  v{manifest.schema_version}  {manifest.tables.get('players', 0):>7} players  "
+                  f"{manifest.label or ''}{pinned}")
+    elif args.command == "pin":
+        print(f"[INFO] Pinned {pin_snapshot(args.id, args.owner).id} for {args.owner}")
+    elif args.command == "unpin":
+        print(f"[INFO] Unpinned {unpin_snapshot(args.id, args.owner).id} for {args.owner}")
+    elif args.command == "verify":
+        ok = verify_snapshot(args.id)
+        print(f"[INFO] Snapshot {get_snapshot(args.id).id} {'matches' if ok else 'DOES NOT match'} its manifest")
+    else:
+        deleted = prune_snapshots(args.keep)
+        print(f"[INFO] Pruned {len(deleted)} snapshots")
+
+
+if __name__ == "__main__":
+    main()
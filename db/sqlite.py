@@ -4,16 +4,33 @@ SQLite to persist player data to avoid Http calls
 
 import sqlite3
 import json
+import re
+import time
 import pandas as pd
 
 from pathlib import Path
 from typing import List
+from typing import Dict
+from typing import Any
+from typing import Iterator
 
 import dataclasses
 from pos_models import Player
+from parse.pfr_parser import canonical_player_path
+from parse.pfr_parser import COMBINE_FIELDS
+from parse.pfr_parser import POSITION_SCHEMA
 import config
+import metrics
+import profiling
 
 _DATA_PATH = config.DATA_DIR / "prospects.db"
+#bump when a table changes shape, stamped into the file as user_version (snapshots record it)
+SCHEMA_VERSION = 2
+
+#every stats_json key any position has, POSITION_SCHEMA order (loader + export read these out of stats_json)
+STAT_FIELDS: List[str] = list(dict.fromkeys(
+    field for schema in POSITION_SCHEMA.values() for fields in schema["standards"].values() for field in fields
+))
 
 _SQL_SCHEMA = """
 CREATE TABLE IF NOT EXISTS players (
@@ -28,37 +45,518 @@ CREATE TABLE IF NOT EXISTS players (
     stats_json TEXT,
     UNIQUE(name, college, position)
 );
+
+--one college player = one /cfb/players/<slug>.html path, however many
+--(name, college, position) rows transfers / position remaps split them into
+CREATE TABLE IF NOT EXISTS player_identities (
+    player_id  INTEGER PRIMARY KEY REFERENCES players(id) ON DELETE CASCADE,
+    identity   TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS player_identities_identity ON player_identities (identity);
+
+CREATE TABLE IF NOT EXISTS failed_fetches (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    url             TEXT NOT NULL,
+    source          TEXT NOT NULL,
+    stage           TEXT NOT NULL,
+    year            INTEGER,
+    position        TEXT,
+    name            TEXT,
+    payload_json    TEXT,
+    error_class     TEXT,
+    error_message   TEXT,
+    http_status     INTEGER,
+    attempts        INTEGER NOT NULL DEFAULT 1,
+    first_failed_at REAL NOT NULL,
+    last_failed_at  REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    UNIQUE(url)
+);
+
+CREATE TABLE IF NOT EXISTS scrape_jobs (
+    id               INTEGER PRIMARY KEY AUTOINCREMENT,
+    job              TEXT NOT NULL,
+    kind             TEXT NOT NULL,
+    task_key         TEXT NOT NULL,
+    year             INTEGER,
+    payload_json     TEXT,
+    state            TEXT NOT NULL DEFAULT 'queued',
+    attempts         INTEGER NOT NULL DEFAULT 0,
+    lease_owner      TEXT,
+    lease_expires_at REAL,
+    heartbeat_at     REAL,
+    available_at     REAL NOT NULL DEFAULT 0,
+    error_message    TEXT,
+    created_at       REAL NOT NULL,
+    finished_at      REAL,
+    UNIQUE(job, task_key)
+);
+
+CREATE INDEX IF NOT EXISTS scrape_jobs_claim ON scrape_jobs (job, state, id);
+
+--one row per combine invitee per year, linked to players through identity
+CREATE TABLE IF NOT EXISTS combine_results (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    year       INTEGER NOT NULL,
+    name       TEXT NOT NULL,
+    pos        TEXT NOT NULL,
+    position   TEXT,
+    college    TEXT NOT NULL DEFAULT '',
+    stats_link TEXT,
+    identity   TEXT,
+    height     REAL,
+    weight     REAL,
+    forty      REAL,
+    vertical   REAL,
+    bench      REAL,
+    broad_jump REAL,
+    cone       REAL,
+    shuttle    REAL,
+    updated_at REAL NOT NULL,
+    UNIQUE(year, name, college, pos)
+);
+
+CREATE INDEX IF NOT EXISTS combine_results_identity ON combine_results (identity);
+"""
+
+#columns added after their table first shipped, CREATE TABLE IF NOT EXISTS leaves older files without them
+_SQL_ADDED_COLUMNS = {
+    "scrape_jobs": {"available_at": "REAL NOT NULL DEFAULT 0"},
+}
+
+#PFR / Sports-Reference / CFBD disagree on punctuation: "A.J. Brown" == "AJ Brown", "St. Brown" == "St Brown"
+_SQL_NAME_KEY = ("lower(replace(replace(replace(replace(replace({0}, '.', ''), '''', ''), ',', ''),"
+                 " '\"', ''), '-', ' '))")
+
+#trigram index over normalized names, kept in sync with players by triggers
+_SQL_NAME_INDEX = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS players_fts USING fts5(
+    name, college, position UNINDEXED, tokenize = 'trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS players_fts_insert AFTER INSERT ON players BEGIN
+    INSERT INTO players_fts (rowid, name, college, position)
+    VALUES (new.id, {_SQL_NAME_KEY.format("new.name")}, new.college, new.position);
+END;
+
+CREATE TRIGGER IF NOT EXISTS players_fts_delete AFTER DELETE ON players BEGIN
+    DELETE FROM players_fts WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS players_fts_update AFTER UPDATE OF name, college, position ON players BEGIN
+    DELETE FROM players_fts WHERE rowid = old.id;
+    INSERT INTO players_fts (rowid, name, college, position)
+    VALUES (new.id, {_SQL_NAME_KEY.format("new.name")}, new.college, new.position);
+END;
 """
 
 
 # ---- Helper Functions ----
-def db_init(path: str = _DATA_PATH) -> None:
+def db_init(path: str = None) -> None:
     '''
     Initializes the DB file + schmea
 
-    :param path  : path to the sqlite database file
+    :param path  : path to the sqlite database file, defaults to data/prospects.db
     :return      : Nothing
     '''
-    connection = sqlite3.connect(path)
+    connection = sqlite3.connect(path or _DATA_PATH)
     try:
-        connection.executescript(_SQL_SCHEMA)
+        connection.executescript(_SQL_SCHEMA + _SQL_NAME_INDEX)
+        _add_missing_columns(connection)
+        connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        #rows written before the name index existed
+        _sync_name_index(connection)
+        #rows written before the identity table existed
+        sql_sync_identities(connection=connection)
     finally:
         connection.close()
 
     return
 
-def sql_get_connection(path: str = _DATA_PATH) -> sqlite3.Connection:
+def _add_missing_columns(connection: sqlite3.Connection) -> None:
+    ''' Brings tables created by an older schema up to _SQL_ADDED_COLUMNS '''
+    with connection:
+        for table, columns in _SQL_ADDED_COLUMNS.items():
+            existing = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+            for column, declaration in columns.items():
+                if column not in existing:
+                    connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+def sql_get_connection(path: str = None) -> sqlite3.Connection:
     '''
     Returns a connection object to the sqlite database
 
-    :param path  : path to sqlite database
+    :param path  : path to sqlite database, defaults to data/prospects.db
     :return      : sqlite connection
     '''
-    connection = sqlite3.connect(path)
+    #queue workers share the file, wait on their write locks instead of failing
+    connection = sqlite3.connect(path or _DATA_PATH, timeout=30)
     connection.row_factory = sqlite3.Row
 
     return connection
 
+
+# ---- Name Search ----
+_NAME_SUFFIXES = {"jr", "sr", "ii", "iii", "iv", "v"}
+_RE_NAME_PUNCT = re.compile(r"[.',\"]")
+
+#names sharing less than this (trigram jaccard) with the query aren't fuzzy matches
+_FUZZY_MIN_SCORE = 0.3
+
+def name_key(name: str) -> str:
+    ''' Python side of _SQL_NAME_KEY, plus whitespace collapsed '''
+    return " ".join(_RE_NAME_PUNCT.sub("", name or "").replace("-", " ").lower().split())
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _phrase(text: str) -> str:
+    ''' FTS5 string literal '''
+    return '"' + text.replace('"', '""') + '"'
+
+def _sync_name_index(connection: sqlite3.Connection) -> None:
+    ''' (Re)builds players_fts when it is out of step with players '''
+    in_step = connection.execute(
+        "SELECT (SELECT COUNT(*) FROM players) = (SELECT COUNT(*) FROM players_fts)"
+    ).fetchone()[0]
+    if in_step:
+        return
+    with connection:
+        connection.execute("DELETE FROM players_fts")
+        connection.execute(
+            "INSERT INTO players_fts (rowid, name, college, position) "
+            f"SELECT id, {_SQL_NAME_KEY.format('name')}, college, position FROM players"
+        )
+
+def sql_search_names(query: str,
+                     *, position: str = None,
+                        college: str = None,
+                        limit: int = 20,
+                        connection: sqlite3.Connection = None) -> List[Dict[str, Any]]:
+    '''
+    Ranked name search over the trigram index, punctuation + suffix
+    ("Jr.", "III") insensitive. Names containing every query word come
+    first (exact, suffix-less exact, prefix, then bm25); if that leaves room, names
+    sharing the most trigrams fill the rest (typos, nicknames)
+
+    :param query     : full or partial name, typeahead prefixes included
+    :param position  : OPTIONAL exact position
+    :param college   : OPTIONAL college, case-insensitive
+    :param limit     : max matches
+    :param connection: OPTIONAL sqlite connection
+    :return          : [{id, name, position, college, match, score}], best first
+    '''
+
+    key = name_key(query)
+    words = [word for word in key.split() if word not in _NAME_SUFFIXES] or key.split()
+    if not words or limit <= 0:
+        return []
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    filters, filter_params = "", []
+    if position:
+        filters += " AND f.position = ?"
+        filter_params.append(position.upper())
+    if college:
+        filters += " AND p.college = ? COLLATE NOCASE"
+        filter_params.append(college)
+
+    select = ("SELECT p.id, p.name, p.position, p.college, f.name AS name_key"
+              " FROM players_fts f JOIN players p ON p.id = f.rowid")
+
+    #every word: trigram index where it can be, LIKE for 1-2 letter words
+    long_words = [word for word in words if len(word) >= 3]
+    where, params = [], []
+    if long_words:
+        where.append("players_fts MATCH ?")
+        params.append(" AND ".join(_phrase(word) for word in long_words))
+    for word in words:
+        if len(word) < 3:
+            where.append("f.name LIKE ?")
+            params.append(f"%{word}%")
+
+    joined = " ".join(words)
+    rows = connection.execute(
+        f"{select} WHERE {' AND '.join(where)}{filters}"
+        " ORDER BY (f.name = ?) DESC, (f.name = ?) DESC, (f.name LIKE ?) DESC, "
+        + ("bm25(players_fts)" if long_words else "length(f.name)")
+        + " LIMIT ?",
+        params + filter_params + [key, joined, f"{joined}%", limit],
+    ).fetchall()
+
+    results = []
+    for row in rows:
+        stored = name_key(row["name_key"])
+        match = "exact" if stored in (key, joined) \
+            else "prefix" if stored.startswith(joined) else "contains"
+        results.append({"id": row["id"], "name": row["name"], "position": row["position"],
+                        "college": row["college"], "match": match, "score": 1.0})
+
+    #fuzzy fill: any shared trigram, re-ranked by trigram jaccard
+    wanted = _trigrams(joined)
+    if len(results) < limit and wanted:
+        seen = {result["id"] for result in results}
+        candidates = connection.execute(
+            f"{select} WHERE players_fts MATCH ?{filters} ORDER BY bm25(players_fts) LIMIT ?",
+            [" OR ".join(_phrase(trigram) for trigram in sorted(wanted))] + filter_params + [limit * 5],
+        ).fetchall()
+
+        fuzzy = []
+        for row in candidates:
+            if row["id"] in seen:
+                continue
+            have = _trigrams(name_key(row["name_key"]))
+            score = len(wanted & have) / len(wanted | have)
+            if score >= _FUZZY_MIN_SCORE:
+                fuzzy.append({"id": row["id"], "name": row["name"], "position": row["position"],
+                              "college": row["college"], "match": "fuzzy", "score": round(score, 3)})
+        fuzzy.sort(key=lambda result: -result["score"])
+        results.extend(fuzzy[:limit - len(results)])
+
+    if do_close:
+        connection.close()
+
+    metrics.inc("name_search_total", result="hit" if results else "miss")
+    return results
+
+
+# ---- Player Identity ----
+_SQL_MAP_IDENTITY = (
+    "INSERT INTO player_identities (player_id, identity, updated_at) "
+    "SELECT id, :identity, :now FROM players "
+    "WHERE name = :name AND college IS :college AND position = :position "
+    "ON CONFLICT (player_id) DO UPDATE SET\n"
+    "  identity   = excluded.identity,\n"
+    "  updated_at = excluded.updated_at;"
+)
+
+def sql_sync_identities(*, only_missing: bool = True,
+                        connection: sqlite3.Connection = None) -> int:
+    '''
+    Map player rows to their canonical identity
+
+    :param only_missing: only rows with no mapping yet, every row with a stats_link otherwise
+    :param connection  : OPTIONAL sqlite connection
+    :return            : rows mapped
+    '''
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    sql_query = "SELECT p.id, p.stats_link FROM players p"
+    if only_missing:
+        sql_query += " LEFT JOIN player_identities i ON i.player_id = p.id WHERE i.player_id IS NULL AND"
+    else:
+        sql_query += " WHERE"
+    sql_query += " p.stats_link IS NOT NULL"
+
+    now = time.time()
+    mapped = [(player_id, canonical_player_path(stats_link), now)
+              for player_id, stats_link in connection.execute(sql_query).fetchall()
+              if canonical_player_path(stats_link)]
+
+    with connection:
+        connection.executemany(
+            "INSERT INTO player_identities (player_id, identity, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (player_id) DO UPDATE SET identity = excluded.identity, updated_at = excluded.updated_at",
+            mapped,
+        )
+
+    if do_close:
+        connection.close()
+
+    return len(mapped)
+
+def sql_identity_players(identity: str,
+                         *, connection: sqlite3.Connection = None) -> List[Dict[str, Any]]:
+    '''
+    Every player row for one college player
+
+    :param identity  : stats_link in any form, canonicalized here
+    :param connection: OPTIONAL sqlite connection
+    :return          : player rows as dicts, oldest first
+    '''
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    rows = connection.execute(
+        "SELECT p.* FROM players p JOIN player_identities i ON i.player_id = p.id "
+        "WHERE i.identity = ? ORDER BY p.id",
+        (canonical_player_path(identity) or identity,),
+    ).fetchall()
+
+    if do_close:
+        connection.close()
+
+    return [dict(row) for row in rows]
+
+def sql_duplicate_identities(*, connection: sqlite3.Connection = None) -> Dict[str, List[int]]:
+    '''
+    Identities split over more than one player row (transfers, TE/WR or S/CB remaps)
+
+    :param connection: OPTIONAL sqlite connection
+    :return          : identity -> player ids, oldest first
+    '''
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    rows = connection.execute(
+        "SELECT identity, group_concat(player_id) FROM "
+        "(SELECT identity, player_id FROM player_identities ORDER BY player_id) "
+        "GROUP BY identity HAVING COUNT(*) > 1"
+    ).fetchall()
+
+    if do_close:
+        connection.close()
+
+    return {identity: [int(player_id) for player_id in ids.split(",")] for identity, ids in rows}
+
+
+
+# ---- Combine ----
+COMBINE_COLUMNS = list(COMBINE_FIELDS.values())
+
+_SQL_UPSERT_COMBINE = (
+    "INSERT INTO combine_results (year, name, pos, position, college, stats_link, identity, "
+    + ", ".join(COMBINE_COLUMNS) + ", updated_at) "
+    "VALUES (:year, :name, :pos, :position, :college, :stats_link, :identity, "
+    + ", ".join(f":{column}" for column in COMBINE_COLUMNS) + ", :now) "
+    "ON CONFLICT (year, name, college, pos) DO UPDATE SET\n"
+    "  position   = excluded.position,\n"
+    "  stats_link = excluded.stats_link,\n"
+    "  identity   = excluded.identity,\n"
+    + "".join(f"  {column} = excluded.{column},\n" for column in COMBINE_COLUMNS) +
+    "  updated_at = excluded.updated_at;"
+)
+
+#measured height / weight beat nothing, never what a player page already gave us
+_SQL_FILL_PHYSICALS = """
+UPDATE players SET
+    height = coalesce(height, (SELECT CAST(c.height AS INTEGER) FROM combine_results c
+                               JOIN player_identities i ON i.identity = c.identity
+                               WHERE i.player_id = players.id AND c.height IS NOT NULL
+                               ORDER BY c.year DESC LIMIT 1)),
+    weight = coalesce(weight, (SELECT CAST(c.weight AS INTEGER) FROM combine_results c
+                               JOIN player_identities i ON i.identity = c.identity
+                               WHERE i.player_id = players.id AND c.weight IS NOT NULL
+                               ORDER BY c.year DESC LIMIT 1))
+WHERE (height IS NULL OR weight IS NULL)
+  AND id IN (SELECT i.player_id FROM player_identities i
+             JOIN combine_results c ON c.identity = i.identity WHERE c.year = ?)
+"""
+
+def sql_update_combine(year: int, rows: List[Dict[str, Any]],
+                       *, connection: sqlite3.Connection = None) -> int:
+    '''
+    Upsert one year of parse_combine_page rows, then fill the height / weight
+    players are missing from the matching combine rows
+
+    :param year      : combine year
+    :param rows      : parse_combine_page output
+    :param connection: OPTIONAL sqlite connection
+    :return          : rows written
+    '''
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    now = time.time()
+    records = [
+        {**{column: row.get(column) for column in COMBINE_COLUMNS},
+         "year": year, "name": row["name"], "pos": row["pos"], "position": row.get("position"),
+         "college": row.get("college") or "", "stats_link": row.get("stats_link"),
+         "identity": canonical_player_path(row.get("stats_link")), "now": now}
+        for row in rows
+    ]
+
+    with metrics.timer("db_commit_seconds", table="combine_results"):
+        with connection:
+            connection.executemany(_SQL_UPSERT_COMBINE, records)
+            connection.execute(_SQL_FILL_PHYSICALS, (year,))
+    metrics.inc("db_rows_written_total", len(records), table="combine_results")
+
+    if do_close:
+        connection.close()
+
+    return len(records)
+
+def sql_combine_years(*, connection: sqlite3.Connection = None) -> set:
+    '''
+    :param connection: OPTIONAL sqlite connection
+    :return          : combine years already stored
+    '''
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    rows = connection.execute("SELECT DISTINCT year FROM combine_results").fetchall()
+
+    if do_close:
+        connection.close()
+
+    return {row[0] for row in rows}
+
+def sql_combine_results(years: List[int] = None, positions: List[str] = None,
+                        *, connection: sqlite3.Connection = None) -> List[tuple]:
+    '''
+    Every combine row in one query, for the columnar composites
+
+    :param years     : OPTIONAL combine years to keep, all otherwise
+    :param positions : OPTIONAL combine positions (pos) to keep, all otherwise
+    :param connection: OPTIONAL sqlite connection
+    :return          : (year, pos, position, name, college, identity, player_id, *COMBINE_COLUMNS) tuples,
+                       player_id is the oldest player row with the same identity, None when unmatched
+    '''
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    sql_query = (
+        "SELECT c.year, c.pos, c.position, c.name, c.college, c.identity, "
+        "(SELECT MIN(i.player_id) FROM player_identities i WHERE i.identity = c.identity), "
+        + ", ".join(f"c.{column}" for column in COMBINE_COLUMNS) +
+        " FROM combine_results c"
+    )
+    clauses, params = [], []
+    if years:
+        clauses.append(f"c.year IN ({', '.join('?' for _ in years)})")
+        params.extend(years)
+    if positions:
+        clauses.append(f"c.pos IN ({', '.join('?' for _ in positions)})")
+        params.extend(positions)
+    if clauses:
+        sql_query += " WHERE " + " AND ".join(clauses)
+    sql_query += " ORDER BY c.year, c.id"
+
+    cursor = connection.execute(sql_query, params)
+    cursor.row_factory = None
+    rows = cursor.fetchall()
+
+    if do_close:
+        connection.close()
+
+    return rows
+
 #initialize the DB
 db_init()
 
@@ -97,6 +595,17 @@ def _player_to_row(player: Player) -> dict:
 
 
 # ---- DB Writing Helper ----
+#dedup rule for players, shared by every write path
+_SQL_UPSERT_PLAYERS = (
+    "ON CONFLICT (name, college, position) DO UPDATE SET\n"
+    "  age        = excluded.age,\n"
+    "  height     = excluded.height,\n "
+    "  weight     = excluded.weight,\n"
+    "  stats_link = excluded.stats_link,\n"
+    "  stats_json = excluded.stats_json;"
+)
+
+@profiling.profiled("db")
 def sql_update_players(players: List[Player],
                    *, connection: sqlite3.Connection = None) -> None:
     '''
@@ -114,17 +623,21 @@ def sql_update_players(players: List[Player],
     sql_query = (
         "INSERT INTO players (name, position, age, height, weight, college, stats_link, stats_json)"
         "VALUES (:name, :position, :age, :height, :weight, :college, :stats_link, :stats_json)"
-        "ON CONFLICT (name, college, position) DO UPDATE SET\n"
-        "  age        = excluded.age,\n"
-        "  height     = excluded.height,\n "
-        "  weight     = excluded.weight,\n"
-        "  stats_link = excluded.stats_link,\n"
-        "  stats_json = excluded.stats_json;"
+        + _SQL_UPSERT_PLAYERS
     )
     rows = [_player_to_row(player) for player in players]
 
-    with connection:
-        connection.executemany(sql_query, rows)
+    identities = [
+        {"identity": canonical_player_path(row["stats_link"]), "name": row["name"],
+         "college": row["college"], "position": row["position"], "now": time.time()}
+        for row in rows if canonical_player_path(row["stats_link"])
+    ]
+
+    with metrics.timer("db_commit_seconds", table="players"):
+        with connection:
+            connection.executemany(sql_query, rows)
+            connection.executemany(_SQL_MAP_IDENTITY, identities)
+    metrics.inc("db_rows_written_total", len(rows), table="players")
 
     if do_close:
         connection.close()
@@ -132,6 +645,61 @@ def sql_update_players(players: List[Player],
     return
 
 
+def sql_merge_shard(shard_path: str,
+                    *, connection: sqlite3.Connection = None) -> int:
+    '''
+    Fold a worker's shard DB into this one: players go through the same
+    (name, college, position) upsert as sql_update_players, dead-letter
+    rows keep the higher attempt count
+
+    :param shard_path: path to the shard sqlite file
+    :param connection: OPTIONAL sqlite connection to merge into
+    :return          : player rows read from the shard
+    '''
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    connection.execute("ATTACH DATABASE ? AS shard", (str(shard_path),))
+    try:
+        with metrics.timer("db_commit_seconds", table="shard_merge"):
+            with connection:
+                rows = connection.execute("SELECT COUNT(*) FROM shard.players").fetchone()[0]
+                #WHERE true keeps sqlite from reading ON CONFLICT as a join constraint
+                connection.execute(
+                    "INSERT INTO players (name, position, age, height, weight, college, stats_link, stats_json)"
+                    "SELECT name, position, age, height, weight, college, stats_link, stats_json"
+                    " FROM shard.players WHERE true ORDER BY id "
+                    + _SQL_UPSERT_PLAYERS
+                )
+                connection.execute(
+                    "INSERT INTO failed_fetches (url, source, stage, year, position, name, payload_json,"
+                    " error_class, error_message, http_status, attempts, first_failed_at,"
+                    " last_failed_at, next_attempt_at)"
+                    " SELECT url, source, stage, year, position, name, payload_json, error_class,"
+                    " error_message, http_status, attempts, first_failed_at, last_failed_at, next_attempt_at"
+                    " FROM shard.failed_fetches WHERE true "
+                    "ON CONFLICT (url) DO UPDATE SET\n"
+                    "  attempts        = max(attempts, excluded.attempts),\n"
+                    "  error_class     = excluded.error_class,\n"
+                    "  error_message   = excluded.error_message,\n"
+                    "  last_failed_at  = max(last_failed_at, excluded.last_failed_at),\n"
+                    "  next_attempt_at = max(next_attempt_at, excluded.next_attempt_at);"
+                )
+    finally:
+        connection.execute("DETACH DATABASE shard")
+    #merged rows may have new ids or new links, re-derive every mapping
+    sql_sync_identities(only_missing=False, connection=connection)
+    metrics.inc("db_rows_written_total", rows, table="shard_merge")
+
+    if do_close:
+        connection.close()
+
+    return rows
+
+
 # ---- DB Reading Helpers ----
 def _expand_json(df: pd.DataFrame) -> pd.DataFrame:
     '''
@@ -152,6 +720,69 @@ def _expand_json(df: pd.DataFrame) -> pd.DataFrame:
         df = pd.concat([df, expanded_json], axis=1)
         return df
 
+def sql_known_links(*, connection: sqlite3.Connection = None) -> set:
+    '''
+    Identities of players whose stats page has already been parsed in,
+    under any of their rows
+
+    :param connection: OPTIONAL sqlite connection
+    :return          : set of canonical /cfb/players/<slug>.html paths
+    '''
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    rows = connection.execute(
+        "SELECT DISTINCT i.identity FROM players p JOIN player_identities i ON i.player_id = p.id "
+        "WHERE p.stats_json IS NOT NULL AND p.stats_json != '{}'"
+    ).fetchall()
+
+    if do_close:
+        connection.close()
+
+    return {row[0] for row in rows}
+
+
+def sql_players_by_position(fields: List[str], positions: List[str] = None,
+                            *, connection: sqlite3.Connection = None) -> List[tuple]:
+    '''
+    One pass over players for the bulk loader: stats come straight out of
+    stats_json with json_extract, no JSON is decoded in python
+
+    :param fields    : stats_json keys to pull out, one column each
+    :param positions : OPTIONAL positions to keep, all otherwise
+    :param connection: OPTIONAL sqlite connection
+    :return          : (position, id, name, age, height, weight, college, *fields) tuples,
+                       grouped by position, insertion order within one
+    '''
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    #fields come from POSITION_SCHEMA, never from user input
+    extracted = "".join(f", json_extract(stats_json, '$.{field}')" for field in fields)
+    sql_query = f"SELECT position, id, name, age, height, weight, college{extracted} FROM players"
+    params = []
+    if positions:
+        sql_query += f" WHERE position IN ({', '.join('?' for _ in positions)})"
+        params.extend(positions)
+    sql_query += " ORDER BY position, id"
+
+    cursor = connection.execute(sql_query, params)
+    #plain tuples, the row factory would build a sqlite3.Row per player
+    cursor.row_factory = None
+    rows = cursor.fetchall()
+
+    if do_close:
+        connection.close()
+
+    return rows
+
+
 def sql_search_players(
         *, name: str = None, position: str = None, college: str = None,
         connection: sqlite3.Connection = None) -> pd.DataFrame:
@@ -172,20 +803,29 @@ def sql_search_players(
         do_close = True
 
     sql_query = "SELECT * FROM players"
+    clauses = list()
     params = list()
 
     #build SQL query
     if name:
-        sql_query += " WHERE name = ?"
-        params.append(name)
+        #punctuation-insensitive exact name, found through the trigram index
+        key = name_key(name)
+        if len(key) >= 3:
+            clauses.append("id IN (SELECT rowid FROM players_fts WHERE players_fts MATCH ? AND name = ?)")
+            params.extend([_phrase(key), key])
+        else:
+            clauses.append(f"{_SQL_NAME_KEY.format('name')} = ?")
+            params.append(key)
     if position:
-        sql_query += " WHERE position = ?"
+        clauses.append("position = ?")
         params.append(position)
 
     if college:
-        sql_query += " WHERE college = ?"
+        clauses.append("college = ?")
         params.append(college)
 
+    if clauses:
+        sql_query += " WHERE " + " AND ".join(clauses)
 
     #store result in df
     df = pd.read_sql(sql_query, connection, params=params)
@@ -198,3 +838,450 @@ def sql_search_players(
 
     return df
 
+
+# ---- Dead-Letter Queue ----
+def _http_status(error: Exception) -> int:
+    ''' Pulls the status code off a requests.HTTPError, None otherwise '''
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def sql_record_failure(url: str, error: Exception,
+                       *, source: str, stage: str,
+                       player: Player = None, year: int = None,
+                       connection: sqlite3.Connection = None) -> None:
+    '''
+    Insert / bump a failed fetch or parse in the dead-letter table.
+    Each repeated failure pushes next_attempt_at out exponentially
+
+    :param url       : URL that failed
+    :param error     : the exception that was raised
+    :param source    : "prospect" or "draftee", decides how retry_failed replays it
+    :param stage     : "fetch" or "parse"
+    :param player    : OPTIONAL player stub, stored so it can be rebuilt on retry
+    :param year      : OPTIONAL draft year the player belongs to
+    :param connection: OPTIONAL sqlite connection
+    :return          : Nothing
+    '''
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    now = time.time()
+    payload = json.dumps(dataclasses.asdict(player)) if player is not None else None
+
+    with connection:
+        row = connection.execute(
+            "SELECT attempts FROM failed_fetches WHERE url = ?", (url,)
+        ).fetchone()
+        attempts = (row[0] + 1) if row else 1
+        next_attempt = now + config.DLQ_BASE_DELAY * config.BACKOFF_FACTOR ** (attempts - 1)
+
+        connection.execute(
+            "INSERT INTO failed_fetches (url, source, stage, year, position, name, payload_json,"
+            "  error_class, error_message, http_status, attempts,"
+            "  first_failed_at, last_failed_at, next_attempt_at)"
+            "VALUES (:url, :source, :stage, :year, :position, :name, :payload_json,"
+            "  :error_class, :error_message, :http_status, :attempts,"
+            "  :now, :now, :next_attempt_at)"
+            "ON CONFLICT (url) DO UPDATE SET\n"
+            "  stage           = excluded.stage,\n"
+            "  error_class     = excluded.error_class,\n"
+            "  error_message   = excluded.error_message,\n"
+            "  http_status     = excluded.http_status,\n"
+            "  attempts        = excluded.attempts,\n"
+            "  last_failed_at  = excluded.last_failed_at,\n"
+            "  next_attempt_at = excluded.next_attempt_at;",
+            {
+                "url": url,
+                "source": source,
+                "stage": stage,
+                "year": year,
+                "position": getattr(player, "position", None),
+                "name": getattr(player, "name", None),
+                "payload_json": payload,
+                "error_class": type(error).__name__,
+                "error_message": str(error),
+                "http_status": _http_status(error),
+                "attempts": attempts,
+                "now": now,
+                "next_attempt_at": next_attempt,
+            },
+        )
+
+    if do_close:
+        connection.close()
+
+    return
+
+
+def sql_get_failures(*, source: str = None, due_only: bool = False,
+                     max_attempts: int = None,
+                     connection: sqlite3.Connection = None) -> List[Dict[str, Any]]:
+    '''
+    Reads the dead-letter table, oldest due item first
+
+    :param source      : OPTIONAL "prospect" / "draftee" filter
+    :param due_only    : only return items whose backoff has expired
+    :param max_attempts: OPTIONAL skip items that already failed this many times
+    :param connection  : OPTIONAL sqlite connection
+    :return            : list of row dicts, payload_json decoded into "payload"
+    '''
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    clauses = []
+    params  = []
+    if source:
+        clauses.append("source = ?")
+        params.append(source)
+    if due_only:
+        clauses.append("next_attempt_at <= ?")
+        params.append(time.time())
+    if max_attempts is not None:
+        clauses.append("attempts < ?")
+        params.append(max_attempts)
+
+    sql_query = "SELECT * FROM failed_fetches"
+    if clauses:
+        sql_query += " WHERE " + " AND ".join(clauses)
+    sql_query += " ORDER BY next_attempt_at"
+
+    failures = []
+    for row in connection.execute(sql_query, params):
+        failure = dict(row)
+        failure["payload"] = json.loads(failure["payload_json"]) if failure["payload_json"] else None
+        failures.append(failure)
+
+    if do_close:
+        connection.close()
+
+    return failures
+
+
+def sql_clear_failure(url: str, *, connection: sqlite3.Connection = None) -> None:
+    '''
+    Removes a recovered item from the dead-letter table
+
+    :param url       : URL that has now succeeded
+    :param connection: OPTIONAL sqlite connection
+    :return          : Nothing
+    '''
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    with connection:
+        connection.execute("DELETE FROM failed_fetches WHERE url = ?", (url,))
+
+    if do_close:
+        connection.close()
+
+    return
+
+
+# ---- Job Queue ----
+def sql_enqueue_jobs(job: str, tasks: List[Dict[str, Any]],
+                     *, connection: sqlite3.Connection = None) -> int:
+    '''
+    Adds tasks to a job, a task_key already in the job is skipped so
+    re-enqueueing never duplicates a fetch
+
+    :param job       : job name shared by every worker (EXAMPLE :: prospects-2025)
+    :param tasks     : dicts with kind, task_key, OPTIONAL year + payload
+    :param connection: OPTIONAL sqlite connection
+    :return          : tasks actually added
+    '''
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    now = time.time()
+    rows = [(job, task["kind"], task["task_key"], task.get("year"),
+             json.dumps(task["payload"]) if task.get("payload") is not None else None, now)
+            for task in tasks]
+
+    with connection:
+        before = connection.total_changes
+        connection.executemany(
+            "INSERT OR IGNORE INTO scrape_jobs (job, kind, task_key, year, payload_json, created_at)"
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        added = connection.total_changes - before
+
+    if do_close:
+        connection.close()
+
+    return added
+
+
+def sql_claim_jobs(job: str, owner: str,
+                   *, batch: int = config.JOB_BATCH,
+                      lease_seconds: float = config.JOB_LEASE_SECONDS,
+                      connection: sqlite3.Connection = None) -> List[Dict[str, Any]]:
+    '''
+    Atomically lease up to batch queued tasks whose retry backoff is over.
+    Leases that ran past their visibility timeout go back to queued first,
+    so a dead worker's tasks get picked up by the next claim
+
+    :param job          : job name
+    :param owner        : unique worker id, only the owner can ack / extend
+    :param batch        : max tasks to lease
+    :param lease_seconds: visibility timeout
+    :param connection   : OPTIONAL sqlite connection
+    :return             : leased rows, payload_json decoded into "payload"
+    '''
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    now = time.time()
+    #IMMEDIATE takes the write lock up front, no two workers see the same rows
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        expired = connection.execute(
+            "UPDATE scrape_jobs SET state = 'queued', lease_owner = NULL, lease_expires_at = NULL "
+            "WHERE job = ? AND state = 'leased' AND lease_expires_at < ?",
+            (job, now),
+        ).rowcount
+
+        rows = connection.execute(
+            "SELECT * FROM scrape_jobs WHERE job = ? AND state = 'queued' AND available_at <= ? "
+            "ORDER BY id LIMIT ?",
+            (job, now, batch),
+        ).fetchall()
+        connection.executemany(
+            "UPDATE scrape_jobs SET state = 'leased', lease_owner = ?, lease_expires_at = ?, "
+            "heartbeat_at = ?, attempts = attempts + 1 WHERE id = ?",
+            [(owner, now + lease_seconds, now, row["id"]) for row in rows],
+        )
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+    if expired:
+        metrics.inc("job_leases_expired_total", expired, job=job)
+    metrics.inc("job_claimed_total", len(rows), job=job)
+
+    claimed = []
+    for row in rows:
+        task = dict(row)
+        task["payload"] = json.loads(task["payload_json"]) if task["payload_json"] else None
+        task["attempts"] += 1
+        claimed.append(task)
+
+    if do_close:
+        connection.close()
+
+    return claimed
+
+
+def sql_heartbeat_jobs(ids: List[int], owner: str,
+                       *, lease_seconds: float = config.JOB_LEASE_SECONDS,
+                          connection: sqlite3.Connection = None) -> int:
+    '''
+    Push the lease out on tasks this owner still holds
+
+    :return: leases extended, fewer than len(ids) means some were lost
+    '''
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    now = time.time()
+    with connection:
+        extended = connection.executemany(
+            "UPDATE scrape_jobs SET lease_expires_at = ?, heartbeat_at = ? "
+            "WHERE id = ? AND lease_owner = ? AND state = 'leased'",
+            [(now + lease_seconds, now, job_id, owner) for job_id in ids],
+        ).rowcount
+
+    if do_close:
+        connection.close()
+
+    return extended
+
+
+def sql_ack_jobs(ids: List[int], owner: str,
+                 *, connection: sqlite3.Connection = None) -> int:
+    '''
+    Mark leased tasks done. A lease that already expired and moved to
+    another worker isn't touched
+
+    :return: tasks acknowledged
+    '''
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    now = time.time()
+    with connection:
+        acked = connection.executemany(
+            "UPDATE scrape_jobs SET state = 'done', finished_at = ?, lease_owner = NULL, "
+            "lease_expires_at = NULL WHERE id = ? AND lease_owner = ? AND state = 'leased'",
+            [(now, job_id, owner) for job_id in ids],
+        ).rowcount
+
+    if do_close:
+        connection.close()
+
+    return acked
+
+
+def sql_fail_job(job_id: int, owner: str, error: Exception,
+                 *, max_attempts: int = config.DLQ_MAX_ATTEMPTS,
+                    connection: sqlite3.Connection = None) -> str:
+    '''
+    Release a task that failed, back to queued until it runs out of attempts.
+    Like failed_fetches, each requeue waits out an exponential backoff
+    (available_at) before it can be claimed again
+
+    :return: the task's new state, "queued" or "failed"
+    '''
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    now = time.time()
+    with connection:
+        row = connection.execute(
+            "SELECT attempts FROM scrape_jobs WHERE id = ? AND lease_owner = ?", (job_id, owner)
+        ).fetchone()
+        attempts = row[0] if row else 1
+        available_at = now + config.DLQ_BASE_DELAY * config.BACKOFF_FACTOR ** max(attempts - 1, 0)
+
+        connection.execute(
+            "UPDATE scrape_jobs SET "
+            "  state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "  finished_at = CASE WHEN attempts >= ? THEN ? END, "
+            "  available_at = ?, lease_owner = NULL, lease_expires_at = NULL, error_message = ? "
+            "WHERE id = ? AND lease_owner = ?",
+            (max_attempts, max_attempts, now, available_at, f"{type(error).__name__}: {error}",
+             job_id, owner),
+        )
+        row = connection.execute("SELECT state FROM scrape_jobs WHERE id = ?", (job_id,)).fetchone()
+
+    if do_close:
+        connection.close()
+
+    return row[0] if row else None
+
+
+def sql_job_progress(job: str, *, connection: sqlite3.Connection = None) -> Dict[str, int]:
+    '''
+    :return: state -> task count for a job
+    '''
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    rows = connection.execute(
+        "SELECT state, COUNT(*) FROM scrape_jobs WHERE job = ? GROUP BY state", (job,)
+    ).fetchall()
+
+    if do_close:
+        connection.close()
+
+    return {state: count for state, count in rows}
+
+
+# ---- Export ----
+#table -> columns read as is, players also gets STAT_FIELDS out of stats_json
+EXPORT_TABLES: Dict[str, List[str]] = {
+    "players": ["id", "name", "position", "age", "height", "weight", "college", "stats_link"],
+    "combine_results": ["id", "year", "name", "pos", "position", "college", "stats_link", "identity"]
+                       + COMBINE_COLUMNS,
+}
+
+def export_columns(table: str) -> List[str]:
+    '''
+    :param table: key of EXPORT_TABLES
+    :return     : every column sql_export_batches can produce for it
+    '''
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"[ERROR] Can't export {table}, expected one of {sorted(EXPORT_TABLES)}")
+    if table == "players":
+        return EXPORT_TABLES[table] + STAT_FIELDS
+    return list(EXPORT_TABLES[table])
+
+def sql_export_batches(table: str, columns: List[str] = None,
+                       *, positions: List[str] = None,
+                          years: List[int] = None,
+                          order_by: str = None,
+                          batch: int = config.EXPORT_BATCH,
+                          connection: sqlite3.Connection = None) -> Iterator[List[tuple]]:
+    '''
+    Stream a table off one cursor, batch rows at a time. stats_json is
+    flattened by json_extract inside the query, nothing is decoded in python
+
+    :param table     : key of EXPORT_TABLES
+    :param columns   : OPTIONAL subset of export_columns(table), in output order, all otherwise
+    :param positions : OPTIONAL positions to keep
+    :param years     : OPTIONAL years to keep, tables with a year column only
+    :param order_by  : OPTIONAL column rows are grouped by (EXAMPLE :: the partition column), then id
+    :param batch     : rows per yielded list
+    :param connection: OPTIONAL sqlite connection
+    :return          : generator of plain tuple lists, columns in the order asked for
+    '''
+    available = export_columns(table)
+    columns = list(columns or available)
+    unknown = [column for column in columns + ([order_by] if order_by else []) if column not in available]
+    if unknown:
+        raise ValueError(f"[ERROR] Unknown {table} columns {unknown}")
+    if years and "year" not in available:
+        raise ValueError(f"[ERROR] {table} has no year column")
+
+    base = EXPORT_TABLES[table]
+    def expression(column: str) -> str:
+        #names come from EXPORT_TABLES / POSITION_SCHEMA, never from user input
+        return column if column in base else f"json_extract(stats_json, '$.{column}')"
+
+    sql_query = f"SELECT {', '.join(expression(column) for column in columns)} FROM {table}"
+    clauses, params = [], []
+    if positions:
+        clauses.append(f"position IN ({', '.join('?' for _ in positions)})")
+        params.extend(positions)
+    if years:
+        clauses.append(f"year IN ({', '.join('?' for _ in years)})")
+        params.extend(years)
+    if clauses:
+        sql_query += " WHERE " + " AND ".join(clauses)
+    sql_query += f" ORDER BY {expression(order_by) + ', ' if order_by else ''}id"
+
+    do_close = False
+    if connection is None:
+        connection = sql_get_connection()
+        do_close = True
+
+    try:
+        cursor = connection.execute(sql_query, params)
+        cursor.row_factory = None
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows:
+                break
+            yield rows
+    finally:
+        if do_close:
+            connection.close()
@@ -3,67 +3,454 @@ Uses all the modules together to build the main pipeline
 '''
 
 import argparse
+import dataclasses
+import os
+import socket
 import sys
+import threading
 import time
 import traceback
 
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+from typing import Tuple
+
 from scrape.http import get_client
+from scrape.http import HttpClient
+from scrape.ratelimit import SharedLimiter
+from scrape.prefetch import Prefetcher
+from scrape.schedule import PriorityPolicy
+from scrape.schedule import PriorityScheduler
 from scrape import pfr_scraper
 from parse import pfr_parser
 from db import sqlite as db
+import scrape.draft as DraftScraper
 from pos_models import Player
+from pos_models import get_position_class
+import config
+import metrics
+import profiling
+
+
+#upsert this many filled players at a time
+_UPSERT_BATCH = 25
 
 
-def scrape_year(year: int):
+def _fill_positions(year: int, players, *, client, connection, prefetcher: Prefetcher = None,
+                    scheduler: PriorityScheduler = None) -> None:
+    '''
+    Fetch + parse every stub's college stats page in scheduler order,
+    upserting every _UPSERT_BATCH players so the first classes land early
+
+    :param year      : draft year the stubs came from
+    :param players   : {Position: List[Player]} from parse_prospect_page
+    :param client    : HttpClient to fetch with
+    :param connection: sqlite connection
+    :param prefetcher: OPTIONAL Prefetcher already working through the page's links
+    :param scheduler : OPTIONAL PriorityScheduler, page order otherwise
+    :return          : Nothing
+    '''
+    scheduler = scheduler or PriorityScheduler()
+    #skip players who dont have a college stats link
+    scheduler.extend(player for player_stubs in players.values()
+                     for player in player_stubs if player.stats_link)
+
+    filled_players = []
+    for player in scheduler.drain():
+        print(f"Processing {player.name}...")
+
+        try:
+            if prefetcher is not None:
+                html = prefetcher.get(player.stats_link)
+            else:
+                html = pfr_scraper.fetch_player_raw(player.stats_link, client=client)
+        except Exception as e:
+            print(f"\t[WARNING] Failed to fetch {player.name}: {e}")
+            db.sql_record_failure(player.stats_link, e, source="prospect", stage="fetch",
+                                  player=player, year=year, connection=connection)
+            scheduler.mark_failed(player)
+            continue
+
+        try:
+            pfr_parser.parse_player_page(html=html, player=player)
+            filled_players.append(player)
+            db.sql_clear_failure(player.stats_link, connection=connection)
+            scheduler.mark_done(player)
+        except Exception as e:
+            print(f"\t[WARNING] Failed to parse {player.name}: {e}"
+                  f"\t\t{traceback.format_exc()}")
+            db.sql_record_failure(player.stats_link, e, source="prospect", stage="parse",
+                                  player=player, year=year, connection=connection)
+            scheduler.mark_failed(player)
+
+        if len(filled_players) >= _UPSERT_BATCH:
+            db.sql_update_players(filled_players, connection=connection)
+            print(f"\t[INFO] Inserted {len(filled_players)} players to DB | {scheduler.progress_line()}")
+            filled_players = []
+
+    db.sql_update_players(filled_players, connection=connection)
+    print(f"\t[INFO] Inserted {len(filled_players)} players to DB | {scheduler.progress_line()}")
+
+
+@profiling.profiled("scrape")
+def scrape_year(year: int, *, client=None, db_path: str = None, priority: List[str] = None):
     '''
     Fetch draft year and return Player objects
 
-    :param year : Draft year to fetch + parse
-    :return     : Dictionary mapping {Position: List[Player]
+    :param year    : Draft year to fetch + parse
+    :param client  : OPTIONAL HttpClient, the shared singleton otherwise
+    :param db_path : OPTIONAL sqlite file to write to (EXAMPLE :: a backfill shard)
+    :param priority: OPTIONAL target positions, most important first, config.PRIORITY_POSITIONS otherwise
+    :return        : Dictionary mapping {Position: List[Player]
     '''
 
     #define HttpClient + SQL connection to DB
-    client = get_client()
-    connection = db.sql_get_connection()
+    client = client or get_client()
+    connection = db.sql_get_connection(db_path)
 
     start_stamp = time.time()
 
     #fetch the HTML
     html = pfr_scraper.fetch_prospects_page(year=year, client=client)
 
-    #parse the HTML
-    players = pfr_parser.parse_prospect_page(html=html)
+    priority = priority if priority is not None else config.PRIORITY_POSITIONS
+    policy = PriorityPolicy.for_positions(priority, known_links=db.sql_known_links(connection=connection)) \
+        if priority else None
+
+    with Prefetcher(client) as prefetcher:
+        if policy is None:
+            #page order: each modelled row's link is queued as the parser reaches it
+            players = pfr_parser.parse_prospect_page(html=html, on_link=prefetcher.submit)
+            #a memoized parse never calls on_link, already queued links are ignored
+            prefetcher.feed(player.stats_link for player_stubs in players.values() for player in player_stubs)
+        else:
+            #prioritized: prefetch in the order the scheduler will ask for them
+            players = pfr_parser.parse_prospect_page(html=html)
+            stubs = [player for player_stubs in players.values() for player in player_stubs]
+            prefetcher.feed(player.stats_link for player in sorted(stubs, key=policy.priority))
+
+        print(players.keys())
+        #get the each players positional stats
+        with profiling.memory("parse_loop"):
+            _fill_positions(year, players, client=client, connection=connection, prefetcher=prefetcher,
+                            scheduler=PriorityScheduler(policy))
 
-    print(players.keys())
-    #get the each players positional stats
-    for pos, player_stubs in players.items():
-        filled_players = []
+    #close DB connection after all positions have been iterated
+    connection.close()
+    metrics.observe("stage_seconds", time.time() - start_stamp, stage="scrape_year")
+    print(f"[INFO] Finished in {(time.time() - start_stamp) / 60 :.3f} minutes")
+
+    return players
 
-        for player in player_stubs:
-            print(f"Processing {player.name}...")
-            #skip players who dont have a college stats link
-            if not player.stats_link:
+def _retry_one(failure: dict, html, *, connection) -> None:
+    '''
+    Replays a single dead-letter item from its re-fetched page, raises on failure
+
+    :param failure   : row dict from db.sql_get_failures
+    :param html      : the item's page, fetched again
+    :param connection: sqlite connection
+    :return          : Nothing
+    '''
+    #draftee pages only get cached, build_nfl/parse.draft parse them later
+    if failure["source"] == "draftee":
+        DraftScraper.cache_stat_page(html=html, year=failure["year"],
+                                     position=failure["position"],
+                                     slug=pfr_parser.player_slug(failure["url"]))
+        return
+
+    player = get_position_class(**failure["payload"])
+    pfr_parser.parse_player_page(html=html, player=player)
+    db.sql_update_players([player], connection=connection)
+
+
+def _record_retry_failure(failure: dict, error: Exception, *, stage: str, connection) -> None:
+    ''' Bumps a dead-letter item again, keeping the stage that actually failed '''
+    print(f"\t[WARNING] Retry failed to {stage} {failure['name']}: {error}")
+    #rebuild the stub so the payload survives the next retry
+    stub = get_position_class(**failure["payload"]) if failure["payload"] else None
+    db.sql_record_failure(failure["url"], error, source=failure["source"],
+                          stage=stage, player=stub, year=failure["year"],
+                          connection=connection)
+
+
+def retry_failed(*, max_attempts: int = config.DLQ_MAX_ATTEMPTS,
+                 max_passes: int = 10) -> int:
+    '''
+    Re-fetch only the items sitting in the dead-letter table.
+    Every item keeps its own exponential backoff, a pass only touches items
+    that are due, then sleeps until the next one comes due
+
+    :param max_attempts: give up on items that have failed this many times
+    :param max_passes  : upper bound on sleep + retry rounds
+    :return            : number of recovered items
+    '''
+    client = get_client()
+    connection = db.sql_get_connection()
+
+    recovered = 0
+    for _ in range(max_passes):
+        for failure in db.sql_get_failures(due_only=True, max_attempts=max_attempts,
+                                           connection=connection):
+            print(f"Retrying {failure['name']} (attempt {failure['attempts'] + 1})...")
+            try:
+                #the remembered copy may be the very page that failed to parse
+                html = pfr_scraper.fetch_player_raw(failure["url"], client=client, fresh=True)
+            except Exception as e:
+                _record_retry_failure(failure, e, stage="fetch", connection=connection)
                 continue
 
             try:
-                html = pfr_scraper.fetch_player_page(href=player.stats_link, client=client)
-                pfr_parser.parse_player_page(html=html, player=player)
-                filled_players.append(player)
+                _retry_one(failure, html, connection=connection)
             except Exception as e:
-                print(f"\t[WARNING] Failed {player.name}: {e}"
-                      f"\t\t{traceback.format_exc()}")
+                _record_retry_failure(failure, e, stage="parse", connection=connection)
+                continue
 
-        db.sql_update_players(filled_players, connection=connection)
-        print(f"\t[INFO] Inserted {len(filled_players)} players to DB")
+            db.sql_clear_failure(failure["url"], connection=connection)
+            recovered += 1
+
+        pending = db.sql_get_failures(max_attempts=max_attempts, connection=connection)
+        if not pending:
+            break
+
+        #wait for the next item to come off backoff
+        wait = max(0.0, pending[0]["next_attempt_at"] - time.time())
+        print(f"[INFO] {len(pending)} items still failing, next retry in {wait:.0f}s")
+        time.sleep(wait)
 
-    #close DB connection after all positions have been iterated
     connection.close()
-    print(f"[INFO] Finished in {(time.time() - start_stamp) / 60 :.3f} minutes")
+    print(f"[INFO] Recovered {recovered} items from the dead-letter table")
+
+    return recovered
+
+
+# ---- Sharded Backfill ----
+_worker_client = None
+_worker_shard = None
+
+
+def _init_backfill_worker(shard_dir: str) -> None:
+    ''' Pool initializer: own shard DB + own client drawing on the shared rate budgets '''
+    global _worker_client, _worker_shard
+    _worker_shard = os.path.join(shard_dir, f"shard_{os.getpid()}.db")
+    db.db_init(_worker_shard)
+    _worker_client = HttpClient(cooldown=config.REQUEST_COOLDOWN,
+                                jail_time=config.REQUEST_JAIL,
+                                max_requests=config.REQUEST_MAX,
+                                limiter=SharedLimiter())
+
+
+def _backfill_year(year: int) -> Tuple[int, str, float, str]:
+    ''' Worker: one year into this process's shard -> (year, shard, seconds, error) '''
+    start_stamp = time.time()
+    try:
+        scrape_year(year, client=_worker_client, db_path=_worker_shard)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return year, _worker_shard, time.time() - start_stamp, error
+
+
+def backfill(year_start: int, year_end: int,
+             *, workers: int = None, keep_shards: bool = False) -> int:
+    '''
+    Split [year_start, year_end] across worker processes, each writing its
+    own shard DB, then merge every shard into the main DB with the usual
+    (name, college, position) upsert. Request rates stay global through
+    the SharedLimiter every worker's client draws from
+
+    :param year_start : first year
+    :param year_end   : last year, inclusive
+    :param workers    : OPTIONAL process count, os.cpu_count() otherwise
+    :param keep_shards: leave the shard files on disk after merging
+    :return           : player rows merged
+    '''
+    shard_dir = os.path.join(config.DATA_DIR, "shards", time.strftime("%Y%m%d_%H%M%S"))
+    os.makedirs(shard_dir, exist_ok=True)
+    years = list(range(year_start, year_end + 1))
+
+    start_stamp = time.time()
+    shards = set()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_backfill_worker,
+                             initargs=(shard_dir,)) as pool:
+        for year, shard, seconds, error in pool.map(_backfill_year, years):
+            shards.add(shard)
+            if error:
+                print(f"[WARNING] {year} failed after {seconds:.0f}s: {error}")
+            else:
+                print(f"[INFO] {year} done in {seconds:.0f}s")
+
+    connection = db.sql_get_connection()
+    merged = 0
+    try:
+        for shard in sorted(shards):
+            merged += db.sql_merge_shard(shard, connection=connection)
+            if not keep_shards:
+                os.remove(shard)
+    finally:
+        connection.close()
+
+    print(f"[INFO] Backfilled {len(years)} years from {len(shards)} shards, "
+          f"{merged} rows merged in {(time.time() - start_stamp) / 60:.2f} minutes")
+    return merged
+
+
+# ---- Shared Job Queue ----
+def enqueue_year(year: int, *, job: str = None) -> str:
+    '''
+    Fetch + parse the prospects page once and queue one fetch task per
+    player, so any number of `work` processes can share the scrape
+
+    :param year: draft year
+    :param job : OPTIONAL job name, prospects-<year> otherwise
+    :return    : job name
+    '''
+    job = job or f"prospects-{year}"
+    html = pfr_scraper.fetch_prospects_page(year=year, client=get_client())
+    players = pfr_parser.parse_prospect_page(html=html)
+
+    tasks = [{"kind": "prospect", "task_key": player.stats_link, "year": year,
+              "payload": dataclasses.asdict(player)}
+             for player_stubs in players.values() for player in player_stubs if player.stats_link]
+    added = db.sql_enqueue_jobs(job, tasks)
+    print(f"[INFO] Queued {added} new tasks on {job} ({len(tasks) - added} already there)")
+    return job
+
+
+class _Heartbeat(threading.Thread):
+    ''' Keeps extending a worker's leases on its own connection until stopped '''
+
+    def __init__(self, owner: str, lease_seconds: float, db_path: str = None):
+        super().__init__(name=f"heartbeat-{owner}", daemon=True)
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.db_path = db_path
+        self.ids = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        connection = db.sql_get_connection(self.db_path)
+        try:
+            while not self._stop_event.wait(self.lease_seconds / 3):
+                if self.ids:
+                    db.sql_heartbeat_jobs(list(self.ids), self.owner,
+                                          lease_seconds=self.lease_seconds, connection=connection)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def work(job: str, *, owner: str = None, batch: int = config.JOB_BATCH,
+         lease_seconds: float = config.JOB_LEASE_SECONDS,
+         max_attempts: int = config.DLQ_MAX_ATTEMPTS, db_path: str = None) -> int:
+    '''
+    Claim -> fetch/parse -> upsert -> ack until the job has nothing queued or
+    leased. Fetches draw on the SharedLimiter, so adding workers scales up to
+    the rate budget and no further
+
+    :param job          : job name from enqueue_year
+    :param owner        : OPTIONAL worker id, host:pid otherwise
+    :param batch        : tasks per claim
+    :param lease_seconds: visibility timeout, heartbeats extend it every third
+    :param max_attempts : tasks that fail this often are parked as failed
+    :param db_path      : OPTIONAL sqlite file holding players + scrape_jobs
+    :return             : tasks completed by this worker
+    '''
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    client = HttpClient(cooldown=config.REQUEST_COOLDOWN,
+                        jail_time=config.REQUEST_JAIL,
+                        max_requests=config.REQUEST_MAX,
+                        limiter=SharedLimiter())
+    connection = db.sql_get_connection(db_path)
+    heartbeat = _Heartbeat(owner, lease_seconds, db_path)
+    heartbeat.start()
+
+    completed = 0
+    try:
+        while True:
+            tasks = db.sql_claim_jobs(job, owner, batch=batch, lease_seconds=lease_seconds,
+                                      connection=connection)
+            if not tasks:
+                progress = db.sql_job_progress(job, connection=connection)
+                if not progress.get("leased") and not progress.get("queued"):
+                    break
+                #someone else holds the tail or a retry is backing off, wait for either
+                time.sleep(min(lease_seconds, 5.0))
+                continue
+
+            heartbeat.ids = [task["id"] for task in tasks]
+            done, filled = [], []
+            for task in tasks:
+                player, stage = None, "parse"
+                try:
+                    player = get_position_class(**task["payload"])
+                    stage = "fetch"
+                    #a requeued task may have failed on the page this process remembers
+                    html = pfr_scraper.fetch_player_raw(task["task_key"], client=client,
+                                                        fresh=task["attempts"] > 1)
+                    stage = "parse"
+                    pfr_parser.parse_player_page(html=html, player=player)
+                except Exception as e:
+                    print(f"\t[WARNING] {owner} failed {player.name if player else task['task_key']}: {e}")
+                    if db.sql_fail_job(task["id"], owner, e, max_attempts=max_attempts,
+                                       connection=connection) == "failed":
+                        db.sql_record_failure(task["task_key"], e, source="prospect", stage=stage,
+                                              player=player, year=task["year"], connection=connection)
+                    continue
+                filled.append(player)
+                done.append(task["id"])
+
+            db.sql_update_players(filled, connection=connection)
+            completed += db.sql_ack_jobs(done, owner, connection=connection)
+            heartbeat.ids = []
+            print(f"[INFO] {owner}: {completed} done, {db.sql_job_progress(job, connection=connection)}")
+    finally:
+        heartbeat.stop()
+        connection.close()
+
+    return completed
 
-    return players
 
 def main():
-    scrape_year(year=2025)
+    parser = argparse.ArgumentParser(description="NextGenSleepers scrape pipeline")
+    parser.add_argument("mode", nargs="?", default="scrape",
+                        choices=["scrape", "retry-failed", "backfill", "enqueue", "work"])
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--year-start", type=int, default=None, help="backfill: first year")
+    parser.add_argument("--year-end", type=int, default=None, help="backfill: last year, inclusive")
+    parser.add_argument("--workers", type=int, default=None, help="backfill: worker processes")
+    parser.add_argument("--job", default=None, help="enqueue/work: job name, prospects-<year> otherwise")
+    parser.add_argument("--batch", type=int, default=config.JOB_BATCH, help="work: tasks per claim")
+    parser.add_argument("--priority", nargs="*", default=None, metavar="POS",
+                        help="scrape: target positions first, most important first (EXAMPLE :: WR RB)")
+    parser.add_argument("--max-attempts", type=int, default=config.DLQ_MAX_ATTEMPTS)
+    parser.add_argument("--profile", metavar="DIR", default=None,
+                        help="write per-stage .pstats / .collapsed files to DIR")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="with --profile, tracemalloc snapshots around the parse loop")
+    args = parser.parse_args()
+
+    if args.profile:
+        profiling.enable(args.profile, memory=args.profile_memory)
+
+    if args.mode == "retry-failed":
+        retry_failed(max_attempts=args.max_attempts)
+    elif args.mode == "backfill":
+        backfill(args.year_start or args.year, args.year_end or args.year, workers=args.workers)
+    elif args.mode == "enqueue":
+        enqueue_year(args.year, job=args.job)
+    elif args.mode == "work":
+        work(args.job or f"prospects-{args.year}", batch=args.batch, max_attempts=args.max_attempts)
+    else:
+        scrape_year(year=args.year, priority=args.priority)
+
+    json_path, prom_path = metrics.dump(config.METRICS_DIR, run_name=args.mode)
+    print(f"[INFO] Metrics written to {json_path} and {prom_path}")
+
+    for path in profiling.dump():
+        print(f"[INFO] Profile written to {path}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,210 @@
+'''
+Low overhead counters + histograms for the scrape pipeline.
+One process wide registry collects everything, then a run dumps
+a JSON summary and a Prometheus text file next to each other.
+'''
+
+import bisect
+import json
+import threading
+import time
+
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+from typing import Dict
+from typing import Tuple
+from typing import Any
+
+
+_PREFIX = "ngs_"
+
+#seconds, covers a parse (ms) up to a jailed request (minutes)
+_DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0
+)
+
+_Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Histogram:
+    '''
+    Fixed bucket histogram, cheap enough to observe every request
+    '''
+
+    __slots__ = ("buckets", "counts", "total", "count", "min", "max")
+
+    def __init__(self, buckets: Tuple[float, ...] = _DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], self.counts)),
+        }
+
+
+class Registry:
+    '''
+    Holds every counter + histogram, keyed by (name, labels)
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[_Key, float] = {}
+        self._histograms: Dict[_Key, Histogram] = {}
+        self._started = time.time()
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> _Key:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    # ---- Recording ----
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any):
+        '''
+        Observe the wall time of the with-block into histogram <name>
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name: str, **labels: Any):
+        '''
+        Decorator flavour of timer()
+        '''
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start, **labels)
+            return wrapper
+        return decorator
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._started = time.time()
+
+    # ---- Reporting ----
+    def snapshot(self) -> Dict[str, Any]:
+        '''
+        :return: JSON-ready dict of every counter + histogram
+        '''
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {"name": name, "labels": dict(labels), **histogram.as_dict()}
+                for (name, labels), histogram in sorted(self._histograms.items())
+            ]
+
+        return {
+            "started_at": self._started,
+            "elapsed_seconds": time.time() - self._started,
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def to_prometheus(self) -> str:
+        '''
+        :return: Prometheus text exposition of the registry
+        '''
+        def fmt(labels, extra=()):
+            pairs = [*labels, *extra]
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# TYPE {_PREFIX}{name} counter")
+                for (key_name, labels), value in sorted(self._counters.items()):
+                    if key_name == name:
+                        lines.append(f"{_PREFIX}{name}{fmt(labels)} {value}")
+
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f"# TYPE {_PREFIX}{name} histogram")
+                for (key_name, labels), histogram in sorted(self._histograms.items()):
+                    if key_name != name:
+                        continue
+                    running = 0
+                    for bound, count in zip([*map(str, histogram.buckets), "+Inf"], histogram.counts):
+                        running += count
+                        lines.append(f"{_PREFIX}{name}_bucket{fmt(labels, [('le', bound)])} {running}")
+                    lines.append(f"{_PREFIX}{name}_sum{fmt(labels)} {histogram.total}")
+                    lines.append(f"{_PREFIX}{name}_count{fmt(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def dump(self, directory: Path, *, run_name: str = "run") -> Tuple[Path, Path]:
+        '''
+        Writes <run_name>_<stamp>.json + .prom into directory
+
+        :param directory: folder for the summary files
+        :param run_name : prefix for the file names
+        :return         : (json path, prometheus path)
+        '''
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        json_path = directory / f"{run_name}_{stamp}.json"
+        prom_path = directory / f"{run_name}_{stamp}.prom"
+
+        with open(json_path, "w", encoding="utf-8") as file_ref:
+            json.dump(self.snapshot(), file_ref, indent=2)
+        with open(prom_path, "w", encoding="utf-8") as file_ref:
+            file_ref.write(self.to_prometheus())
+
+        return json_path, prom_path
+
+
+# ---- Process wide registry ----
+REGISTRY = Registry()
+
+inc     = REGISTRY.inc
+observe = REGISTRY.observe
+timer   = REGISTRY.timer
+timed   = REGISTRY.timed
+dump    = REGISTRY.dump
+reset   = REGISTRY.reset
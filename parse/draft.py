@@ -1,21 +1,23 @@
-import config
 import parse.pfr_parser as Parser
 from scrape.draft import stat_path
+from scrape.draft import stat_store
 import pos_models as Models
 import db.sqlite as DB
 
 from collections import defaultdict
 
+from typing import Callable
 from typing import Dict
 from typing import List
 
-import os
 
-def parse_draft_pages(pages: Dict[int, str])\
+def parse_draft_pages(pages: Dict[int, str],
+                      *, on_link: Callable[[str], None] = None)\
     -> Dict[int, Dict[str, List[Models.NFLDraftee]]]:
     '''
 
     :param pages:
+    :param on_link: OPTIONAL called with the college_link of every modelled draftee (EXAMPLE :: Prefetcher.submit)
 
     :return:
     '''
@@ -23,7 +25,7 @@ def parse_draft_pages(pages: Dict[int, str])\
     drafted_players = defaultdict(dict)
 
     for year, html in pages.items():
-        drafted_players[year] = Parser.parse_draft_page(html=html)
+        drafted_players[year] = Parser.parse_draft_page(html=html, on_link=on_link)
 
     return drafted_players
 
@@ -33,24 +35,25 @@ def parse_draftee_stat_pages(drafted_players: Dict[int, Dict[str, List[Models.NF
     for year, position_list in drafted_players.items():
         for position, position_players in position_list.items():
             for athlete in position_players:
-                filepath = os.path.join(config.CACHE_DIR, stat_path(year=year, athlete=athlete))
+                slug = Parser.player_slug(athlete.player.stats_link)
+                if slug is None:
+                    print(f"[WARNING] No college stats link for {athlete.player.name}, skipping")
+                    continue
+
+                page = stat_store().find(stat_path(year=year, position=position, slug=slug))
 
                 #skip if not cached
-                if not os.path.exists(filepath):
+                if page is None:
                     print(f"[INFO] Cache missing html for {athlete.player.name}")
                     continue
 
-                #load from cache
+                #enrich profile     inplace, the parser decompresses + decodes
                 try:
-                    with open(filepath, "r", encoding="utf-8") as file_ref:
-                        html = file_ref.read()
-                except Exception as e:
+                    Parser.parse_player_page(html=page, player=athlete.player)
+                except OSError as e:
                     print(f"[ERROR] Unexpected error while reading: {e}")
                     continue
 
-                #enrich profile     inplace
-                Parser.parse_player_page(html=html, player=athlete.player)
-
     return None
 
 
@@ -0,0 +1,179 @@
+'''
+Parse-result cache keyed by (sha1 of the page, parser, parser version).
+The parser version is derived from POSITION_SCHEMA plus PARSER_REVISION,
+so editing the schema or bumping the revision invalidates everything.
+
+Rows are bulk loaded into memory on first use and new results are
+written back in batches, so a no-op re-run over cached pages never
+touches BeautifulSoup. Turn it off with NGS_PARSE_CACHE=0.
+'''
+
+import atexit
+import hashlib
+import json
+import sqlite3
+import threading
+
+from functools import wraps
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Tuple
+
+import config
+import metrics
+
+
+#bump whenever parser code changes in a way POSITION_SCHEMA doesn't show
+PARSER_REVISION = "1"
+
+_SQL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parse_cache (
+    content_hash TEXT NOT NULL,
+    parser       TEXT NOT NULL,
+    version      TEXT NOT NULL,
+    result_json  TEXT,
+    PRIMARY KEY (content_hash, parser, version)
+);
+"""
+
+_MISS = object()
+_FLUSH_EVERY = 200
+
+
+def parser_version() -> str:
+    ''' Short hash of PARSER_REVISION + POSITION_SCHEMA (sets sorted so it is stable) '''
+    from parse.pfr_parser import POSITION_SCHEMA
+
+    def _stable(value):
+        if isinstance(value, (set, frozenset)):
+            return sorted(value)
+        if isinstance(value, dict):
+            return {key: _stable(item) for key, item in value.items()}
+        return value
+
+    payload = json.dumps([PARSER_REVISION, _stable(POSITION_SCHEMA)], sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def content_hash(html) -> str:
+    #scrape.pages.Page: hash the wire bytes, so a cache hit never decompresses
+    raw = getattr(html, "raw", None)
+    if raw is not None:
+        html = raw
+    if isinstance(html, str):
+        html = html.encode("utf-8")
+    return hashlib.sha1(html).hexdigest()
+
+
+class ParseCache:
+    '''
+    sqlite backed, fully in-memory after preload()
+    '''
+
+    def __init__(self, path: str = None):
+        self.path = str(path or config.PARSE_CACHE_PATH)
+        self.version = None
+        self._lock = threading.Lock()
+        self._memory: Dict[Tuple[str, str], str] = {}
+        self._pending = []
+        self._loaded = False
+        #backfill workers share this file, wait out their flushes
+        self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._connection.executescript(_SQL_SCHEMA)
+
+    def preload(self) -> int:
+        '''
+        Pull every row for the current parser version into memory
+
+        :return: rows loaded
+        '''
+        with self._lock:
+            self.version = parser_version()
+            rows = self._connection.execute(
+                "SELECT content_hash, parser, result_json FROM parse_cache WHERE version = ?",
+                (self.version,),
+            ).fetchall()
+            self._memory = {(digest, parser): result for digest, parser, result in rows}
+            self._loaded = True
+        return len(rows)
+
+    def get(self, digest: str, parser: str):
+        if not self._loaded:
+            self.preload()
+        result = self._memory.get((digest, parser), _MISS)
+        return result if result is _MISS else json.loads(result)
+
+    def put(self, digest: str, parser: str, result: Any) -> None:
+        encoded = json.dumps(result)
+        with self._lock:
+            self._memory[(digest, parser)] = encoded
+            self._pending.append((digest, parser, self.version, encoded))
+            flush = len(self._pending) >= _FLUSH_EVERY
+        if flush:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO parse_cache (content_hash, parser, version, result_json)"
+                    "VALUES (?, ?, ?, ?)",
+                    pending,
+                )
+
+    def clear(self) -> None:
+        ''' Drops rows from every other parser version '''
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM parse_cache WHERE version != ?", (parser_version(),))
+
+
+# ---- Process wide cache ----
+_cache: ParseCache = None
+
+
+def get_cache() -> ParseCache:
+    global _cache
+    if _cache is None:
+        _cache = ParseCache()
+        atexit.register(_cache.flush)
+    return _cache
+
+
+def memoized(parser: str,
+             *, encode: Callable[..., Any],
+                decode: Callable[..., Any],
+                key: Callable[..., str] = None):
+    '''
+    Memoize a parse function on the page content
+
+    :param parser: cache namespace for this function
+    :param encode: (result, *args, **kwargs) -> JSON-able value to store
+    :param decode: (stored, *args, **kwargs) -> what the function would have returned
+    :param key   : OPTIONAL (*args, **kwargs) -> suffix for the namespace (EXAMPLE :: position)
+    :return      : decorator
+    '''
+    def decorator(func):
+        @wraps(func)
+        def wrapper(html, *args, **kwargs):
+            if not config.PARSE_CACHE or html is None:
+                return func(html, *args, **kwargs)
+
+            cache = get_cache()
+            name = f"{parser}:{key(*args, **kwargs)}" if key else parser
+            digest = content_hash(html)
+
+            stored = cache.get(digest, name)
+            if stored is not _MISS:
+                metrics.inc("parse_cache_total", parser=parser, result="hit")
+                return decode(stored, *args, **kwargs)
+
+            metrics.inc("parse_cache_total", parser=parser, result="miss")
+            result = func(html, *args, **kwargs)
+            cache.put(digest, name, encode(result, *args, **kwargs))
+            return result
+        return wrapper
+    return decorator
@@ -3,7 +3,8 @@ HTML parsers for Pro-Football-Reference pages.
 '''
 
 import re
-from typing import List, Dict, Any
+import dataclasses
+from typing import List, Dict, Any, Callable, Union
 from collections import defaultdict
 
 import pos_models
@@ -12,6 +13,9 @@ from bs4 import Tag
 from bs4 import Comment
 
 import config
+import metrics
+import profiling
+from parse import memo
 from pos_models import Player
 from pos_models import get_position_class
 from pos_models import NFLDraftee
@@ -117,7 +121,38 @@ def _height_to_inches(height: float) -> int:
     except ValueError:
         return None
 
-def _uncomment_tables(html: str) -> str:
+_RE_PLAYER_SLUG = re.compile(r"/cfb/players/([^/?#]+?)\.html")
+
+def player_slug(stats_link: str) -> str:
+    '''
+    Sports-Reference slug out of a college stats link
+    (EXAMPLE :: /cfb/players/bryce-young-1.html -> bryce-young-1)
+    '''
+    if not stats_link:
+        return None
+    match = _RE_PLAYER_SLUG.search(stats_link)
+    return match.group(1) if match else None
+
+def canonical_player_path(stats_link: str) -> str:
+    '''
+    One identity per college player, however the link was written
+    (EXAMPLE :: https://www.sports-reference.com/cfb/players/bryce-young-1.html?x=1
+                -> /cfb/players/bryce-young-1.html)
+    '''
+    slug = player_slug(stats_link)
+    return f"/cfb/players/{slug}.html" if slug else None
+
+
+#str, bytes, or anything with .content like scrape.pages.Page (still compressed until here)
+Markup = Union[str, bytes, Any]
+
+def _markup(html: Markup) -> Union[str, bytes]:
+    ''' What BeautifulSoup gets: bytes stay bytes, it sniffs the charset itself '''
+    content = getattr(html, "content", None)
+    return html if content is None else content
+
+
+def _uncomment_tables(html: Markup) -> str:
     '''
     Helper function to uncomment the position
     tables from the raw html
@@ -125,7 +160,7 @@ def _uncomment_tables(html: str) -> str:
     :param html:
     :return:
     '''
-    soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(_markup(html), "html.parser")
 
     for node in soup.find_all(text=True):
         #if node is a comment with <table tag
@@ -136,13 +171,70 @@ def _uncomment_tables(html: str) -> str:
 
     return str(soup)
 
+# ---- Parse Cache Adapters ----
+def _arg(args, kwargs, name: str, index: int = 0):
+    return args[index] if len(args) > index else kwargs[name]
+
+def _encode_players(result, *args, **kwargs):
+    if result is None:
+        return None
+    return {pos: [dataclasses.asdict(player) for player in players]
+            for pos, players in result.items()}
+
+def _decode_players(stored, *args, **kwargs):
+    if stored is None:
+        return None
+    out = defaultdict(list)
+    for pos, players in stored.items():
+        out[pos] = [get_position_class(**player) for player in players]
+    return out
+
+def _schema_fields(position: str) -> List[str]:
+    return [field for fields in POSITION_SCHEMA[position]['standards'].values() for field in fields]
+
+def _encode_player_stats(player, *args, **kwargs):
+    return {field: getattr(player, field, None) for field in _schema_fields(player.position)
+            if getattr(player, field, None) is not None}
+
+def _decode_player_stats(stored, *args, **kwargs):
+    player = _arg(args, kwargs, "player")
+    for field, value in stored.items():
+        setattr(player, field, value)
+    return player
+
+def _encode_rows(result, *args, **kwargs):
+    return result
+
+def _decode_rows(stored, *args, **kwargs):
+    return stored
+
+def _encode_height_weight(result, *args, **kwargs):
+    player = _arg(args, kwargs, "athlete").player
+    return {"height": player.height, "weight": player.weight}
+
+def _decode_height_weight(stored, *args, **kwargs):
+    player = _arg(args, kwargs, "athlete").player
+    for field, value in stored.items():
+        if value is not None:
+            setattr(player, field, value)
+    return None
+
 # ---- PFR Parsing ----
-def parse_prospect_page(html: str) -> Dict[str, List[Player]]:
+#memoized outermost: cache hits show up as parse_cache_total, not as parse_seconds
+@memo.memoized("prospects", encode=_encode_players, decode=_decode_players)
+@metrics.timed("parse_seconds", page="prospects")
+@profiling.profiled("parse")
+def parse_prospect_page(html: Markup, *, on_link: Callable[[str], None] = None) -> Dict[str, List[Player]]:
+    '''
+    :param html   : prospects page
+    :param on_link: OPTIONAL called with every stats_link as its row is parsed (EXAMPLE :: Prefetcher.submit)
+    :return       : position -> player stubs
+    '''
     #ensure all tables are present
     html = _uncomment_tables(html)
 
     #soupify
-    soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(_markup(html), "html.parser")
     all_players = {}
 
     for pos in POSITION_SCHEMA.keys():
@@ -171,6 +263,9 @@ def parse_prospect_page(html: str) -> Dict[str, List[Player]]:
             except Exception:
                 href = None
 
+            if on_link is not None and href:
+                on_link(href)
+
             player = get_position_class(
                 position=pos,
                 name=name,
@@ -184,14 +279,17 @@ def parse_prospect_page(html: str) -> Dict[str, List[Player]]:
         all_players[pos] = players
     return all_players
 
-def parse_draft_page(html: str) -> Dict[str, List[Player]]:
+@memo.memoized("draft", encode=_encode_players, decode=_decode_players)
+@metrics.timed("parse_seconds", page="draft")
+def parse_draft_page(html: Markup, *, on_link: Callable[[str], None] = None) -> Dict[str, List[Player]]:
     '''
 
-    :param html:
+    :param html   :
+    :param on_link: OPTIONAL called with every college_link as its row is parsed
     :return:
     '''
     #soupify
-    soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(_markup(html), "html.parser")
     all_players = defaultdict(list)
 
     table = soup.find("table", {"id": "drafts"})
@@ -200,50 +298,95 @@ def parse_draft_page(html: str) -> Dict[str, List[Player]]:
         return None
 
     for row in table.tbody.find_all("tr"):
-        position = _clean_cell(row.find("td", {"data-stat": "pos"}))
-        name     = _clean_cell(row.find("td", {"data-stat": "player"}))
-        age      = _to_int(_clean_cell(row.find("td", {"data-stat": "age"})))
-        college  = _clean_cell(row.find("td", {"data-stat": "college_id"}))
+        parsed = _parse_draft_row(row, on_link=on_link)
+        if parsed is None:
+            continue
+        mapped_position, player = parsed
+        all_players[mapped_position].append(player)
+    return all_players
 
-        try:
-            href = row.find("td", {"data-stat": "college_link"}).a['href']
-        except:
-            href = None
 
-        if position not in config.NFL_POSITION_MAP.keys():
-            continue
+def _parse_draft_row(row: Tag, *, on_link: Callable[[str], None] = None):
+    '''
+    One <tr> of the drafts table
+
+    :param row    : table row
+    :param on_link: OPTIONAL called with the college_link of tracked positions
+    :return       : (mapped position, player) or None for positions we don't track
+    '''
+    position = _clean_cell(row.find("td", {"data-stat": "pos"}))
+    name     = _clean_cell(row.find("td", {"data-stat": "player"}))
+    age      = _to_int(_clean_cell(row.find("td", {"data-stat": "age"})))
+    college  = _clean_cell(row.find("td", {"data-stat": "college_id"}))
+
+    try:
+        href = row.find("td", {"data-stat": "college_link"}).a['href']
+    except:
+        href = None
+
+    if position not in config.NFL_POSITION_MAP.keys():
+        return None
+
+    if on_link is not None and href:
+        on_link(href)
+
+    #draftee
+    pick     = _to_int(_clean_cell(row.find("td", {"data-stat": "draft_pick"})))
+    career_av = _to_int(_clean_cell(row.find("td", {"data-stat": "career_av"})))
+    mapped_position = config.NFL_POSITION_MAP[position]
+
+    player = get_position_class(
+        position=mapped_position,
+        name=name,
+        age=age,
+        college=college,
+        stats_link=href,
+        \
+        pick=pick,
+        career_av=career_av
+    )
+
+    if not isinstance(player, NFLDraftee):
+        print(f'[WARNING] Something went wrong bro - {name}')
 
-        #draftee
-        pick     = _to_int(_clean_cell(row.find("td", {"data-stat": "draft_pick"})))
-        career_av = _to_int(_clean_cell(row.find("td", {"data-stat": "career_av"})))
-        mapped_position = config.NFL_POSITION_MAP[position]
-
-        player = get_position_class(
-            position=mapped_position,
-            name=name,
-            age=age,
-            college=college,
-            stats_link=href,
-            \
-            pick=pick,
-            career_av=career_av
-        )
-
-        if not isinstance(player, NFLDraftee):
-            print(f'[WARNING] Something went wrong bro - {name}')
+    return mapped_position, player
 
+
+@metrics.timed("parse_seconds", page="draft_rows")
+def parse_draft_rows(rows: List[str]) -> Dict[str, List[Player]]:
+    '''
+    Parses raw <tr> snippets cut out of a draft page, so live mode only
+    soupifies the rows that changed instead of the whole page
+
+    :param rows: "<tr ...>...</tr>" strings
+    :return    : mapped position -> players, same shape as parse_draft_page
+    '''
+    all_players = defaultdict(list)
+    if not rows:
+        return all_players
+
+    soup = BeautifulSoup(f"<table><tbody>{''.join(rows)}</tbody></table>", "html.parser")
+    for row in soup.tbody.find_all("tr"):
+        parsed = _parse_draft_row(row)
+        if parsed is None:
+            continue
+        mapped_position, player = parsed
         all_players[mapped_position].append(player)
     return all_players
 
 
 
 
-def parse_player_page(html: str, player: Player) -> Player:
+@memo.memoized("player", encode=_encode_player_stats, decode=_decode_player_stats,
+               key=lambda *args, **kwargs: _arg(args, kwargs, "player").position)
+@metrics.timed("parse_seconds", page="player")
+@profiling.profiled("parse")
+def parse_player_page(html: Markup, player: Player) -> Player:
 
     if player.position not in POSITION_SCHEMA:
         raise ValueError(f"[ERROR] Invalid position {player.position}")
 
-    soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(_markup(html), "html.parser")
     all_players = {}
 
     position_schema = POSITION_SCHEMA[player.position]
@@ -267,7 +410,55 @@ def parse_player_page(html: str, player: Player) -> Player:
     return player
 
 
-def parse_height_weight(html: str, athlete):
+@metrics.timed("parse_seconds", page="player_seasons")
+def parse_player_seasons(html: Markup, position: str) -> List[Dict[str, Any]]:
+    '''
+    Every season row (tbody) of the position's POSITION_SCHEMA tables,
+    one dict per season with the tables merged together
+
+    :param html    : college stats page
+    :param position: key of POSITION_SCHEMA
+    :return        : list of {season, school, age, <fields>} sorted by season
+    '''
+    if position not in POSITION_SCHEMA:
+        raise ValueError(f"[ERROR] Invalid position {position}")
+
+    soup = BeautifulSoup(_markup(html), "html.parser")
+    position_schema = POSITION_SCHEMA[position]
+    seasons: Dict[int, Dict[str, Any]] = {}
+
+    for table_id, fields in position_schema['standards'].items():
+        table = soup.find("table", {"id": table_id})
+        if not table or not table.tbody:
+            continue
+
+        for row in table.tbody.find_all("tr", recursive=False):
+            #skip the repeated header rows
+            if "thead" in (row.get("class") or []):
+                continue
+
+            year_text = _clean_cell(row.find(["th", "td"], {"data-stat": "year_id"}))
+            season = _to_int(re.sub(r"\D", "", year_text or ""))
+            if season is None:
+                continue
+
+            record = seasons.setdefault(season, {"season": season})
+            record.setdefault("school", _clean_cell(row.find("td", {"data-stat": "school_name"})))
+            record.setdefault("age", _to_int(_clean_cell(row.find("td", {"data-stat": "age"}))))
+
+            for field in fields:
+                raw_text = _clean_cell(row.find("td", {"data-stat": field}))
+                if field in position_schema['type_int']:
+                    record[field] = _to_int(raw_text)
+                else:
+                    record[field] = _to_float(raw_text)
+
+    return [seasons[season] for season in sorted(seasons)]
+
+
+@memo.memoized("height_weight", encode=_encode_height_weight, decode=_decode_height_weight)
+@metrics.timed("parse_seconds", page="height_weight")
+def parse_height_weight(html: Markup, athlete):
     '''
 
     :param html:
@@ -275,7 +466,7 @@ def parse_height_weight(html: str, athlete):
 
     :return:
     '''
-    soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(_markup(html), "html.parser")
     re_height_weight = re.compile(r"\b\d{1,2}-\d{1,2}\b")
 
     for p in soup.find_all("p"):
@@ -301,3 +492,60 @@ def parse_height_weight(html: str, athlete):
         athlete.player.weight = weight
 
         return
+
+
+# ---- Combine ----
+#data-stat -> column, in the order the combine table lists them
+COMBINE_FIELDS = {
+    "height": "height", "weight": "weight", "forty_yd": "forty", "vertical": "vertical",
+    "bench_reps": "bench", "broad_jump": "broad_jump", "cone": "cone", "shuttle": "shuttle",
+}
+
+@memo.memoized("combine", encode=_encode_rows, decode=_decode_rows)
+@metrics.timed("parse_seconds", page="combine")
+def parse_combine_page(html: Markup) -> List[Dict[str, Any]]:
+    '''
+    Every invitee on a PFR <year>-combine page, drills they skipped stay None
+
+    :param html: combine page
+    :return    : list of {name, pos, position, college, stats_link, <COMBINE_FIELDS values>},
+                 position is config.COMBINE_POSITION_MAP[pos], None for positions we don't model
+    '''
+    soup = BeautifulSoup(_markup(html), "html.parser")
+
+    table = soup.find("table", {"id": "combine"})
+    if not table or not table.tbody:
+        print("[ERROR] No combine table found")
+        return None
+
+    rows: List[Dict[str, Any]] = []
+    for row in table.tbody.find_all("tr", recursive=False):
+        #skip the repeated header rows
+        if "thead" in (row.get("class") or []):
+            continue
+
+        name = _clean_cell(row.find(["th", "td"], {"data-stat": "player"}))
+        pos  = _clean_cell(row.find("td", {"data-stat": "pos"}))
+        if not name or not pos:
+            continue
+
+        try:
+            href = row.find("td", {"data-stat": "college"}).a['href']
+        except Exception:
+            href = None
+
+        record = {
+            "name": name,
+            "pos": pos,
+            "position": config.COMBINE_POSITION_MAP.get(pos),
+            "college": _clean_cell(row.find("td", {"data-stat": "school_name"})),
+            "stats_link": href,
+        }
+        for stat, column in COMBINE_FIELDS.items():
+            raw_text = _clean_cell(row.find("td", {"data-stat": stat}))
+            if stat == "height":
+                record[column] = _height_to_inches(raw_text)
+            else:
+                record[column] = _to_float(raw_text)
+        rows.append(record)
+    return rows
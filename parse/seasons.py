@@ -0,0 +1,131 @@
+'''
+Batch re-parse of already cached college-stats pages into the season
+store. No network: pages come from CACHE_DIR/stat_pages and from the
+replay tree for every player in sqlite.
+
+    python -m parse.seasons --workers 8
+'''
+
+import argparse
+import time
+
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Tuple
+
+import parse.pfr_parser as Parser
+import db.sqlite as StoreSQL
+import db.seasons as StoreSeasons
+from scrape import replay
+from scrape.draft import stat_store
+
+
+_SR_HOST = "https://www.sports-reference.com"
+
+#(position, player_key, name, stat_store() key or None, replay filepath or None)
+_PageRef = Tuple[str, str, str, str, str]
+
+
+def iter_cached_pages(positions: List[str] = None) -> Iterator[_PageRef]:
+    '''
+    Every cached player page we know the position of, each slug once
+
+    :param positions: OPTIONAL subset of POSITION_SCHEMA keys
+    :return         : iterator of (position, player_key, name, store key, filepath)
+    '''
+    wanted = set(positions or Parser.POSITION_SCHEMA)
+    seen = set()
+
+    #stat_pages/<year>/<position>/<slug>.html, stored plain or compressed (.gz / .br / .zz)
+    for key in stat_store().keys("stat_pages"):
+        parts = key.split("/")
+        if len(parts) != 4 or not parts[3].endswith(".html"):
+            continue
+        _, _, position, file = parts
+        slug = file[:-len(".html")]
+        if position in wanted and (position, slug) not in seen:
+            seen.add((position, slug))
+            yield position, slug, None, key, None
+
+    #prospects in sqlite whose page got recorded
+    connection = StoreSQL.sql_get_connection()
+    try:
+        rows = connection.execute(
+            "SELECT name, position, stats_link FROM players WHERE stats_link IS NOT NULL"
+        ).fetchall()
+    finally:
+        connection.close()
+
+    for row in rows:
+        slug = Parser.player_slug(row["stats_link"])
+        if row["position"] not in wanted or slug is None or (row["position"], slug) in seen:
+            continue
+        path = replay.replay_path(f"{_SR_HOST}{row['stats_link']}")
+        if path.is_file():
+            seen.add((row["position"], slug))
+            yield row["position"], slug, row["name"], None, str(path)
+
+
+def _parse_one(page: _PageRef) -> Tuple[str, List[Dict]]:
+    ''' Worker: one page -> (position, season records) '''
+    position, player_key, name, key, path = page
+    try:
+        if key is not None:
+            #Page as stored, the parser decompresses it
+            html = stat_store().find(key)
+            if html is None:
+                raise FileNotFoundError(key)
+        else:
+            with open(path, "rb") as file_ref:
+                html = file_ref.read()
+        seasons = Parser.parse_player_seasons(html=html, position=position)
+    except Exception as e:
+        print(f"[WARNING] Failed to parse {key or path}: {e}")
+        return position, []
+
+    for record in seasons:
+        record["player_key"] = player_key
+        record["name"] = name
+    return position, seasons
+
+
+def reparse_all(*, positions: List[str] = None, workers: int = None) -> Dict[str, int]:
+    '''
+    :param positions: OPTIONAL subset of POSITION_SCHEMA keys
+    :param workers  : OPTIONAL process count, os.cpu_count() otherwise
+    :return         : position -> season rows written
+    '''
+    pages = list(iter_cached_pages(positions))
+    print(f"[INFO] Re-parsing {len(pages)} cached pages")
+
+    records: Dict[str, List[Dict]] = defaultdict(list)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for position, seasons in pool.map(_parse_one, pages, chunksize=32):
+            records[position].extend(seasons)
+
+    written = {}
+    for position, position_records in records.items():
+        df = StoreSeasons.to_frame(position_records, position)
+        StoreSeasons.write_seasons(df, position)
+        written[position] = len(df)
+        print(f"[INFO] {position}: {len(df)} season rows")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-parse cached pages into the season store")
+    parser.add_argument("--positions", nargs="*", default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    reparse_all(positions=args.positions, workers=args.workers)
+    print(f"[INFO] Finished in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+'''
+Opt-in per-stage profiling for scrape / parse / db.
+Switched on with NGS_PROFILE=<dir> (or driver.py --profile <dir>),
+when switched off a profiled() call is a single flag check.
+
+Each stage gets its own cProfile.Profile (-> <stage>.pstats) plus a
+sampling thread that collects collapsed stacks (-> <stage>.collapsed,
+feed straight into flamegraph.pl / speedscope).
+'''
+
+import cProfile
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+from typing import Dict
+from typing import List
+
+import config
+
+
+# ---- Module State ----
+class _State:
+    enabled: bool = False
+    memory: bool = False
+    out_dir: Path = None
+    interval: float = 0.005
+
+
+_state = _State()
+_stages: Dict[str, "_Stage"] = {}
+_active: Dict[int, List[str]] = {}     #thread id -> stage stack
+_local = threading.local()
+_sampler: threading.Thread = None
+
+
+class _Stage:
+    '''Profiler + sampled stacks for one named stage'''
+
+    def __init__(self, name: str):
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.samples: Counter = Counter()
+        self.calls = 0
+        self.snapshots = 0
+
+
+def _stack() -> List[str]:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+        _active[threading.get_ident()] = stack
+    return stack
+
+
+# ---- Sampling ----
+def _collapse(frame) -> str:
+    ''' root;...;leaf, the format flamegraph.pl expects '''
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _sample_loop() -> None:
+    while _state.enabled:
+        frames = sys._current_frames()
+        for thread_id, stack in list(_active.items()):
+            if not stack:
+                continue
+            frame = frames.get(thread_id)
+            if frame is not None:
+                _stages[stack[-1]].samples[_collapse(frame)] += 1
+        time.sleep(_state.interval)
+
+
+# ---- Public API ----
+def enable(out_dir: str, *, memory: bool = False, interval: float = 0.005) -> None:
+    '''
+    Turn profiling on for the rest of the process
+
+    :param out_dir : folder for .pstats / .collapsed / tracemalloc dumps
+    :param memory  : also take tracemalloc snapshots in memory() blocks
+    :param interval: seconds between stack samples
+    :return        : Nothing
+    '''
+    global _sampler
+
+    _state.out_dir = Path(out_dir)
+    _state.out_dir.mkdir(parents=True, exist_ok=True)
+    _state.memory = memory
+    _state.interval = interval
+    _state.enabled = True
+
+    if _sampler is None or not _sampler.is_alive():
+        _sampler = threading.Thread(target=_sample_loop, name="ngs-profiler", daemon=True)
+        _sampler.start()
+
+
+def is_enabled() -> bool:
+    return _state.enabled
+
+
+@contextmanager
+def stage(name: str):
+    '''
+    Profile the with-block as <name>. Nested stages pause the outer
+    profiler, so each .pstats only holds time spent in its own stage
+    '''
+    if not _state.enabled:
+        yield
+        return
+
+    stack = _stack()
+    #re-entering the same stage just keeps counting into it
+    if name in stack:
+        yield
+        return
+
+    current = _stages.get(name)
+    if current is None:
+        current = _stages[name] = _Stage(name)
+
+    if stack:
+        _stages[stack[-1]].profile.disable()
+    stack.append(name)
+    current.calls += 1
+    current.profile.enable()
+    try:
+        yield
+    finally:
+        current.profile.disable()
+        stack.pop()
+        if stack:
+            _stages[stack[-1]].profile.enable()
+
+
+def profiled(name: str):
+    '''
+    Decorator flavour of stage(), a single flag check when disabled
+    '''
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return func(*args, **kwargs)
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def memory(name: str, *, top: int = 25):
+    '''
+    tracemalloc snapshots around the with-block, writes the raw snapshot
+    plus the <top> allocation sites that grew the most
+    '''
+    if not (_state.enabled and _state.memory):
+        yield
+        return
+
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(25)
+
+    before = tracemalloc.take_snapshot()
+    try:
+        yield
+    finally:
+        after = tracemalloc.take_snapshot()
+        if started_here:
+            tracemalloc.stop()
+
+        current = _stages.get(name)
+        if current is None:
+            current = _stages[name] = _Stage(name)
+        current.snapshots += 1
+
+        base = _state.out_dir / f"{name}_{current.snapshots}"
+        after.dump(f"{base}.tracemalloc")
+        with open(f"{base}_top.txt", "w", encoding="utf-8") as file_ref:
+            for stat in after.compare_to(before, "traceback")[:top]:
+                file_ref.write(f"{stat}\n")
+                for line in stat.traceback.format():
+                    file_ref.write(f"    {line}\n")
+
+
+def dump() -> List[Path]:
+    '''
+    Writes <stage>.pstats and <stage>.collapsed for every stage seen
+
+    :return: list of written paths
+    '''
+    if not _state.enabled:
+        return []
+
+    written = []
+    for name, current in _stages.items():
+        if current.calls:
+            pstats_path = _state.out_dir / f"{name}.pstats"
+            current.profile.dump_stats(pstats_path)
+            written.append(pstats_path)
+
+        if current.samples:
+            collapsed_path = _state.out_dir / f"{name}.collapsed"
+            with open(collapsed_path, "w", encoding="utf-8") as file_ref:
+                for frames, count in current.samples.most_common():
+                    file_ref.write(f"{frames} {count}\n")
+            written.append(collapsed_path)
+
+    return written
+
+
+#environment switch, driver.py --profile calls enable() itself
+if config.PROFILE_DIR:
+    enable(config.PROFILE_DIR, memory=config.PROFILE_MEMORY)
@@ -0,0 +1,332 @@
+'''
+Warm pool of headless browsers for the pages a plain GET can't get.
+
+Starting Chrome costs seconds, so the pool keeps `size` instances
+(launched with config.SELENIUM_FLAGS) and leases them out per fetch.
+An instance is recycled after max_pages pages or once its process tree
+passes max_rss_mb, the replacement is launched on the next lease.
+
+Every browser fetch is paced through the HttpClient it was given, so the
+local window and the SharedLimiter budgets cover browser traffic too.
+Only used as a fallback (Scraper.fetch_player_raw), when the plain fetch
+fails or comes back without a single <table.
+
+    pool = BrowserPool(client, size=2)
+    html = pool.fetch("https://www.sports-reference.com/cfb/players/a-1.html")
+
+    python -m scrape.browser --pages 50 --size 2
+'''
+
+import argparse
+import atexit
+import os
+import queue
+import threading
+import time
+
+from contextlib import contextmanager
+from pathlib import Path
+
+from typing import Callable
+from typing import List
+
+try:
+    from selenium import webdriver
+except ImportError:
+    #only the fallback path needs it
+    webdriver = None
+
+import config
+import metrics
+import scrape.http as http
+
+
+def _chrome(flags: List[str]):
+    if webdriver is None:
+        raise RuntimeError("[ERROR] Browser fallback needs the selenium package")
+    options = webdriver.ChromeOptions()
+    for flag in flags:
+        options.add_argument(flag)
+    driver = webdriver.Chrome(options=options)
+    driver.set_page_load_timeout(config.BROWSER_TIMEOUT)
+    return driver
+
+
+def _tree_rss_mb(pid: int) -> float:
+    '''
+    Resident memory of pid + every descendant (chromedriver -> chrome -> renderers),
+    from /proc, 0 where that isn't available
+    '''
+    total_kb = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as file_ref:
+                for line in file_ref:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as file_ref:
+                    pending.extend(int(child) for child in file_ref.read().split())
+        except (OSError, ValueError):
+            continue
+    return total_kb / 1024.0
+
+
+class _Browser:
+    ''' One driver + how much it has done '''
+
+    def __init__(self, driver, index: int):
+        self.driver = driver
+        self.index = index
+        self.pages = 0
+        self.started_at = time.time()
+
+    def pid(self) -> int:
+        service = getattr(self.driver, "service", None)
+        process = getattr(service, "process", None)
+        return getattr(process, "pid", None)
+
+    def rss_mb(self) -> float:
+        pid = self.pid()
+        return _tree_rss_mb(pid) if pid else 0.0
+
+    def quit(self) -> None:
+        try:
+            self.driver.quit()
+        except Exception as e:
+            print(f"[WARNING] Browser {self.index} did not quit cleanly: {e}")
+
+
+class BrowserPool:
+    '''
+    Fixed-size pool of leased headless browsers, safe to share between threads
+    '''
+
+    def __init__(self, client: http.HttpClient = None,
+                 *, size: int = config.BROWSER_POOL_SIZE,
+                    max_pages: int = config.BROWSER_MAX_PAGES,
+                    max_rss_mb: float = config.BROWSER_MAX_RSS_MB,
+                    flags: List[str] = None,
+                    factory: Callable[[List[str]], object] = None):
+        '''
+        :param client    : HttpClient whose pacing / SharedLimiter every browser fetch goes through
+        :param size      : browsers kept warm
+        :param max_pages : recycle a browser after this many pages, 0 = never
+        :param max_rss_mb: recycle once its process tree is past this, 0 = never
+        :param flags     : OPTIONAL browser flags, config.SELENIUM_FLAGS otherwise
+        :param factory   : OPTIONAL flags -> webdriver, headless Chrome otherwise
+        '''
+        self.client = client or http.get_client()
+        self.size = size
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.flags = list(config.SELENIUM_FLAGS if flags is None else flags)
+        self.factory = factory or _chrome
+
+        self._idle: "queue.Queue[_Browser]" = queue.Queue()
+        #free slots with no browser in them, filled on demand
+        self._slots: "queue.Queue[int]" = queue.Queue()
+        for index in range(size):
+            self._slots.put(index)
+        self._lock = threading.Lock()
+        self._live = {}
+        self._closed = False
+
+    # ---- Lifecycle ----
+    def _launch(self, index: int) -> _Browser:
+        started = time.perf_counter()
+        browser = _Browser(self.factory(self.flags), index)
+        metrics.observe("browser_launch_seconds", time.perf_counter() - started)
+        with self._lock:
+            self._live[index] = browser
+        return browser
+
+    def start(self) -> "BrowserPool":
+        ''' Launch every slot now instead of on first use '''
+        while True:
+            try:
+                index = self._slots.get_nowait()
+            except queue.Empty:
+                return self
+            try:
+                self._idle.put(self._launch(index))
+            except Exception:
+                self._slots.put(index)
+                raise
+
+    def _retire(self, browser: _Browser, reason: str) -> None:
+        with self._lock:
+            self._live.pop(browser.index, None)
+        browser.quit()
+        metrics.inc("browser_recycles_total", reason=reason)
+        self._slots.put(browser.index)
+
+    def _worn_out(self, browser: _Browser) -> str:
+        if self.max_pages and browser.pages >= self.max_pages:
+            return "pages"
+        if self.max_rss_mb and browser.rss_mb() >= self.max_rss_mb:
+            return "memory"
+        return None
+
+    @contextmanager
+    def lease(self, timeout: float = None):
+        '''
+        Borrow a warm browser, launching one into a free slot if none is idle
+
+        :param timeout: OPTIONAL seconds to wait for one
+        :return       : _Browser, handed back (or recycled) on exit
+        '''
+        if self._closed:
+            raise RuntimeError("[ERROR] BrowserPool is closed")
+
+        started = time.perf_counter()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        browser = None
+        while browser is None:
+            try:
+                browser = self._idle.get_nowait()
+                break
+            except queue.Empty:
+                pass
+            try:
+                index = self._slots.get_nowait()
+            except queue.Empty:
+                wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    browser = self._idle.get(timeout=min(wait, 0.5) if wait is not None else 0.5)
+                except queue.Empty:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise TimeoutError("[ERROR] No browser free in time")
+                continue
+            try:
+                browser = self._launch(index)
+            except Exception:
+                self._slots.put(index)
+                raise
+        metrics.observe("browser_lease_wait_seconds", time.perf_counter() - started)
+
+        broken = False
+        try:
+            yield browser
+        except Exception:
+            broken = True
+            raise
+        finally:
+            reason = "error" if broken else self._worn_out(browser)
+            if reason or self._closed:
+                self._retire(browser, reason or "closed")
+            else:
+                self._idle.put(browser)
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._retire(browser, "closed")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    # ---- Fetching ----
+    def fetch(self, url: str) -> str:
+        '''
+        Load url in a pooled browser, paced like any other request
+
+        :param url: absolute URL
+        :return   : rendered page source
+        '''
+        self.client.pace(url)
+        with self.lease() as browser:
+            started = time.perf_counter()
+            browser.driver.get(url)
+            html = browser.driver.page_source
+            browser.pages += 1
+        metrics.observe("fetch_latency_seconds", time.perf_counter() - started, host="browser")
+        metrics.inc("browser_pages_total")
+        return html
+
+    def stats(self) -> dict:
+        with self._lock:
+            live = list(self._live.values())
+        return {"live": len(live), "idle": self._idle.qsize(),
+                "pages": {browser.index: browser.pages for browser in live}}
+
+
+# ---- Process wide pool ----
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(client: http.HttpClient = None) -> BrowserPool:
+    ''' Shared pool, created (not launched) on first use, its browsers are quit at exit '''
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(client)
+            atexit.register(_pool.close)
+    return _pool
+
+
+def main():
+    from scrape.replay import ReplayServer
+
+    parser = argparse.ArgumentParser(description="Fetch pages from a local static server through the browser pool")
+    parser.add_argument("--root", default=str(config.REPLAY_DIR), help="directory the static server serves")
+    parser.add_argument("--path", action="append", default=None,
+                        help="path under root to fetch, repeatable, every *.html under root otherwise")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--size", type=int, default=config.BROWSER_POOL_SIZE)
+    parser.add_argument("--max-pages", type=int, default=config.BROWSER_MAX_PAGES)
+    parser.add_argument("--threads", type=int, default=2)
+    args = parser.parse_args()
+
+    root = Path(args.root)
+    paths = args.path or [str(path.relative_to(root)) for path in sorted(root.rglob("*.html"))]
+    if not paths:
+        print(f"[ERROR] Nothing to serve under {root}")
+        return
+
+    server = ReplayServer(root=root).start()
+    client = http.HttpClient(cooldown=0, jail_time=0, max_requests=10 ** 6, jitter=(0.0, 0.0))
+    urls = [f"{server.base_url}/{paths[i % len(paths)]}" for i in range(args.pages)]
+    work = iter(urls)
+    lock = threading.Lock()
+    sizes = []
+
+    def worker():
+        for url in work:
+            html = pool.fetch(url)
+            with lock:
+                sizes.append(len(html))
+
+    started = time.perf_counter()
+    try:
+        with BrowserPool(client, size=args.size, max_pages=args.max_pages) as pool:
+            pool.start()
+            print(f"[INFO] {args.size} browsers warm in {time.perf_counter() - started:.1f}s")
+            started = time.perf_counter()
+            threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+    finally:
+        server.stop()
+
+    print(f"[INFO] {len(sizes)} pages in {elapsed:.1f}s ({len(sizes) / elapsed if elapsed else 0:.1f}/s), "
+          f"{sum(sizes) / max(len(sizes), 1) / 1024:.0f} KiB avg")
+
+
+if __name__ == "__main__":
+    main()
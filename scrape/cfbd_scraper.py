@@ -23,6 +23,7 @@ import pos_models as Models
 logger = logging.getLogger(__name__)
 
 API_CONFIG = cfbd.Configuration(
+    host = config.CFBD_API_ROOT.rstrip("/"),
     access_token = config.CFBD_API_KEY
 )
 
@@ -0,0 +1,98 @@
+'''
+Wraps network calls to fetch combine pages from PFR, one per year,
+kept compressed in the page cache like the college-stats pages
+'''
+
+import datetime as _dt
+import os
+
+from typing import Dict
+
+import config
+import metrics
+import scrape.http as http
+import scrape.pfr as Scraper
+import parse.pfr_parser as Parser
+import db.sqlite as DB
+from scrape.pages import Page
+from scrape.pages import PageStore
+
+
+def combine_path(year: int) -> str:
+    ''' Builds the relative filepath to the combine HTML '''
+
+    return os.path.join("combine", f"{year}.html")
+
+
+# ---- Combine Page Store ----
+_combine_store = None
+
+def combine_store() -> PageStore:
+    ''' Combine pages under CACHE_DIR, kept compressed as fetched '''
+    global _combine_store
+    if _combine_store is None:
+        _combine_store = PageStore(config.CACHE_DIR)
+    return _combine_store
+
+
+# ---- Public Wrappers ----
+def fetch_combine_pages(year_start: int, year_end: int,
+                        *, client: http.HttpClient = None,
+                           refresh: bool = False) -> Dict[int, Page]:
+    '''
+    Calls fetch_combine_page for years between start and end, cached pages are reused
+
+    :param year_start:
+    :param year_end  : exclusive
+    :param client    : OPTIONAL HttpClient besides default
+    :param refresh   : re-fetch even when cached, the current year always is
+    :return          : year -> Page, years that failed are left out
+    '''
+    store = combine_store()
+    current_year = _dt.date.today().year
+
+    out: Dict[int, Page] = {}
+    for year in range(year_start, year_end):
+        key = combine_path(year)
+
+        #the current combine fills in until the draft
+        page = None if refresh or year == current_year else store.find(key)
+        if page is not None:
+            metrics.inc("page_cache_total", kind="combine", result="hit")
+        else:
+            metrics.inc("page_cache_total", kind="combine", result="miss")
+            try:
+                page = Scraper.fetch_combine_page(year, client=client, store=store, key=key)
+            except Exception as e:
+                print(f'[WARNING] Failed to fetch combine from {year}: {e}')
+                continue
+        #store
+        out[year] = page
+
+    return out
+
+
+def load_combine(year_start: int, year_end: int,
+                 *, client: http.HttpClient = None,
+                    refresh: bool = False,
+                    connection=None) -> Dict[int, int]:
+    '''
+    Fetch (or reuse) + parse combine pages and upsert them into the player store
+
+    :param year_start:
+    :param year_end  : exclusive
+    :param client    : OPTIONAL HttpClient besides default
+    :param refresh   : re-fetch even when cached
+    :param connection: OPTIONAL sqlite connection
+    :return          : year -> rows stored
+    '''
+    stored: Dict[int, int] = {}
+    for year, page in fetch_combine_pages(year_start, year_end, client=client, refresh=refresh).items():
+        rows = Parser.parse_combine_page(page)
+        if not rows:
+            print(f'[WARNING] No combine rows for {year}')
+            continue
+        stored[year] = DB.sql_update_combine(year, rows, connection=connection)
+        print(f"[INFO] Stored {stored[year]} combine rows for {year}")
+
+    return stored
@@ -6,8 +6,14 @@ Wraps network calls to fetch previous draft pages from PFR
 import config
 import scrape.http as http
 import scrape.pfr as Scraper
+from parse.pfr_parser import player_slug
+from scrape.prefetch import Prefetcher
+from scrape.pages import Page
+from scrape.pages import PageStore
 import pos_models as Models
 import db.json as Store
+import db.sqlite as DB
+import metrics
 
 from typing import Dict
 from typing import List
@@ -46,10 +52,13 @@ def _load_html(path: str) -> str:
         return None
 
 
-def stat_path(year: int, position: str) -> str:
-    ''' Builds the relative filepath to the stats HTML'''
+def stat_path(year: int, position: str, slug: str) -> str:
+    ''' Builds the relative filepath to the stats HTML, one file per player '''
 
-    return os.path.join("stat_pages", str(year), f"{position}.html")
+    #the old shared stat_pages/<year>/<position>.html held whichever player was written last
+    if not slug:
+        raise ValueError(f"[ERROR] No player slug for a {year} {position} stats page")
+    return os.path.join("stat_pages", str(year), position, f"{slug}.html")
 
 
 def _page_path(year: int) -> str:
@@ -58,6 +67,24 @@ def _page_path(year: int) -> str:
     return os.path.join("pages", f"{year}.html")
 
 
+# ---- Stat Page Store ----
+_stat_store = None
+
+def stat_store() -> PageStore:
+    ''' College-stats pages under CACHE_DIR, kept compressed as fetched '''
+    global _stat_store
+    if _stat_store is None:
+        _stat_store = PageStore(config.CACHE_DIR)
+    return _stat_store
+
+
+def cache_stat_page(html, year: int, position: str, slug: str) -> None:
+    ''' Persists a draftee college-stats page (str or Page) where parse_draftee_stat_pages looks for it '''
+
+    page = stat_store().put(stat_path(year, position, slug), html)
+    print(f"[INFO] Cached html at {page.path}")
+
+
 
 # ---- Public Wrappers ----
 def fetch_draft_pages(year_start: int, year_end: int,
@@ -78,8 +105,10 @@ def fetch_draft_pages(year_start: int, year_end: int,
 
         #check
         if os.path.exists(save_path):
+            metrics.inc("page_cache_total", kind="draft", result="hit")
             html = _load_html(path=save_path)
         else:
+            metrics.inc("page_cache_total", kind="draft", result="miss")
             #scrape
             html = Scraper.fetch_draft_page(year=year, client=client)
             if html is None:
@@ -94,39 +123,65 @@ def fetch_draft_pages(year_start: int, year_end: int,
     return out
 
 def fetch_drafted_profile_html(drafted_players: Dict[int, Dict[str, List[Models.NFLDraftee]]],
-                           *, client: http.HttpClient)\
-        -> Dict[int, Dict[str, List[str]]]:
+                           *, client: http.HttpClient,
+                              prefetcher: Prefetcher = None)\
+        -> Dict[int, Dict[str, List[Page]]]:
     '''
-    Wraps fetch_player_page
+    Wraps fetch_player_raw, pages are streamed into stat_store() still compressed
     :param pages:
+    :param prefetcher: OPTIONAL Prefetcher, fed the uncached links in the order they're fetched below
 
-    :return:
+    :return: Pages, hand them to the parsers as is
     '''
-    html_all: Dict[int, Dict[str, List[str]]] = {}
+    store = stat_store()
+    html_all: Dict[int, Dict[str, List[Page]]] = {}
+
+    if prefetcher is not None:
+        prefetcher.feed(athlete.player.stats_link
+                        for year, position_list in drafted_players.items()
+                        for position, position_players in position_list.items()
+                        for athlete in position_players
+                        if player_slug(athlete.player.stats_link) is not None and
+                           not store.exists(stat_path(year, position, player_slug(athlete.player.stats_link))))
 
     for year, position_list in drafted_players.items():
         html_all[year] = {}
 
         for position, position_players in position_list.items():
-            stats_htmls: List[str] = []
+            stats_htmls: List[Page] = []
 
             for athlete in position_players:
                 #skip missing links
                 if athlete.player.stats_link is None:
                     continue
 
+                slug = player_slug(athlete.player.stats_link)
+                if slug is None:
+                    print(f"[WARNING] No college stats slug in {athlete.player.stats_link}, skipping {athlete.player.name}")
+                    continue
+
                 #build path
-                save_path = os.path.join(config.CACHE_DIR, stat_path(year, position))
+                key = stat_path(year, position, slug)
 
                 #load if cached
-                if os.path.exists(save_path):
-                    html = _load_html(path=save_path)
+                html = store.find(key)
+                if html is not None:
+                    metrics.inc("page_cache_total", kind="stats", result="hit")
                 else:
-                   html = Scraper.fetch_player_page(href=athlete.player.stats_link, client=client)
-                   if html is None:
-                       print(f'[WARNING] Failed to fetch page for {athlete.player}')
+                   metrics.inc("page_cache_total", kind="stats", result="miss")
+                   try:
+                       if prefetcher is not None:
+                           html = store.put(key, prefetcher.get(athlete.player.stats_link))
+                       else:
+                           html = Scraper.fetch_player_raw(athlete.player.stats_link, client=client,
+                                                           store=store, key=key)
+                   except Exception as e:
+                       print(f'[WARNING] Failed to fetch page for {athlete.player}: {e}')
+                       #park it in the dead-letter table for driver.retry_failed
+                       DB.sql_record_failure(athlete.player.stats_link, e,
+                                             source="draftee", stage="fetch",
+                                             player=athlete.player, year=year)
                        continue
-                   _cache_html(html=html, filepath=save_path)
 
                 #append
                 stats_htmls.append(html)
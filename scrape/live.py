@@ -0,0 +1,255 @@
+'''
+Draft-day live mode: poll draft_url(year) with conditional requests and
+push only what changed.
+
+Each poll
+    1. sends If-None-Match / If-Modified-Since, a 304 costs nothing
+    2. cuts the drafts tbody into raw <tr> strings with a regex and
+       fingerprints each one (crc32), keyed by its pick number
+    3. soupifies only new / changed rows (Parser.parse_draft_rows)
+    4. upserts just those draftees and fans DraftEvents out to subscribers
+
+Latency is measured from when the pick "appeared" (Last-Modified if the
+server sends it, else the previous poll, an upper bound) to the commit.
+
+    python -m scrape.live 2026 --interval 3
+'''
+
+import argparse
+import queue
+import re
+import time
+import zlib
+
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Tuple
+from typing import Union
+
+import config
+import metrics
+import scrape.http as http
+import scrape.pfr as Scraper
+import parse.pfr_parser as Parser
+import db.sqlite as StoreSQL
+from pos_models import Player
+
+
+_RE_TBODY = re.compile(r"<tbody[^>]*>(.*?)</tbody>", re.S)
+_RE_ROW = re.compile(r"<tr\b[^>]*>.*?</tr>", re.S)
+_RE_PICK = re.compile(r'data-stat=["\']draft_pick["\'][^>]*>\s*(?:<[^>]+>\s*)*(\d+)')
+_RE_PLAYER = re.compile(r'data-stat=["\']player["\'][^>]*>\s*(?:<[^>]+>\s*)*[^<\s]')
+
+
+@dataclass
+class DraftEvent:
+    kind       : str          #"new" or "changed"
+    pick       : int
+    position   : str
+    player     : Player
+    appeared_at: float        #epoch seconds, best estimate
+    committed_at: float
+
+    @property
+    def latency(self) -> float:
+        return self.committed_at - self.appeared_at
+
+
+Subscriber = Union[Callable[[DraftEvent], None], "queue.Queue"]
+
+
+def split_rows(html: str) -> Dict[int, str]:
+    '''
+    Cheap pre-parse: pick number -> raw row html, only rows that already
+    have a player in them (future picks are blank until made)
+
+    :param html: draft page
+    :return    : pick -> "<tr ...>...</tr>"
+    '''
+    start = max(html.find('id="drafts"'), html.find("id='drafts'"))
+    match = _RE_TBODY.search(html, start if start != -1 else 0)
+    if match is None:
+        return {}
+
+    rows = {}
+    for row in _RE_ROW.findall(match.group(1)):
+        pick = _RE_PICK.search(row)
+        if pick and _RE_PLAYER.search(row):
+            rows[int(pick.group(1))] = row
+    return rows
+
+
+def fingerprint(row: str) -> int:
+    return zlib.crc32(row.encode("utf-8"))
+
+
+class LiveDraft:
+    '''
+    Stateful poller for one draft year
+    '''
+
+    def __init__(self, year: int,
+                 *, client: http.HttpClient = None,
+                    interval: float = config.LIVE_POLL_INTERVAL,
+                    connection=None):
+        self.year = year
+        self.url = Scraper.draft_url(year)
+        self.client = client or http.get_client()
+        self.interval = interval
+        self.connection = connection
+
+        self.polls = 0
+        self.not_modified = 0
+        self.latencies: List[float] = []
+
+        self._etag = None
+        self._last_modified = None
+        self._seen: Dict[int, int] = {}
+        self._last_poll = None
+        self._subscribers: List[Subscriber] = []
+
+    def subscribe(self, subscriber: Subscriber) -> None:
+        ''' Callable(event) or anything with put(event), like queue.Queue '''
+        self._subscribers.append(subscriber)
+
+    def _publish(self, event: DraftEvent) -> None:
+        for subscriber in self._subscribers:
+            try:
+                if hasattr(subscriber, "put"):
+                    subscriber.put(event)
+                else:
+                    subscriber(event)
+            except Exception as e:
+                print(f"[WARNING] Subscriber failed on pick {event.pick}: {e}")
+
+    def _conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self._etag:
+            headers["If-None-Match"] = self._etag
+        if self._last_modified:
+            headers["If-Modified-Since"] = self._last_modified
+        return headers
+
+    def _appeared_at(self, polled_at: float, last_modified: str = None) -> float:
+        if last_modified:
+            try:
+                return parsedate_to_datetime(last_modified).timestamp()
+            except (TypeError, ValueError):
+                pass
+        return self._last_poll if self._last_poll is not None else polled_at
+
+    # ---- Polling ----
+    def poll_once(self) -> List[DraftEvent]:
+        '''
+        :return: events for every pick that is new or changed since the last poll
+        '''
+        polled_at = time.time()
+        self.polls += 1
+
+        response = self.client.send_request(self.url, headers=self._conditional_headers())
+        if response.status_code == 304:
+            self.not_modified += 1
+            metrics.inc("page_cache_total", kind="draft_live", result="revalidate")
+            self._last_poll = polled_at
+            return []
+
+        metrics.inc("page_cache_total", kind="draft_live", result="miss")
+        #validators and digests are only committed once the rows are stored,
+        #otherwise a failed parse/upsert would be skipped as unchanged next poll
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+        rows = split_rows(response.text)
+        changed: List[Tuple[int, str]] = []
+        digests: Dict[int, int] = {}
+        for pick, row in rows.items():
+            digest = fingerprint(row)
+            if self._seen.get(pick) != digest:
+                changed.append((pick, "changed" if pick in self._seen else "new"))
+                digests[pick] = digest
+        metrics.inc("live_rows_changed_total", len(changed))
+
+        if not changed:
+            self._etag, self._last_modified = etag, last_modified
+            self._last_poll = polled_at
+            return []
+
+        kinds = dict(changed)
+        parsed = Parser.parse_draft_rows([rows[pick] for pick, _ in changed])
+        players = [(position, player) for position, position_players in parsed.items()
+                   for player in position_players]
+
+        StoreSQL.sql_update_players([player for _, player in players], connection=self.connection)
+        committed_at = time.time()
+        appeared_at = self._appeared_at(polled_at, last_modified)
+        self._etag, self._last_modified = etag, last_modified
+        self._seen.update(digests)
+
+        events = []
+        for position, player in players:
+            pick = getattr(player, "pick", None)
+            event = DraftEvent(kind=kinds.get(pick, "new"), pick=pick, position=position, player=player,
+                               appeared_at=appeared_at, committed_at=committed_at)
+            #first poll is the backlog, not live picks
+            if self._last_poll is not None:
+                self.latencies.append(event.latency)
+                metrics.observe("live_pick_latency_seconds", event.latency)
+            events.append(event)
+            self._publish(event)
+
+        self._last_poll = polled_at
+        return events
+
+    def run(self, *, max_polls: int = None, picks: int = None) -> None:
+        '''
+        Poll every self.interval seconds, fetch time included
+
+        :param max_polls: OPTIONAL stop after this many polls
+        :param picks    : OPTIONAL stop once this many picks are in
+        '''
+        try:
+            while max_polls is None or self.polls < max_polls:
+                started = time.monotonic()
+                try:
+                    events = self.poll_once()
+                except Exception as e:
+                    print(f"[WARNING] Live poll failed: {e}")
+                    events = []
+
+                for event in events:
+                    print(f"[INFO] {event.kind} pick {event.pick}: {event.player.name} "
+                          f"({event.position}) in {event.latency:.2f}s")
+
+                if picks is not None and len(self._seen) >= picks:
+                    break
+                time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            pass
+
+    def report(self) -> Dict[str, float]:
+        ''' Poll counts + pick latency percentiles '''
+        values = sorted(self.latencies)
+        pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] if values else None
+        return {"polls": self.polls, "not_modified": self.not_modified, "picks": len(self._seen),
+                "latency_p50": pick(0.50), "latency_p95": pick(0.95), "latency_max": pick(1.0)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Poll a draft page live and upsert new picks")
+    parser.add_argument("year", type=int)
+    parser.add_argument("--interval", type=float, default=config.LIVE_POLL_INTERVAL)
+    parser.add_argument("--max-polls", type=int, default=None)
+    parser.add_argument("--picks", type=int, default=None, help="OPTIONAL stop after this many picks")
+    args = parser.parse_args()
+
+    live = LiveDraft(args.year, interval=args.interval)
+    live.run(max_polls=args.max_polls, picks=args.picks)
+    print(f"[INFO] {live.report()}")
+
+
+if __name__ == "__main__":
+    main()
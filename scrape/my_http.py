@@ -7,20 +7,35 @@ polite requests, respecting PFR robots.txt
 import time
 import random
 import logging
+import threading
 
 from collections import deque
 from typing import Deque
 from typing import Dict
 from typing import Any
+from urllib.parse import urlsplit
 
 import requests
 from urllib3.util.retry import Retry
 
 import config
+import metrics
+from scrape import replay
+from scrape.pages import BodyTooLarge
+from scrape.pages import Page
+from scrape.pages import PageStore
+from scrape.pages import accept_encoding
+from scrape.pages import normalize_encoding
+from scrape.pages import charset_of
+from scrape.ratelimit import SharedLimiter
+from scrape.ratelimit import budget_for
 
 #get mesa a logger !
 logger = logging.getLogger(__name__)
 
+#bytes per read while streaming a body
+_CHUNK = 64 * 1024
+
 class HttpClient:
     '''
     Respectful HTTP helper that's reusable
@@ -32,13 +47,22 @@ class HttpClient:
                  cooldown: int,
                  jail_time: int,
                  max_requests: int,
-                 session: requests.Session = None):
+                 session: requests.Session = None,
+                 *, jitter: tuple = config.REQUEST_JITTER,
+                    record: bool = config.RECORD_RESPONSES,
+                    limiter: SharedLimiter = None):
 
         self.cooldown = cooldown
         self.jail_time = jail_time
         self.max_requests = max_requests
+        self.jitter = jitter
+        self.record = record
+        #cross-process budget, on top of this client's own window
+        self.limiter = limiter
 
         self._recent_calls = deque(maxlen=max_requests)
+        #prefetch threads share the client, the window has to be checked + updated atomically
+        self._lock = threading.Lock()
         self.session = session or requests.Session()
 
         retry = Retry(
@@ -55,29 +79,127 @@ class HttpClient:
         adapter = requests.adapters.HTTPAdapter(max_retries=retry)
         self.session.mount('http://', adapter)
         self.session.mount('https://', adapter)
-        self.session.headers.update({"User-Agent": config.USER_AGENT})
+        self.session.headers.update({"User-Agent": config.USER_AGENT,
+                                     "Accept-Encoding": accept_encoding()})
 
 
 # ---- HTTP request implementations ----
     def send_request(self, request_url: str,
                      *, headers: Dict[str, str] = None,
                         params: Dict[str, Any] = None ):
-        self._respect_limit()
+        self.pace(request_url)
+        logger.debug(f"[DEBUG] GET {request_url} headers={headers} params={params}")
 
-        print(headers, params)
-        #be weird
-        time.sleep(random.uniform(1.87, 2.84))
+        host = urlsplit(request_url).netloc
         #now go
-        response = self.session.get(request_url, timeout=(4, 10))
+        start = time.perf_counter()
+        response = self.session.get(request_url, headers=headers, params=params, timeout=(4, 10))
+        metrics.observe("fetch_latency_seconds", time.perf_counter() - start, host=host)
+        metrics.inc("http_responses_total", host=host, status=response.status_code)
+        metrics.inc("bytes_downloaded_total", len(response.content), host=host)
+
         if response.status_code == 429:
             print(f"\t\t\t[DEBUG | HttpClient] 429 Received URL => {request_url}")
 
         response.raise_for_status()
+
+        #conditional request came back unchanged, nothing to record
+        if response.status_code == 304:
+            return response
+
+        #record mode, keep the body for the replay server
+        if self.record:
+            replay.record_response(request_url, response.content)
         return response
 
 
 
+    def fetch_page(self, request_url: str,
+                   *, store: PageStore = None,
+                      key: str = None,
+                      max_bytes: int = config.MAX_BODY_BYTES,
+                      headers: Dict[str, str] = None) -> Page:
+        '''
+        Like send_request, but the body is streamed as sent (still gzip / br)
+        into store[key] or a bytes buffer, and never decoded here
+
+        :param request_url: URL to GET
+        :param store      : OPTIONAL PageStore to stream into, memory otherwise
+        :param key        : path inside store, required with store
+        :param max_bytes  : wire bytes allowed before giving up with BodyTooLarge
+        :param headers    : OPTIONAL extra request headers
+        :return           : Page, file backed when store was given
+        '''
+        self.pace(request_url)
+        logger.debug(f"[DEBUG] GET {request_url} (streamed) headers={headers}")
+
+        host = urlsplit(request_url).netloc
+        start = time.perf_counter()
+        response = self.session.get(request_url, headers=headers, stream=True, timeout=(4, 10))
+        try:
+            metrics.inc("http_responses_total", host=host, status=response.status_code)
+            if response.status_code == 429:
+                print(f"\t\t\t[DEBUG | HttpClient] 429 Received URL => {request_url}")
+            response.raise_for_status()
+
+            declared = int(response.headers.get("Content-Length") or 0)
+            if max_bytes and declared > max_bytes:
+                raise BodyTooLarge(f"[ERROR] {request_url} is {declared} bytes, limit {max_bytes}")
+
+            #checked before a byte is read, an unknown coding would only fail later in the parser
+            encoding = normalize_encoding(response.headers.get("Content-Encoding"))
+            charset = charset_of(response.headers.get("Content-Type"))
+            chunks = response.raw.stream(_CHUNK, decode_content=False)
+
+            received = 0
+            if store is not None:
+                with store.writer(key, encoding) as sink:
+                    for chunk in chunks:
+                        received = self._check_size(request_url, received + len(chunk), max_bytes)
+                        sink.write(chunk)
+                page = sink.page
+            else:
+                body = bytearray()
+                for chunk in chunks:
+                    received = self._check_size(request_url, received + len(chunk), max_bytes)
+                    body += chunk
+                page = Page(bytes(body), encoding=encoding)
+        finally:
+            response.close()
+
+        page.url, page.status, page.charset = request_url, response.status_code, charset
+        metrics.observe("fetch_latency_seconds", time.perf_counter() - start, host=host)
+        metrics.inc("bytes_downloaded_total", received, host=host)
+
+        #replay server serves plain bodies, only pay for the decompress in record mode
+        if self.record:
+            replay.record_response(request_url, page.content)
+        return page
+
+    @staticmethod
+    def _check_size(request_url: str, received: int, max_bytes: int) -> int:
+        if max_bytes and received > max_bytes:
+            raise BodyTooLarge(f"[ERROR] {request_url} passed {max_bytes} bytes, giving up")
+        return received
+
+    def pace(self, request_url: str) -> None:
+        ''' Local window, jitter, then the shared budget, before every request (browser pool included) '''
+        self._respect_limit()
+
+        #be weird
+        jitter = random.uniform(*self.jitter)
+        time.sleep(jitter)
+        metrics.inc("ratelimit_sleep_seconds_total", jitter, kind="jitter")
+
+        if self.limiter is not None:
+            waited = self.limiter.acquire(budget_for(request_url))
+            metrics.inc("ratelimit_sleep_seconds_total", waited, kind="shared")
+
     def _respect_limit(self) -> None:
+        with self._lock:
+            self._wait_for_window()
+
+    def _wait_for_window(self) -> None:
         time_stamp = time.time()
 
         #just add and return
@@ -93,6 +215,7 @@ class HttpClient:
             throttle_time = self.cooldown - difference
             logger.debug(f"[DEBUG] Throttling for {throttle_time:.2f}")
             time.sleep(throttle_time)
+            metrics.inc("ratelimit_sleep_seconds_total", throttle_time, kind="throttle")
 
             #update timestamp after sleeping
             time_stamp = time.time()
@@ -0,0 +1,284 @@
+'''
+Compressed pages, end to end.
+
+HttpClient.fetch_page asks for gzip (and br when the brotli package is
+installed), streams the body *as sent* into a PageStore file or a
+bytes buffer and hands back a Page. Nothing is decompressed or decoded
+until a parser asks for it:
+
+    page.raw      -> wire bytes, what's on disk
+    page.content  -> decompressed bytes, what BeautifulSoup gets
+    page.text     -> str, only for regex pre-scans / legacy callers
+
+    store = PageStore(config.CACHE_DIR)
+    page = client.fetch_page(url, store=store, key="stat_pages/2024/WR/a-1.html")
+    Parser.parse_player_page(html=page, player=player)
+'''
+
+import gzip
+import os
+import re
+import threading
+import zlib
+
+from pathlib import Path
+from typing import Dict
+from typing import Iterator
+
+try:
+    import brotli
+except ImportError:
+    #br is only advertised when we can undo it
+    brotli = None
+
+import config
+
+
+class BodyTooLarge(ValueError):
+    ''' Response body went past max_bytes, nothing was kept '''
+
+
+class UnsupportedEncoding(ValueError):
+    ''' Content-Encoding we can't store / undo (zstd, stacked codings, ...), nothing was kept '''
+
+
+_SUFFIXES: Dict[str, str] = {"gzip": ".gz", "br": ".br", "deflate": ".zz"}
+#legacy spellings servers still send
+_ENCODING_ALIASES: Dict[str, str] = {"x-gzip": "gzip", "x-deflate": "deflate"}
+_RE_CHARSET = re.compile(r"charset=([\w-]+)", re.I)
+#wire / decoded bytes per step when a page is scanned instead of decompressed whole
+_SCAN_CHUNK = 64 * 1024
+
+
+def accept_encoding() -> str:
+    return "gzip, br" if brotli is not None else "gzip"
+
+
+def normalize_encoding(encoding: str) -> str:
+    '''
+    :param encoding: Content-Encoding header as sent, None / "" for plain bodies
+    :return        : identity, gzip, deflate or br (only with brotli installed), raises UnsupportedEncoding otherwise
+    '''
+    encoding = (encoding or "identity").strip().lower() or "identity"
+    encoding = _ENCODING_ALIASES.get(encoding, encoding)
+    if encoding == "identity" or (encoding in _SUFFIXES and (encoding != "br" or brotli is not None)):
+        return encoding
+    raise UnsupportedEncoding(f"[ERROR] Unsupported Content-Encoding {encoding!r}")
+
+
+def decompress(raw: bytes, encoding: str) -> bytes:
+    '''
+    :param raw     : body as sent
+    :param encoding: Content-Encoding, identity / None for plain bodies
+    :return        : decompressed bytes
+    '''
+    encoding = (encoding or "identity").lower()
+    if encoding == "identity":
+        return raw
+    if encoding == "gzip":
+        return gzip.decompress(raw)
+    if encoding == "deflate":
+        return zlib.decompress(raw)
+    if encoding == "br":
+        if brotli is None:
+            raise ValueError("[ERROR] br body but the brotli package isn't installed")
+        return brotli.decompress(raw)
+    raise ValueError(f"[ERROR] Unsupported Content-Encoding {encoding}")
+
+
+class Page:
+    '''
+    One response body, compressed as sent, held in memory or in a PageStore file
+    '''
+
+    def __init__(self, raw: bytes = None, *, encoding: str = None, path: Path = None,
+                 url: str = None, status: int = 200, charset: str = None):
+        self._raw = raw
+        self.encoding = (encoding or "identity").lower()
+        self.path = path
+        self.url = url
+        self.status = status
+        self.charset = charset
+
+    @property
+    def raw(self) -> bytes:
+        ''' Wire bytes, read from the store on every call when file backed '''
+        if self._raw is not None:
+            return self._raw
+        with open(self.path, "rb") as file_ref:
+            return file_ref.read()
+
+    @property
+    def content(self) -> bytes:
+        ''' Decompressed on every call, nothing decoded is kept around '''
+        return decompress(self.raw, self.encoding)
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.charset or "utf-8", errors="replace")
+
+    def contains(self, marker: bytes) -> bool:
+        ''' marker in content, decompressing only as far as its first occurrence '''
+        keep = len(marker) - 1
+        tail = b""
+        for block in self._decoded_blocks():
+            window = tail + block
+            if marker in window:
+                return True
+            tail = window[-keep:] if keep else b""
+        return False
+
+    def _raw_blocks(self):
+        if self._raw is not None:
+            for start in range(0, len(self._raw), _SCAN_CHUNK):
+                yield self._raw[start:start + _SCAN_CHUNK]
+            return
+        with open(self.path, "rb") as file_ref:
+            while True:
+                block = file_ref.read(_SCAN_CHUNK)
+                if not block:
+                    return
+                yield block
+
+    def _decoded_blocks(self):
+        ''' Decompressed body in blocks of at most _SCAN_CHUNK bytes (br: per input block) '''
+        if self.encoding == "identity":
+            yield from self._raw_blocks()
+            return
+        if self.encoding in ("gzip", "deflate"):
+            decoder = zlib.decompressobj(31 if self.encoding == "gzip" else 15)
+            for block in self._raw_blocks():
+                yield decoder.decompress(block, _SCAN_CHUNK)
+                while decoder.unconsumed_tail:
+                    yield decoder.decompress(decoder.unconsumed_tail, _SCAN_CHUNK)
+            yield decoder.flush()
+            return
+        if self.encoding == "br" and brotli is not None:
+            decoder = brotli.Decompressor()
+            for block in self._raw_blocks():
+                yield decoder.process(block)
+            return
+        raise UnsupportedEncoding(f"[ERROR] Unsupported Content-Encoding {self.encoding!r}")
+
+    def __len__(self) -> int:
+        if self._raw is not None:
+            return len(self._raw)
+        return os.path.getsize(self.path)
+
+    def __repr__(self) -> str:
+        return f"Page({self.url or self.path}, {self.encoding}, {len(self)} bytes)"
+
+
+def charset_of(content_type: str) -> str:
+    match = _RE_CHARSET.search(content_type or "")
+    return match.group(1) if match else None
+
+
+class PageStore:
+    '''
+    Files under root, keyed by relative path. Compressed bodies keep their
+    encoding as an extra suffix (a-1.html.gz), plain files are still read
+    '''
+
+    def __init__(self, root: Path = None):
+        self.root = Path(root or config.CACHE_DIR)
+
+    def _candidates(self, key: str):
+        base = self.root / key
+        yield base, "identity"
+        for encoding, suffix in _SUFFIXES.items():
+            yield base.with_name(base.name + suffix), encoding
+
+    def find(self, key: str) -> Page:
+        ''' Stored page for key, None when missing '''
+        for path, encoding in self._candidates(key):
+            if path.exists():
+                return Page(path=path, encoding=encoding)
+        return None
+
+    def exists(self, key: str) -> bool:
+        return self.find(key) is not None
+
+    def keys(self, prefix: str = "") -> Iterator[str]:
+        '''
+        Every key stored under prefix, encoding suffixes stripped, each key once
+
+        :param prefix: relative directory (EXAMPLE :: stat_pages/2023)
+        :return      : keys find() accepts, sorted
+        '''
+        root = self.root / prefix
+        if not root.is_dir():
+            return
+        keys = set()
+        for path in root.rglob("*"):
+            #in-progress writes are dot-prefixed temp files
+            if not path.is_file() or path.name.startswith("."):
+                continue
+            key = path.relative_to(self.root).as_posix()
+            for suffix in _SUFFIXES.values():
+                if key.endswith(suffix):
+                    key = key[:-len(suffix)]
+                    break
+            keys.add(key)
+        yield from sorted(keys)
+
+    def holds(self, key: str, page: Page) -> bool:
+        ''' True when page is the file stored under key here, not a copy somewhere else '''
+        if page is None or page.path is None:
+            return False
+        return any(Path(page.path) == path for path, _ in self._candidates(key))
+
+    def writer(self, key: str, encoding: str) -> "_PageWriter":
+        ''' File sink for a streamed body, only visible under key once committed '''
+        encoding = normalize_encoding(encoding)
+        path = self.root / key
+        if encoding != "identity":
+            path = path.with_name(path.name + _SUFFIXES[encoding])
+        return _PageWriter(self, key, path, encoding)
+
+    def put(self, key: str, body, *, encoding: str = None) -> Page:
+        ''' Store a body already in memory, a Page keeps its encoding, str is written as UTF-8 '''
+        if isinstance(body, Page):
+            body, encoding = body.raw, body.encoding
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        with self.writer(key, encoding) as sink:
+            sink.write(body)
+        return sink.page
+
+    def _drop_others(self, key: str, keep: Path) -> None:
+        #a page re-fetched with another encoding must not leave the old copy to be found first
+        for path, _ in self._candidates(key):
+            if path != keep and path.exists():
+                path.unlink()
+
+
+class _PageWriter:
+    ''' Temp file + rename, so readers never see half a body '''
+
+    def __init__(self, store: PageStore, key: str, path: Path, encoding: str):
+        self.store = store
+        self.key = key
+        self.path = path
+        self.encoding = encoding
+        self.page = None
+        self._tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        self._file = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self._tmp, "wb")
+        return self
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._file.close()
+        if exc_type is not None:
+            self._tmp.unlink(missing_ok=True)
+            return False
+        os.replace(self._tmp, self.path)
+        self.store._drop_others(self.key, self.path)
+        self.page = Page(path=self.path, encoding=self.encoding)
+        return False
@@ -7,7 +7,14 @@ user and http.py
 import datetime as _dt
 
 import config
+import metrics
 from scrape.http import HttpClient
+from scrape.browser import get_pool
+from scrape.pages import BodyTooLarge
+from scrape.pages import Page
+from scrape.pages import PageStore
+from scrape.singleflight import SingleFlight
+from parse.pfr_parser import canonical_player_path
 import scrape.http as http
 
 
@@ -40,10 +47,55 @@ def draft_url(year: int) -> str:
     return f"{config.PFR_DRAFT_ROOT}{year}/draft.htm"
 
 
+def combine_url(year: int) -> str:
+    '''
+    :param year: Year of the scouting combine
+    :return: string URL to PFR
+    '''
+    _validate_year(year)
+    return f"{config.PFR_COMBINE_ROOT}{year}-combine.htm"
+
+
+#every player page fetch goes through here, keyed by canonical path,
+#finished pages are kept compressed
+_player_pages = SingleFlight(remember=config.PAGE_REMEMBER, name="player_page")
+
+
 # ---- HTTPClient wrappers ----
 def _http_client(client: HttpClient) -> None:
     return client or http.get_client()
 
+#gone for good, or we're being told to slow down: a browser won't find it / only hits the same limit
+_NO_FALLBACK_STATUS = {404, 410, 429}
+
+def _fetch_with_fallback(url: str, *, client: HttpClient, store: PageStore, key: str) -> Page:
+    '''
+    Plain streamed GET first. With config.BROWSER_FALLBACK, a failure or a
+    page without a single <table (SR keeps some in comments, those count)
+    is retried once through the browser pool
+    '''
+    client = _http_client(client)
+    try:
+        page = client.fetch_page(url, store=store, key=key)
+    except Exception as e:
+        status = getattr(getattr(e, "response", None), "status_code", None)
+        #an oversized body is just as oversized when a browser renders it
+        if not config.BROWSER_FALLBACK or status in _NO_FALLBACK_STATUS or isinstance(e, BodyTooLarge):
+            raise
+        print(f"\t[INFO] Plain fetch failed ({e}), trying a browser for {url}")
+        metrics.inc("browser_fallback_total", reason="error")
+    else:
+        #streamed scan, stops at the first table instead of decompressing the whole page
+        if not config.BROWSER_FALLBACK or page.contains(b"<table"):
+            return page
+        print(f"\t[INFO] No tables in {url}, trying a browser")
+        metrics.inc("browser_fallback_total", reason="no_tables")
+
+    html = get_pool(client).fetch(url)
+    if store is not None:
+        return store.put(key, html)
+    return Page(html.encode("utf-8"), url=url, charset="utf-8")
+
 
 def fetch_prospects_page(year: int,
                          *, client: HttpClient = None) -> str:
@@ -70,6 +122,21 @@ def fetch_draft_page(year: int,
     request_url = draft_url(year)
     return _http_client(client).send_request(request_url).text
 
+def fetch_combine_page(year: int,
+                       *, client: HttpClient = None,
+                          store: PageStore = None,
+                          key: str = None) -> Page:
+    """
+    Download the combine results for <year>, left compressed
+
+    :param year  : Year of the scouting combine
+    :param client: OPTIONAL HTTPClient besides default
+    :param store : OPTIONAL PageStore to stream the body into
+    :param key   : path inside store
+    :return      : Page, parsers take it as is
+    """
+    return _fetch_with_fallback(combine_url(year), client=client, store=store, key=key)
+
 def fetch_player_page(href: str,
                       *, client: HttpClient = None) -> str:
     '''
@@ -79,9 +146,37 @@ def fetch_player_page(href: str,
     :param client: OPTIONAL HttpClient besides default
     :return      : HTML page as string
     '''
+    return fetch_player_raw(href, client=client).text
+
+def fetch_player_raw(href: str,
+                     *, client: HttpClient = None,
+                        store: PageStore = None,
+                        key: str = None,
+                        fresh: bool = False) -> Page:
+    '''
+    Download single players college-stats page, left compressed
+
+    :param href  : URL to players college-stats
+    :param client: OPTIONAL HttpClient besides default
+    :param store : OPTIONAL PageStore to stream the body into
+    :param key   : path inside store
+    :param fresh : skip a remembered page (EXAMPLE :: retrying one that failed to parse)
+    :return      : Page, parsers take it as is
+    '''
     if not href:
         raise ValueError("[ERROR] No URL provided! <fetch_player_page>")
 
+    #same player via another year / page / position -> same fetch
+    path = canonical_player_path(href)
+    if path is not None:
+        href = path
     if not href.startswith('http'):
-        href = f"https://www.sports-reference.com{href}"
-    return _http_client(client).send_request(href).text
+        href = f"{config.SR_CFB_ROOT}{href}"
+    if fresh:
+        _player_pages.forget(path or href)
+    page = _player_pages.do(path or href,
+                            lambda: _fetch_with_fallback(href, client=client, store=store, key=key))
+    #a shared / remembered page went wherever its leader put it, this caller's store still gets a copy
+    if store is not None and not store.holds(key, page):
+        page = store.put(key, page)
+    return page
@@ -0,0 +1,185 @@
+'''
+Speculative prefetch of college-stats pages.
+
+Links are fed in as the parser reaches each modelled row (on_link) or
+in the order the caller will ask for them (feed), and a background
+thread fetches them through the same HttpClient, so the client's
+window / SharedLimiter still bound the total request rate.
+
+Three more bounds keep it from starving the caller:
+    depth   : at most this many prefetched pages (in flight or waiting
+              to be claimed) at once
+    ttl     : a finished page nobody claims within ttl seconds is
+              dropped, so links the caller skips can't pin the depth
+    explicit: while the caller is fetching something that wasn't
+              prefetched, the prefetch thread waits its turn
+
+    prefetcher = Prefetcher(client)
+    players = Parser.parse_prospect_page(html, on_link=prefetcher.submit)
+    html = prefetcher.get(player.stats_link)
+'''
+
+import threading
+import time
+
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from typing import Callable
+from typing import Iterable
+
+import config
+import metrics
+import scrape.http as http
+import scrape.pfr as Scraper
+from parse.pfr_parser import canonical_player_path
+
+
+class Prefetcher:
+    '''
+    Single background fetch thread + a bounded map of href -> Future
+    '''
+
+    def __init__(self, client: http.HttpClient = None,
+                 *, depth: int = config.PREFETCH_DEPTH,
+                    ttl: float = config.PREFETCH_TTL,
+                    fetch: Callable[..., object] = None):
+        '''
+        :param client: HttpClient shared with the caller
+        :param depth : max prefetched pages nobody has claimed yet, 0 disables prefetch
+        :param ttl   : seconds a finished page may wait to be claimed before it's dropped
+        :param fetch : OPTIONAL (href, client=) -> page, Scraper.fetch_player_raw otherwise
+        '''
+        self.client = client or http.get_client()
+        self.depth = depth
+        self.ttl = ttl
+        self.fetch = fetch or Scraper.fetch_player_raw
+
+        self._pending: "OrderedDict[str, None]" = OrderedDict()
+        self._futures = {}
+        self._finished = {}
+        self._claimed = set()
+        self._dropped = set()
+        self._explicit = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+        if depth > 0:
+            self._thread = threading.Thread(target=self._run, name="ngs-prefetch", daemon=True)
+            self._thread.start()
+
+    # ---- Producer side ----
+    def submit(self, href: str) -> None:
+        ''' Queue one link, duplicates (by canonical path) and already fetched links are ignored '''
+        if not href or self.depth <= 0:
+            return
+        href = canonical_player_path(href) or href
+        with self._cond:
+            if href in self._futures or href in self._pending or href in self._claimed \
+                    or href in self._dropped:
+                return
+            self._pending[href] = None
+            self._cond.notify_all()
+
+    def feed(self, hrefs: Iterable[str]) -> None:
+        for href in hrefs:
+            self.submit(href)
+
+    # ---- Consumer side ----
+    def get(self, href: str):
+        '''
+        The page for href: prefetched, in flight, or fetched right now on
+        the calling thread (ahead of any queued prefetch)
+
+        :param href: stats_link
+        :return    : Page (still compressed, parsers take it as is), raises whatever the fetch raised
+        '''
+        href = canonical_player_path(href) or href
+        with self._cond:
+            future = self._futures.pop(href, None)
+            self._finished.pop(href, None)
+            self._pending.pop(href, None)
+            self._claimed.add(href)
+            if future is None:
+                self._explicit += 1
+            self._cond.notify_all()
+
+        if future is not None:
+            started = time.perf_counter()
+            html = future.result()
+            metrics.inc("prefetch_total", result="hit")
+            metrics.observe("prefetch_wait_seconds", time.perf_counter() - started)
+            return html
+
+        metrics.inc("prefetch_total", result="miss")
+        try:
+            return self.fetch(href=href, client=self.client)
+        finally:
+            with self._cond:
+                self._explicit -= 1
+                self._cond.notify_all()
+
+    def close(self) -> None:
+        ''' Stop prefetching, anything queued but not started is dropped '''
+        with self._cond:
+            self._closed = True
+            wasted = sum(1 for future in self._futures.values() if future.done())
+            self._pending.clear()
+            self._cond.notify_all()
+        if wasted:
+            metrics.inc("prefetch_total", wasted, result="unused")
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    # ---- Worker ----
+    def _expire(self) -> None:
+        ''' Drop finished pages unclaimed for ttl seconds, caller holds the lock '''
+        now = time.monotonic()
+        stale = [href for href, finished_at in self._finished.items() if now - finished_at >= self.ttl]
+        for href in stale:
+            del self._finished[href]
+            del self._futures[href]
+            self._dropped.add(href)
+        if stale:
+            metrics.inc("prefetch_total", len(stale), result="unused")
+
+    def _next(self):
+        ''' Blocks until there is a link to fetch and room under depth, None when closed '''
+        with self._cond:
+            while not self._closed:
+                self._expire()
+                if self._pending and not self._explicit and len(self._futures) < self.depth:
+                    break
+                #finished pages age out, wake up to drop them even if nothing else happens
+                self._cond.wait(timeout=self.ttl if self._finished else None)
+            if self._closed:
+                return None, None
+            href, _ = self._pending.popitem(last=False)
+            future = Future()
+            future.set_running_or_notify_cancel()
+            self._futures[href] = future
+            return href, future
+
+    def _run(self) -> None:
+        while True:
+            href, future = self._next()
+            if href is None:
+                return
+            try:
+                html = self.fetch(href=href, client=self.client)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(html)
+            with self._cond:
+                if href in self._futures:
+                    self._finished[href] = time.monotonic()
+                self._cond.notify_all()
@@ -0,0 +1,131 @@
+'''
+Cross-process rate budgets. One token bucket per host lives in a small
+sqlite file; every process (or box, on a shared filesystem) that points
+at the same file draws from the same budget, so sharded scrapes stay
+inside the per-site limits no matter how many workers run.
+
+    limiter = SharedLimiter()
+    waited = limiter.acquire("www.sports-reference.com")
+'''
+
+import sqlite3
+import threading
+import time
+
+from pathlib import Path
+from typing import Dict
+from urllib.parse import urlsplit
+
+import config
+
+
+_SQL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    budget  TEXT PRIMARY KEY,
+    tokens  REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+#never sleep longer than this in one go, re-check the bucket instead
+_MAX_NAP = 1.0
+
+
+def budget_for(url: str) -> str:
+    ''' Budget key for a URL, its host '''
+    return urlsplit(url).netloc or url
+
+
+class SharedLimiter:
+    '''
+    Token bucket per budget: refills at rate/60 tokens a second up to burst.
+    Every take is one BEGIN IMMEDIATE transaction, sqlite's write lock is
+    the cross-process mutex. Threads share the one connection, _lock keeps
+    their transactions from interleaving on it
+    '''
+
+    def __init__(self, path: Path = None,
+                 *, budgets: Dict[str, float] = None,
+                    default: float = config.RATE_DEFAULT_BUDGET,
+                    burst: float = 1.0):
+        '''
+        :param path   : OPTIONAL sqlite file, config.RATE_LIMIT_PATH otherwise
+        :param budgets: OPTIONAL host -> requests per minute, config.RATE_BUDGETS otherwise
+        :param default: requests per minute for hosts not in budgets
+        :param burst  : bucket size, 1 = strictly spaced requests
+        '''
+        self.path = str(path or config.RATE_LIMIT_PATH)
+        self.budgets = dict(config.RATE_BUDGETS if budgets is None else budgets)
+        self.default = default
+        self.burst = burst
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                           check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SQL_SCHEMA)
+
+    def rate(self, budget: str) -> float:
+        ''' tokens per second '''
+        return self.budgets.get(budget, self.default) / 60.0
+
+    def _take(self, budget: str) -> float:
+        '''
+        Try to take one token
+
+        :return: 0 if taken, otherwise seconds until one will be there
+        '''
+        rate = self.rate(budget)
+        with self._lock:
+            return self._take_locked(budget, rate)
+
+    def _take_locked(self, budget: str, rate: float) -> float:
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = connection.execute("SELECT tokens, updated FROM rate_buckets WHERE budget = ?",
+                                     (budget,)).fetchone()
+            tokens = self.burst if row is None \
+                else min(self.burst, row[0] + max(0.0, now - row[1]) * rate)
+
+            wait = 0.0
+            if tokens >= 1.0:
+                tokens -= 1.0
+            else:
+                wait = (1.0 - tokens) / rate
+
+            connection.execute(
+                "INSERT INTO rate_buckets (budget, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT (budget) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (budget, tokens, now),
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return wait
+
+    def acquire(self, budget: str) -> float:
+        '''
+        Block until the budget has a token
+
+        :param budget: key from budget_for
+        :return      : seconds spent waiting
+        '''
+        waited = 0.0
+        while True:
+            wait = self._take(budget)
+            if not wait:
+                return waited
+            nap = min(wait, _MAX_NAP)
+            time.sleep(nap)
+            waited += nap
+
+    def reset(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM rate_buckets")
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
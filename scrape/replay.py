@@ -0,0 +1,262 @@
+'''
+Offline record + replay of PFR / Sports-Reference / CFBD responses.
+
+Record mode (NGS_RECORD=1) makes HttpClient keep every successful body
+under REPLAY_DIR/<host>/<path>. The replay server serves that tree back
+with configurable latency, 429s (with Retry-After) and 5xx bursts, so the
+limiter, retries and scrape_year throughput can be load tested with no
+network and no risk of a PFR ban:
+
+    python -m scrape.replay --port 8765 --latency-ms 80 --rate-429 0.02
+    eval "$(python -m scrape.replay --print-env --port 8765)"
+'''
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from typing import Dict
+from typing import Any
+
+import config
+
+
+# ---- Replay Store ----
+def replay_path(url: str, *, root: Path = None) -> Path:
+    '''
+    Maps a URL onto the replay tree, query strings get a short hash suffix
+
+    :param url : absolute URL
+    :param root: OPTIONAL replay root besides config.REPLAY_DIR
+    :return    : path of the stored body
+    '''
+    parts = urlsplit(url)
+    path = parts.path.lstrip("/") or "index.html"
+    if path.endswith("/"):
+        path += "index.html"
+    if parts.query:
+        path += "__" + hashlib.sha1(parts.query.encode("utf-8")).hexdigest()[:12]
+
+    return Path(root or config.REPLAY_DIR) / parts.netloc / path
+
+
+def record_response(url: str, body: bytes, *, root: Path = None) -> Path:
+    '''
+    Persist a response body where the replay server will look for it
+
+    :param url : URL the body came from
+    :param body: raw response bytes
+    :param root: OPTIONAL replay root
+    :return    : path written
+    '''
+    path = replay_path(url, root=root)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    #write + rename so a half-written page never gets replayed
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as file_ref:
+        file_ref.write(body)
+    os.replace(tmp_path, path)
+
+    return path
+
+
+# ---- Fault Injection ----
+class FaultPlan:
+    '''
+    Decides latency + injected failures per request. Deterministic for a
+    given seed and request order, 5xx bursts are driven by the request count
+    '''
+
+    def __init__(self, *, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 rate_429: float = 0.0, retry_after: int = 1,
+                 burst_every: int = 0, burst_length: int = 0, burst_status: int = 503,
+                 seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        self.burst_status = burst_status
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.status_counts: Dict[int, int] = {}
+
+    def next(self) -> tuple:
+        '''
+        :return: (delay seconds, injected status or None)
+        '''
+        with self._lock:
+            self.requests += 1
+            count = self.requests
+            delay = (self.latency_ms + self._rng.uniform(0, self.jitter_ms)) / 1000
+            roll = self._rng.random()
+
+        if self.burst_every and (count % self.burst_every) < self.burst_length:
+            return delay, self.burst_status
+        if roll < self.rate_429:
+            return delay, 429
+        return delay, None
+
+    def count(self, status: int) -> None:
+        with self._lock:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"requests": self.requests,
+                    "status": {str(k): v for k, v in sorted(self.status_counts.items())}}
+
+
+# ---- HTTP Server ----
+class _ReplayHandler(BaseHTTPRequestHandler):
+    ''' GET /<host>/<path> -> REPLAY_DIR/<host>/<path> '''
+
+    server_version = "NGSReplay/1.0"
+
+    def do_GET(self):
+        plan: FaultPlan = self.server.plan
+
+        if self.path == "/__stats__":
+            self._send(200, json.dumps(plan.stats()).encode("utf-8"), "application/json")
+            return
+
+        delay, injected = plan.next()
+        if delay:
+            time.sleep(delay)
+
+        if injected == 429:
+            self._send(429, b"Too Many Requests", "text/plain",
+                       {"Retry-After": str(plan.retry_after)})
+            return
+        if injected:
+            self._send(injected, b"Injected failure", "text/plain")
+            return
+
+        #first path segment is the original host
+        host, _, rest = self.path.lstrip("/").partition("/")
+        path = replay_path(f"http://{host}/{rest}", root=self.server.root)
+        if not path.is_file():
+            self._send(404, b"Not recorded", "text/plain")
+            return
+
+        body = path.read_bytes()
+        content_type = "application/json" if body[:1] in (b"{", b"[") else "text/html; charset=utf-8"
+        self._send(200, body, content_type)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Dict[str, str] = None):
+        self.server.plan.count(status)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        #quiet, the stats endpoint is the log
+        return
+
+
+class ReplayServer(ThreadingHTTPServer):
+    '''
+    Threaded replay server, start() runs it on a daemon thread
+    '''
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 *, root: Path = None, plan: FaultPlan = None):
+        super().__init__((host, port), _ReplayHandler)
+        self.root = Path(root or config.REPLAY_DIR)
+        self.plan = plan or FaultPlan()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="ngs-replay", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def replay_roots(base_url: str) -> Dict[str, str]:
+    '''
+    :param base_url: replay server URL, e.g. http://127.0.0.1:8765
+    :return        : config root name -> value pointing at the replay server
+    '''
+    return {
+        "PFR_PROSPECTS_ROOT": f"{base_url}/www.pro-football-reference.com/drafts/",
+        "PFR_DRAFT_ROOT": f"{base_url}/www.pro-football-reference.com/years/",
+        "PFR_COMBINE_ROOT": f"{base_url}/www.pro-football-reference.com/draft/",
+        "SR_CFB_ROOT": f"{base_url}/www.sports-reference.com",
+        "CFBD_API_ROOT": f"{base_url}/api.collegefootballdata.com/",
+    }
+
+
+def point_config_at(base_url: str) -> None:
+    ''' In-process version of --print-env, rewires the config roots '''
+    for name, value in replay_roots(base_url).items():
+        setattr(config, name, value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded pages with injected faults")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--root", default=str(config.REPLAY_DIR))
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="probability of a 429 per request")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--burst-every", type=int, default=0, help="start a 5xx burst every N requests")
+    parser.add_argument("--burst-length", type=int, default=0)
+    parser.add_argument("--burst-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--print-env", action="store_true",
+                        help="print export lines for the config roots and exit")
+    args = parser.parse_args()
+
+    base_url = f"http://{args.host}:{args.port}"
+    if args.print_env:
+        for name, value in replay_roots(base_url).items():
+            print(f"export {name}={value}")
+        return
+
+    plan = FaultPlan(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                     rate_429=args.rate_429, retry_after=args.retry_after,
+                     burst_every=args.burst_every, burst_length=args.burst_length,
+                     burst_status=args.burst_status, seed=args.seed)
+    server = ReplayServer(args.host, args.port, root=args.root, plan=plan)
+    print(f"[INFO] Replaying {args.root} on {base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"[INFO] {json.dumps(plan.stats())}")
+
+
+if __name__ == "__main__":
+    main()
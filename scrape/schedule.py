@@ -0,0 +1,188 @@
+'''
+Priority-aware fetch ordering.
+
+Every item gets an integer priority class (lower = sooner) from a
+PriorityPolicy: target positions first, then projected round, with
+players we already have pushed behind ones never fetched. Each class is a FIFO; pop()
+takes the head with the best *effective* priority
+
+    effective = priority - waited_seconds / aging_seconds
+
+so anything that waits long enough eventually outranks fresher,
+higher-priority work and nothing starves. Progress is tracked per class.
+
+    scheduler = PriorityScheduler(PriorityPolicy.for_positions(["WR", "RB"]))
+    scheduler.extend(stubs)
+    for player in scheduler.drain(): ...
+'''
+
+import threading
+import time
+
+from collections import defaultdict
+from collections import deque
+from dataclasses import dataclass
+from dataclasses import field
+
+from typing import Callable
+from typing import Deque
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Set
+
+import config
+import metrics
+from parse.pfr_parser import canonical_player_path
+from pos_models import Player
+
+
+@dataclass
+class PriorityPolicy:
+    '''
+    Turns a player stub into a priority class
+
+    positions     : position -> base priority, missing positions get default
+    default       : base priority for positions not listed
+    round_weight  : added per projected round past the first
+    refetch       : added when the player's stats_link is already in known_links
+    known_links   : identities already fetched (db.sql_known_links)
+    round_of      : OPTIONAL player -> projected round, None when unknown
+    '''
+
+    positions   : Dict[str, int] = field(default_factory=dict)
+    default     : int = 5
+    round_weight: int = 1
+    refetch     : int = 2
+    known_links : Set[str] = field(default_factory=set)
+    round_of    : Callable[[Player], int] = None
+
+    @classmethod
+    def for_positions(cls, positions: List[str], **kwargs) -> "PriorityPolicy":
+        ''' ["WR", "RB"] -> WR=0, RB=1, everyone else after them '''
+        ranked = {position.upper(): rank for rank, position in enumerate(positions)}
+        kwargs.setdefault("default", len(ranked))
+        return cls(positions=ranked, **kwargs)
+
+    def priority(self, player: Player) -> int:
+        priority = self.positions.get(player.position, self.default)
+
+        projected = self.round_of(player) if self.round_of else getattr(player, "projected_round", None)
+        if projected:
+            priority += (int(projected) - 1) * self.round_weight
+
+        if canonical_player_path(player.stats_link) in self.known_links:
+            priority += self.refetch
+        return priority
+
+
+@dataclass
+class _Entry:
+    item       : object
+    priority   : int
+    enqueued_at: float
+
+
+class PriorityScheduler:
+    '''
+    Per-class FIFOs with aging, safe to push / pop from several threads
+    '''
+
+    def __init__(self, policy: PriorityPolicy = None,
+                 *, aging_seconds: float = config.SCHEDULE_AGING_SECONDS,
+                    clock: Callable[[], float] = time.monotonic):
+        '''
+        :param policy       : OPTIONAL PriorityPolicy, everything is class 0 otherwise (page order)
+        :param aging_seconds: waiting this long is worth one priority class
+        :param clock        : OPTIONAL time source, for tests / simulations
+        '''
+        self.policy = policy
+        self.aging_seconds = aging_seconds
+        self.clock = clock
+
+        self._queues: Dict[int, Deque[_Entry]] = defaultdict(deque)
+        self._progress: Dict[int, Dict[str, int]] = defaultdict(lambda: {"pending": 0, "done": 0, "failed": 0})
+        self._classes: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._queues.values())
+
+    # ---- Queueing ----
+    def push(self, item, priority: int = None) -> int:
+        '''
+        :param item    : player stub (or anything, with an explicit priority)
+        :param priority: OPTIONAL class, policy.priority(item) otherwise
+        :return        : the class it went into
+        '''
+        if priority is None:
+            priority = self.policy.priority(item) if self.policy else 0
+        with self._lock:
+            self._queues[priority].append(_Entry(item, priority, self.clock()))
+            self._progress[priority]["pending"] += 1
+            self._classes[id(item)] = priority
+        return priority
+
+    def extend(self, items: Iterable) -> None:
+        for item in items:
+            self.push(item)
+
+    def _effective(self, entry: _Entry, now: float) -> float:
+        if self.aging_seconds <= 0:
+            return entry.priority
+        return entry.priority - (now - entry.enqueued_at) / self.aging_seconds
+
+    def pop(self):
+        '''
+        :return: next item, None when empty
+        '''
+        with self._lock:
+            now = self.clock()
+            best = None
+            for priority, entries in self._queues.items():
+                if not entries:
+                    continue
+                #FIFO per class, the head is always the one that has aged most
+                score = (self._effective(entries[0], now), priority)
+                if best is None or score < best[0]:
+                    best = (score, priority)
+            if best is None:
+                return None
+
+            entry = self._queues[best[1]].popleft()
+            metrics.observe("schedule_wait_seconds", now - entry.enqueued_at, priority=entry.priority)
+            return entry.item
+
+    def drain(self) -> Iterator:
+        ''' pop() until empty, items pushed meanwhile are included '''
+        while True:
+            item = self.pop()
+            if item is None:
+                return
+            yield item
+
+    # ---- Progress ----
+    def _finish(self, item, result: str) -> None:
+        with self._lock:
+            priority = self._classes.pop(id(item), None)
+            if priority is None:
+                return
+            self._progress[priority]["pending"] -= 1
+            self._progress[priority][result] += 1
+        metrics.inc("schedule_items_total", priority=priority, result=result)
+
+    def mark_done(self, item) -> None:
+        self._finish(item, "done")
+
+    def mark_failed(self, item) -> None:
+        self._finish(item, "failed")
+
+    def progress(self) -> Dict[int, Dict[str, int]]:
+        ''' priority class -> {pending, done, failed}, best class first '''
+        with self._lock:
+            return {priority: dict(counts) for priority, counts in sorted(self._progress.items())}
+
+    def progress_line(self) -> str:
+        return "  ".join(f"P{priority} {counts['done']}/{counts['done'] + counts['failed'] + counts['pending']}"
+                         for priority, counts in self.progress().items())
@@ -0,0 +1,94 @@
+'''
+Single-flight fetches: concurrent callers asking for the same key share
+one call instead of each spending a request. The first caller (the
+leader) runs it, everyone who shows up while it is in flight waits on
+the same Future and gets the same result, or the same exception.
+
+A small LRU of finished results also catches back-to-back duplicates,
+like a player on both the prospects and draft pages of one run.
+
+    flight = SingleFlight(remember=256)
+    html = flight.do("/cfb/players/bryce-young-1.html", lambda: fetch(...))
+'''
+
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+
+import metrics
+
+
+class SingleFlight:
+    '''
+    key -> in-flight Future, plus the last `remember` finished results
+    '''
+
+    def __init__(self, *, remember: int = 0, name: str = "default"):
+        '''
+        :param remember: finished results to keep for later callers, 0 = only coalesce in-flight calls
+        :param name    : metrics label
+        '''
+        self.remember = remember
+        self.name = name
+
+        self._inflight: Dict[Hashable, Future] = {}
+        self._done: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, call: Callable[[], object]):
+        '''
+        :param key : what makes two calls the same (EXAMPLE :: canonical URL)
+        :param call: zero-arg callable, only run by the leader
+        :return    : call()'s result, raises whatever call() raised
+        '''
+        with self._lock:
+            if key in self._done:
+                self._done.move_to_end(key)
+                metrics.inc("singleflight_total", flight=self.name, result="remembered")
+                return self._done[key]
+
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                future.set_running_or_notify_cancel()
+                self._inflight[key] = future
+
+        if not leader:
+            metrics.inc("singleflight_total", flight=self.name, result="shared")
+            return future.result()
+
+        metrics.inc("singleflight_total", flight=self.name, result="leader")
+        try:
+            result = call()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            if self.remember > 0:
+                self._done[key] = result
+                while len(self._done) > self.remember:
+                    self._done.popitem(last=False)
+        future.set_result(result)
+        return result
+
+    def forget(self, key: Hashable = None) -> None:
+        ''' Drop one remembered result, or all of them '''
+        with self._lock:
+            if key is None:
+                self._done.clear()
+            else:
+                self._done.pop(key, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._inflight)